@@ -0,0 +1,212 @@
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector, keccak
+
+from constants.chain import CHAIN_ID
+from constants.contracts import TOKENS
+
+TOKEN_DECIMALS = {TOKENS['USDC']: 6, TOKENS['USDT']: 6, TOKENS['WPHRS']: 18}
+NATIVE_BALANCE = 100 * 10 ** 18
+TOKEN_BALANCE_UNITS = 10_000
+
+_AGGREGATE3 = function_signature_to_4byte_selector('aggregate3((address,bool,bytes)[])')
+_DECIMALS = function_signature_to_4byte_selector('decimals()')
+_BALANCE_OF = function_signature_to_4byte_selector('balanceOf(address)')
+_GET_ETH_BALANCE = function_signature_to_4byte_selector('getEthBalance(address)')
+_ALLOWANCE = function_signature_to_4byte_selector('allowance(address,address)')
+_SLOT0 = function_signature_to_4byte_selector('slot0()')
+# Every receipt carries one log shaped like the position manager's IncreaseLiquidity event
+_LIQUIDITY_LOG_DATA = '0x' + encode(['uint128', 'uint256', 'uint256'], [10 ** 6, 10 ** 6, 10 ** 6]).hex()
+
+
+class FakeChain:
+    """
+    JSON-RPC stand-in for the Pharos testnet, simulated at the RPC level.
+
+    Serves the calls the bot makes (blocks, fees, balances, allowances, pool prices,
+    Multicall3, receipts) and mines every sent transaction into the next block.
+    Transactions are not executed: receipts always succeed, allowances read as zero
+    and balances are constant, so every account approves each token once and the
+    allowance cache takes over afterwards.
+    """
+
+    def __init__(self, block_time: float, latency: float):
+        self._block_time = block_time
+        self._latency = latency
+        self.block = 1
+        self.calls: Counter[str] = Counter()
+        self.posts = 0
+        self._mined_at: dict[str, int] = {}
+        self._blocks: dict[int, list[str]] = {}
+        self._mining_task: asyncio.Task | None = None
+
+    def routes(self) -> list[web.RouteDef]:
+        return [web.post('/', self._handle)]
+
+    async def start(self) -> None:
+        self._mining_task = asyncio.create_task(self._mine())
+
+    def stats(self) -> dict:
+        return {
+            'rpc_calls': sum(self.calls.values()),
+            'rpc_posts': self.posts,
+            'transactions': len(self._mined_at),
+            'calls_by_method': dict(self.calls),
+        }
+
+    async def _mine(self) -> None:
+        while True:
+            await asyncio.sleep(self._block_time)
+            self.block += 1
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.posts += 1
+        body = await request.json()
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        if isinstance(body, list):
+            return web.json_response([self._handle_one(item) for item in body])
+        return web.json_response(self._handle_one(body))
+
+    def _handle_one(self, request: dict) -> dict:
+        method, params = request['method'], request.get('params', [])
+        self.calls[method] += 1
+        response = {'jsonrpc': '2.0', 'id': request['id']}
+        handler = getattr(self, f'_rpc_{method}', None)
+        if handler is None:
+            response['error'] = {'code': -32601, 'message': f'the method {method} does not exist/is not available'}
+        else:
+            response['result'] = handler(*params)
+        return response
+
+    def _rpc_eth_chainId(self) -> str:
+        return hex(CHAIN_ID)
+
+    def _rpc_eth_blockNumber(self) -> str:
+        return hex(self.block)
+
+    def _rpc_eth_getBalance(self, address, block='latest') -> str:
+        return hex(NATIVE_BALANCE)
+
+    def _rpc_eth_getTransactionCount(self, address, block='latest') -> str:
+        # Nonces are not validated, the bot's nonce manager counts from here
+        return '0x0'
+
+    def _rpc_eth_estimateGas(self, transaction, block='latest') -> str:
+        return hex(150_000)
+
+    def _rpc_eth_maxPriorityFeePerGas(self) -> str:
+        return hex(10 ** 9)
+
+    def _rpc_eth_gasPrice(self) -> str:
+        return hex(2 * 10 ** 9)
+
+    def _rpc_eth_feeHistory(self, count, newest, percentiles) -> dict:
+        count = int(count, 16) if isinstance(count, str) else count
+        return {
+            'oldestBlock': hex(max(self.block - count + 1, 0)),
+            'baseFeePerGas': [hex(10 ** 9)] * (count + 1),
+            'gasUsedRatio': [0.5] * count,
+            'reward': [[hex(10 ** 9)] for _ in range(count)],
+        }
+
+    def _rpc_eth_getBlockByNumber(self, number, full_transactions=False) -> dict:
+        number = self.block if number in ('latest', 'pending') else int(number, 16)
+        return {
+            'number': hex(number),
+            'hash': '0x' + keccak(number.to_bytes(8, 'big')).hex(),
+            'parentHash': '0x' + keccak((number - 1).to_bytes(8, 'big', signed=True)).hex(),
+            'timestamp': hex(1_700_000_000 + number),
+            'baseFeePerGas': hex(10 ** 9),
+            'gasLimit': hex(30_000_000),
+            'gasUsed': '0x0',
+            'miner': '0x' + '00' * 20,
+            'difficulty': '0x0',
+            'extraData': '0x',
+            'logsBloom': '0x' + '00' * 256,
+            'nonce': '0x0000000000000000',
+            'sha3Uncles': '0x' + '00' * 32,
+            'size': '0x1',
+            'stateRoot': '0x' + '00' * 32,
+            'receiptsRoot': '0x' + '00' * 32,
+            'transactionsRoot': '0x' + '00' * 32,
+            'transactions': self._blocks.get(number, []),
+            'uncles': [],
+        }
+
+    def _rpc_eth_sendRawTransaction(self, raw_transaction: str) -> str:
+        tx_hash = '0x' + keccak(hexstr=raw_transaction).hex()
+        self._mined_at[tx_hash] = self.block + 1
+        self._blocks.setdefault(self.block + 1, []).append(tx_hash)
+        return tx_hash
+
+    def _rpc_eth_getTransactionReceipt(self, tx_hash: str) -> dict | None:
+        return self._receipt(tx_hash.lower())
+
+    def _rpc_eth_getBlockReceipts(self, number: str) -> list[dict] | None:
+        number = int(number, 16)
+        if number > self.block:
+            return None
+        return [self._receipt(tx_hash) for tx_hash in self._blocks.get(number, [])]
+
+    def _rpc_eth_call(self, call: dict, block='latest') -> str:
+        data = bytes.fromhex((call.get('data') or call.get('input') or '0x')[2:])
+        target = (call.get('to') or '').lower()
+        if data[:4] == _AGGREGATE3:
+            calls = decode(['(address,bool,bytes)[]'], data[4:])[0]
+            results = [(True, self._call(target.lower(), call_data)) for target, _, call_data in calls]
+            return '0x' + encode(['(bool,bytes)[]'], [results]).hex()
+        return '0x' + self._call(target, data).hex()
+
+    def _call(self, target: str, data: bytes) -> bytes:
+        selector = data[:4]
+        decimals = TOKEN_DECIMALS.get(target, 18)
+        if selector == _DECIMALS:
+            return encode(['uint8'], [decimals])
+        if selector == _BALANCE_OF:
+            return encode(['uint256'], [TOKEN_BALANCE_UNITS * 10 ** decimals])
+        if selector == _GET_ETH_BALANCE:
+            return encode(['uint256'], [NATIVE_BALANCE])
+        if selector == _ALLOWANCE:
+            return encode(['uint256'], [0])
+        if selector == _SLOT0:
+            return encode(
+                ['uint160', 'int24', 'uint16', 'uint16', 'uint16', 'uint32', 'bool'],
+                [2 ** 96, 0, 0, 1, 1, 0, True]
+            )
+        return b''
+
+    def _receipt(self, tx_hash: str) -> dict | None:
+        number = self._mined_at.get(tx_hash)
+        if number is None or number > self.block:
+            return None
+        block_hash = '0x' + keccak(number.to_bytes(8, 'big')).hex()
+        return {
+            'transactionHash': tx_hash,
+            'transactionIndex': '0x0',
+            'blockNumber': hex(number),
+            'blockHash': block_hash,
+            'from': '0x' + '00' * 20,
+            'to': '0x' + '00' * 20,
+            'status': '0x1',
+            'type': '0x2',
+            'gasUsed': hex(120_000),
+            'cumulativeGasUsed': hex(120_000),
+            'effectiveGasPrice': hex(2 * 10 ** 9),
+            'contractAddress': None,
+            'logsBloom': '0x' + '00' * 256,
+            'logs': [{
+                'address': '0x' + '00' * 20,
+                'topics': [],
+                'data': _LIQUIDITY_LOG_DATA,
+                'blockNumber': hex(number),
+                'blockHash': block_hash,
+                'transactionHash': tx_hash,
+                'transactionIndex': '0x0',
+                'logIndex': '0x0',
+                'removed': False,
+            }],
+        }
@@ -0,0 +1,81 @@
+import asyncio
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+from constants.contracts import TOKENS
+from services.captcha_provider import CaptchaProvider
+
+_POOL_TOKENS = [
+    {'address': TOKENS['WPHRS'], 'decimals': '18', 'derivedETH': '1', 'name': 'Wrapped PHRS', 'symbol': 'WPHRS'},
+    {'address': TOKENS['USDC'], 'decimals': '6', 'derivedETH': '1', 'name': 'USD Coin', 'symbol': 'USDC'},
+    {'address': TOKENS['USDT'], 'decimals': '6', 'derivedETH': '1', 'name': 'Tether USD', 'symbol': 'USDT'},
+]
+
+
+class FakePharosApi:
+    """Stand-in for the Pharos check-in and faucet API and the pools subgraph."""
+
+    def __init__(self, latency: float):
+        self._latency = latency
+        self.requests: Counter[str] = Counter()
+
+    def routes(self) -> list[web.RouteDef]:
+        return [
+            web.post('/api/sign/in', self._check_in),
+            web.get('/api/faucet/status', self._faucet_status),
+            web.post('/api/faucet/daily', self._faucet_claim),
+            web.post('/subgraph', self._pools),
+        ]
+
+    def stats(self) -> dict:
+        return {'api_requests': sum(self.requests.values()), 'api_requests_by_path': dict(self.requests)}
+
+    async def _respond(self, request: web.Request, payload: dict) -> web.Response:
+        self.requests[request.path] += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return web.json_response(payload)
+
+    async def _check_in(self, request: web.Request) -> web.Response:
+        return await self._respond(request, {'code': 0, 'msg': 'ok'})
+
+    async def _faucet_status(self, request: web.Request) -> web.Response:
+        return await self._respond(request, {
+            'code': 0,
+            'data': {'is_able_to_faucet': True, 'avaliable_timestamp': int(time.time())}
+        })
+
+    async def _faucet_claim(self, request: web.Request) -> web.Response:
+        return await self._respond(request, {'code': 0, 'msg': 'ok'})
+
+    async def _pools(self, request: web.Request) -> web.Response:
+        pools = []
+        for index, (token0, token1) in enumerate([(0, 1), (0, 2), (1, 2)]):
+            pools.append({
+                'id': '0x' + f'{index + 1:040x}',
+                'hash': '0x' + f'{index + 1:064x}',
+                'feeTier': '3000',
+                'token0': _POOL_TOKENS[token0],
+                'token0Price': '1',
+                'token1': _POOL_TOKENS[token1],
+                'token1Price': '1',
+                'tick': '0',
+            })
+        return await self._respond(request, {'data': {'pools': pools}})
+
+
+class FakeCaptchaProvider(CaptchaProvider):
+    """Captcha provider that "solves" a captcha after a fixed delay."""
+
+    def __init__(self, solve_time: float):
+        self._solve_time = solve_time
+        self.solved = 0
+
+    async def solve(self, proxy: Optional[dict[str, str]] = None) -> str:
+        await asyncio.sleep(self._solve_time)
+        self.solved += 1
+        return uuid.uuid4().hex
@@ -0,0 +1,257 @@
+"""
+Offline end-to-end benchmark of the bot.
+
+Runs the real runner and features against local stand-ins for the Pharos chain, API,
+pools subgraph and captcha service, and reports accounts per minute, transactions
+per second, RPC calls per account and peak RSS.
+
+    python -m benchmarks.run --accounts 200 --seed 1 --sleep-scale 0
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+import types
+from urllib.request import urlopen
+
+import yaml
+
+from benchmarks.fake_chain import FakeChain
+from benchmarks.fake_services import FakeCaptchaProvider, FakePharosApi
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# secp256k1 group order, private keys have to be in [1, n)
+_CURVE_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+_FEATURE_MODULES = ('features.faucet', 'features.checkin', 'features.swaps', 'features.liquidity', 'services.tracer')
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=100, help='Number of synthetic accounts')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the account keys and the feature randomness')
+    parser.add_argument('--sleep-scale', type=float, default=0.0, help='Multiplier for the pauses between feature attempts (1 = production)')
+    parser.add_argument('--features', default='faucet,checkin,swaps,liquidity', help='Comma separated features to enable')
+    parser.add_argument('--mode', choices=['parallel', 'sequential'], default='parallel', help='Accounts mode')
+    parser.add_argument('--max-accounts', type=int, default=50, help='Maximum number of concurrent accounts in parallel mode')
+    parser.add_argument('--swaps', type=int, default=3, help='Swaps per account')
+    parser.add_argument('--liquidity-transactions', type=int, default=1, help='Liquidity transactions per account')
+    parser.add_argument('--block-time', type=float, default=1.0, help='Seconds between blocks of the fake chain')
+    parser.add_argument('--rpc-latency-ms', type=float, default=0.0, help='Added latency of every RPC request')
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help='Added latency of every API request')
+    parser.add_argument('--captcha-seconds', type=float, default=0.5, help='Time the fake captcha service takes per solve')
+    parser.add_argument('--settings', default='{}', help='YAML mapping merged into the generated settings, e.g. "{rpc: {batch_requests: true}}"')
+    parser.add_argument('--log-level', default='WARNING', help='Log level of the bot')
+    parser.add_argument('--json', action='store_true', help='Print the report as one JSON object')
+    return parser.parse_args()
+
+
+def serve_fakes(chain_port: int, api_port: int, arguments: argparse.Namespace, ready) -> None:
+    """Entry point of the process hosting the fake chain and services."""
+
+    async def serve() -> None:
+        from aiohttp import web
+
+        chain = FakeChain(arguments.block_time, arguments.rpc_latency_ms / 1000)
+        api = FakePharosApi(arguments.api_latency_ms / 1000)
+
+        async def stats(_request):
+            return web.json_response({**chain.stats(), **api.stats()})
+
+        for port, routes in ((chain_port, chain.routes()), (api_port, [*api.routes(), web.get('/stats', stats)])):
+            application = web.Application()
+            application.add_routes(routes)
+            runner = web.AppRunner(application, access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, '127.0.0.1', port).start()
+        await chain.start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def write_configuration(directory: str, arguments: argparse.Namespace) -> str:
+    rng = random.Random(arguments.seed)
+    accounts_path = os.path.join(directory, 'accounts.jsonl')
+    with open(accounts_path, 'w') as file:
+        for _ in range(arguments.accounts):
+            key = rng.randrange(1, _CURVE_ORDER)
+            file.write(json.dumps({'private_key': f'0x{key:064x}', 'proxy': None, 'auth_key': 'benchmark'}) + '\n')
+
+    features = set(arguments.features.split(','))
+    settings = {
+        'accounts_mode': arguments.mode,
+        'allowance_cache_path': os.path.join(directory, 'allowances.sqlite'),
+        'state_db_path': os.path.join(directory, 'state.sqlite'),
+        'swaps': {
+            'enabled': 'swaps' in features,
+            'percentage_of_balance': [1, 5],
+            'count_of_swaps': [arguments.swaps, arguments.swaps],
+            'swap_back_to_native': True,
+            'retry_count': 3,
+        },
+        'faucet': {'enabled': 'faucet' in features, 'twocaptcha_key': '', 'retry_captcha': 3, 'retry_count': 3},
+        'liquidity': {
+            'enabled': 'liquidity' in features,
+            'count_of_transactions': [arguments.liquidity_transactions, arguments.liquidity_transactions],
+            'percentage_of_balance': [1, 5],
+            'retry_count': 3,
+            'remove': False,
+            'slippage': 10,
+            'pools_cache_path': os.path.join(directory, 'pools.json'),
+        },
+        'checkin': {'enabled': 'checkin' in features, 'retry_count': 3, 'pause_between_attempts': [10, 30]},
+        'concurrency': {'max_accounts': arguments.max_accounts, 'initial_accounts': arguments.max_accounts},
+    }
+    _merge(settings, yaml.safe_load(arguments.settings) or {})
+
+    configuration_path = os.path.join(directory, 'configuration.yaml')
+    with open(configuration_path, 'w') as file:
+        yaml.safe_dump({'accounts_file': accounts_path, 'settings': settings}, file)
+    return configuration_path
+
+
+def _merge(target: dict, overrides: dict) -> None:
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def point_constants_at_fakes(chain_port: int, api_port: int) -> None:
+    # Modules bind these names on import, so they are replaced before the bot is imported
+    import constants.api
+    import constants.chain
+
+    api_url = f'http://127.0.0.1:{api_port}'
+    constants.chain.RPC_URL = f'http://127.0.0.1:{chain_port}/'
+    constants.api.CHECKIN_API_URL = f'{api_url}/api/sign/in?address={{address}}'
+    constants.api.FAUCET_API_URL = f'{api_url}/api/faucet/daily?address={{address}}'
+    constants.api.FAUCET_CHECK_API_URL = f'{api_url}/api/faucet/status?address={{address}}'
+    constants.api.POOLS_SUBGRAPH_URL = f'{api_url}/subgraph'
+
+
+def scale_feature_sleeps(scale: float) -> None:
+    """Scale the pauses of the features, which sleep through their own or the tracer's `asyncio` reference."""
+    original_sleep = asyncio.sleep
+
+    async def scaled_sleep(delay, *args, **kwargs):
+        return await original_sleep(delay * scale, *args, **kwargs)
+
+    scaled_asyncio = types.SimpleNamespace(**vars(asyncio))
+    scaled_asyncio.sleep = scaled_sleep
+    for name in _FEATURE_MODULES:
+        module = sys.modules.get(name)
+        if module is not None:
+            module.asyncio = scaled_asyncio
+
+
+async def run_bot(configuration_path: str, arguments: argparse.Namespace) -> dict:
+    sys.argv = ['main.py', '-c', configuration_path]
+    from dependency_injector import providers
+    from loguru import logger
+
+    import main
+
+    logger.remove()
+    logger.add(sys.stderr, level=arguments.log_level)
+    main.configure()
+    main.container.captcha_provider.override(providers.Object(FakeCaptchaProvider(arguments.captcha_seconds)))
+    scale_feature_sleeps(arguments.sleep_scale)
+
+    started_at = time.perf_counter()
+    exit_code = await main.start()
+    elapsed = time.perf_counter() - started_at
+
+    metrics = main.container.metrics()
+    return {
+        'exit_code': exit_code,
+        'elapsed': elapsed,
+        'processed_accounts': int(metrics.get_counter('pharos_accounts_total')),
+        'failed_accounts': int(metrics.get_counter('pharos_accounts_total', outcome='failure')),
+    }
+
+
+def report(arguments: argparse.Namespace, result: dict, stats: dict) -> dict:
+    accounts = max(result['processed_accounts'], 1)
+    return {
+        'accounts': result['processed_accounts'],
+        'failed_accounts': result['failed_accounts'],
+        'seed': arguments.seed,
+        'sleep_scale': arguments.sleep_scale,
+        'elapsed_seconds': round(result['elapsed'], 3),
+        'accounts_per_minute': round(result['processed_accounts'] / result['elapsed'] * 60, 2),
+        'transactions': stats['transactions'],
+        'transactions_per_second': round(stats['transactions'] / result['elapsed'], 2),
+        'rpc_calls_per_account': round(stats['rpc_calls'] / accounts, 2),
+        'rpc_http_requests_per_account': round(stats['rpc_posts'] / accounts, 2),
+        'api_requests_per_account': round(stats['api_requests'] / accounts, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'rpc_calls_by_method': stats['calls_by_method'],
+    }
+
+
+def peak_rss_mb() -> float | None:
+    """Peak RSS of the bot, None if it cannot be measured; the fakes run in their own process."""
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    # The peak working set on Windows
+    return round(getattr(memory, 'peak_wset', memory.rss) / 1024 ** 2, 1)
+
+
+def main() -> int:
+    arguments = parse_arguments()
+    random.seed(arguments.seed)
+    chain_port, api_port = free_port(), free_port()
+
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    fakes = context.Process(target=serve_fakes, args=(chain_port, api_port, arguments, ready), daemon=True)
+    fakes.start()
+    try:
+        if not ready.wait(30):
+            raise RuntimeError('Fake chain and services did not start')
+        point_constants_at_fakes(chain_port, api_port)
+        with tempfile.TemporaryDirectory(prefix='pharos-benchmark-') as directory:
+            result = asyncio.run(run_bot(write_configuration(directory, arguments), arguments))
+        with urlopen(f'http://127.0.0.1:{api_port}/stats') as response:
+            stats = json.load(response)
+    finally:
+        fakes.terminate()
+        fakes.join()
+
+    summary = report(arguments, result, stats)
+    if arguments.json:
+        print(json.dumps(summary))
+    else:
+        for key, value in summary.items():
+            print(f'{key:>32}: {value}')
+    return result['exit_code']
+
+
+if __name__ == '__main__':
+    sys.exit(main())
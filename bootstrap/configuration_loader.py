@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+
+import yaml
+from dacite import from_dict, Config
+from loguru import logger
+
+from models import configuration as configuration_models
+from models.configuration import Configuration, AccountsMode, GasMode, TraceFormat
+
+
+def load_configuration(path: str) -> Configuration:
+    """
+    Parse and validate the configuration file, reusing the result of a previous start.
+
+    The validated data is cached as JSON next to the file (`cache/<name>.cache`). It is
+    reused while the file keeps its size and modification time, or when its content
+    hash is unchanged, and as long as the configuration models are unchanged.
+    Configurations with inline accounts are not cached, so that no private key or auth
+    key is copied into the cache; large account lists belong in an `accounts_file`.
+    """
+    cache_path = os.path.join(os.path.dirname(path), 'cache', f'{os.path.basename(path)}.cache')
+    stat = os.stat(path)
+    schema = _schema_fingerprint()
+
+    cached = _read_cache(cache_path)
+    if cached is not None and cached['schema'] == schema:
+        if (cached['size'], cached['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return _build(cached['data'], check_types=False)
+        content_hash = _hash_file(path)
+        if cached['sha256'] == content_hash:
+            _write_cache(cache_path, {**cached, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+            return _build(cached['data'], check_types=False)
+    else:
+        content_hash = _hash_file(path)
+
+    with open(path) as file:
+        data = yaml.safe_load(file)
+    configuration = _build(data, check_types=True)
+    if configuration.accounts:
+        _remove_cache(cache_path)
+    else:
+        _write_cache(cache_path, {
+            'schema': schema,
+            'sha256': content_hash,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'data': data
+        })
+    return configuration
+
+
+def _build(data: dict, check_types: bool) -> Configuration:
+    # Cached data was validated before it was written
+    return from_dict(
+        data_class=Configuration,
+        data=data,
+        config=Config(cast=[AccountsMode, GasMode, TraceFormat], check_types=check_types)
+    )
+
+
+def _schema_fingerprint() -> str:
+    # Cached objects of an older model version would miss fields added since then
+    return _hash_file(configuration_models.__file__)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_cache(cache_path: str) -> dict | None:
+    try:
+        with open(cache_path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f'Ignoring unreadable configuration cache {cache_path}: {e}')
+        return None
+
+
+def _write_cache(cache_path: str, entry: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        content = json.dumps(entry)
+        temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as file:
+            file.write(content)
+        os.replace(temporary_path, cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        # YAML values without a JSON form (e.g. dates) are not cached
+        logger.warning(f'Failed to write configuration cache {cache_path}: {e}')
+
+
+def _remove_cache(cache_path: str) -> None:
+    # Drops the cache of an older version of the file that had no inline accounts
+    try:
+        os.remove(cache_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f'Failed to remove configuration cache {cache_path}: {e}')
@@ -1,23 +1,20 @@
 import argparse
-import yaml
-from dacite import from_dict, Config
+from datetime import datetime, timezone
 from dependency_injector import containers, providers
 from loguru import logger
-from models.configuration import Configuration, AccountsMode
-from runner import RunnerFactory
+from bootstrap.configuration_loader import load_configuration
+from models.run_options import RunOptions
 
 
 class ApplicationContainer(containers.DeclarativeContainer):
     config_path = providers.Configuration()
-    configuration = providers.Singleton(
-        lambda path: from_dict(
-            data_class=Configuration,
-            data=yaml.safe_load(open(path)),
-            config=Config(cast=[AccountsMode])
-        ),
-        config_path
+    configuration = providers.Singleton(load_configuration, config_path)
+    account_source = providers.Singleton(
+        lambda configuration: __import__('services.account_source', fromlist=['create_account_source']).create_account_source(configuration),
+        configuration
     )
     logger = providers.Object(logger)
+    run_options = providers.Object(RunOptions())
     swaps_settings = providers.DelegatedCallable(
         lambda configuration: configuration.settings.swaps,
         configuration
@@ -34,6 +31,72 @@ class ApplicationContainer(containers.DeclarativeContainer):
         lambda configuration: configuration.settings.liquidity,
         configuration
     )
+    rpc_stats = providers.Singleton(lambda: __import__('services.rpc_stats', fromlist=['RpcStats']).RpcStats())
+    metrics = providers.Singleton(
+        lambda configuration, run_options, logger: __import__('services.metrics', fromlist=['MetricsRegistry']).MetricsRegistry(configuration.settings.metrics, run_options, logger),
+        configuration, run_options, logger
+    )
+    rpc_metrics_observer = providers.Singleton(
+        lambda metrics: __import__('services.metrics', fromlist=['RpcMetricsObserver']).RpcMetricsObserver(metrics),
+        metrics
+    )
+    tracer = providers.Singleton(
+        lambda configuration, run_options, logger: __import__('services.tracer', fromlist=['Tracer']).Tracer(configuration.settings.tracing, run_options, logger),
+        configuration, run_options, logger
+    )
+    rate_limiter = providers.Singleton(
+        lambda configuration, metrics: __import__('services.rate_limiter', fromlist=['RateLimiter']).RateLimiter(configuration.settings.rate_limits, metrics),
+        configuration, metrics
+    )
+    rpc_endpoint_pool = providers.Singleton(
+        lambda configuration, logger: __import__('services.rpc_endpoint_pool', fromlist=['RpcEndpointPool']).RpcEndpointPool(configuration.settings.rpc, logger),
+        configuration, logger
+    )
+    rpc_observers = providers.List(rpc_stats, rpc_metrics_observer, tracer, rpc_endpoint_pool)
+    rpc_session_pool = providers.Singleton(
+        lambda configuration, endpoint_pool, rate_limiter, logger, observers: __import__('services.rpc_session_pool', fromlist=['RpcSessionPool']).RpcSessionPool(configuration.settings.rpc, endpoint_pool, rate_limiter, logger, observers),
+        configuration, rpc_endpoint_pool, rate_limiter, logger, rpc_observers
+    )
+    chain_head_tracker = providers.Singleton(
+        lambda configuration, session_pool, logger: __import__('services.chain_head_tracker', fromlist=['ChainHeadTracker']).ChainHeadTracker(configuration.settings.rpc, session_pool, logger),
+        configuration, rpc_session_pool, logger
+    )
+    gas_oracle = providers.Singleton(
+        lambda configuration, chain_head_tracker, logger: __import__('services.gas_oracle', fromlist=['GasOracle']).GasOracle(configuration.settings.gas, chain_head_tracker, logger),
+        configuration, chain_head_tracker, logger
+    )
+    receipt_tracker = providers.Singleton(
+        lambda configuration, chain_head_tracker, session_pool, logger: __import__('services.receipt_tracker', fromlist=['ReceiptTracker']).ReceiptTracker(configuration.settings.receipts, chain_head_tracker, session_pool, logger),
+        configuration, chain_head_tracker, rpc_session_pool, logger
+    )
+    nonce_manager = providers.Singleton(
+        lambda logger: __import__('services.nonce_manager', fromlist=['NonceManager']).NonceManager(logger),
+        logger
+    )
+    pool_registry = providers.Singleton(
+        lambda configuration, metrics, tracer, rate_limiter, logger: __import__('services.pool_registry', fromlist=['PoolRegistry']).PoolRegistry(configuration.settings.liquidity, metrics, tracer, rate_limiter, logger),
+        configuration, metrics, tracer, rate_limiter, logger
+    )
+    run_state_store = providers.Singleton(
+        lambda configuration, logger: __import__('services.run_state_store', fromlist=['RunStateStore']).RunStateStore(configuration.settings.state_db_path, logger),
+        configuration, logger
+    )
+    allowance_cache = providers.Singleton(
+        lambda configuration, logger: __import__('services.allowance_cache', fromlist=['AllowanceCache']).AllowanceCache(configuration.settings.allowance_cache_path, logger),
+        configuration, logger
+    )
+    pharos_api_client = providers.Singleton(
+        lambda configuration, metrics, tracer, rate_limiter, logger: __import__('services.pharos_api_client', fromlist=['PharosApiClient']).PharosApiClient(configuration.settings.api, metrics, tracer, rate_limiter, logger),
+        configuration, metrics, tracer, rate_limiter, logger
+    )
+    captcha_provider = providers.Singleton(
+        lambda configuration: __import__('services.captcha_provider', fromlist=['TwoCaptchaProvider']).TwoCaptchaProvider(configuration.settings.faucet.twocaptcha_key, configuration.settings.faucet.captcha_parallel_solves),
+        configuration
+    )
+    captcha_pool = providers.Singleton(
+        lambda configuration, provider, tracer, logger: __import__('services.captcha_pool', fromlist=['CaptchaPool']).CaptchaPool(configuration.settings.faucet, provider, tracer, logger),
+        configuration, captcha_provider, tracer, logger
+    )
     approval_service = providers.Singleton(lambda: __import__('services.approval_service', fromlist=['ApprovalService']).ApprovalService())
     balance_checker = providers.Singleton(lambda: __import__('services.balance_checker', fromlist=['BalanceChecker']).BalanceChecker())
     swaps = providers.Factory(
@@ -48,15 +111,29 @@ class ApplicationContainer(containers.DeclarativeContainer):
     liquidity = providers.Factory(
         lambda: __import__('features.liquidity', fromlist=['Liquidity']).Liquidity(),
     )
-    features = providers.List(
-        faucet,
-        checkin,
-        swaps,
-        liquidity
+    # Only enabled features are created, so disabled ones never import their dependencies
+    features = providers.Callable(
+        lambda configuration, faucet, checkin, swaps, liquidity: [
+            {'faucet': faucet, 'checkin': checkin, 'swaps': swaps, 'liquidity': liquidity}[name]()
+            for name in configuration.settings.enabled_features
+        ],
+        configuration, faucet.provider, checkin.provider, swaps.provider, liquidity.provider
+    )
+    concurrency_controller = providers.Singleton(
+        lambda configuration, rpc_stats, logger: __import__('services.concurrency_controller', fromlist=['ConcurrencyController']).ConcurrencyController(configuration.settings.concurrency, rpc_stats, logger),
+        configuration, rpc_stats, logger
+    )
+    account_lease_table = providers.Singleton(
+        lambda run_options: __import__('services.account_lease_table', fromlist=['AccountLeaseTable']).AccountLeaseTable(run_options.lease_db, run_options.run_id, run_options.lease_ttl) if run_options.lease_db else None,
+        run_options
+    )
+    job_scheduler = providers.Singleton(
+        lambda configuration, run_state_store, logger: __import__('services.job_scheduler', fromlist=['JobScheduler']).JobScheduler(configuration.settings.daemon, run_state_store, logger),
+        configuration, run_state_store, logger
     )
     runner = providers.Factory(
-        lambda features, configuration, logger: RunnerFactory(features, configuration, logger).create(),
-        features, configuration, logger
+        lambda features, configuration, account_source, logger, run_options, account_lease_table, run_state_store, metrics, tracer, concurrency_controller, job_scheduler: __import__('runner', fromlist=['RunnerFactory']).RunnerFactory(features, configuration, account_source, logger, run_options, account_lease_table, run_state_store, metrics, tracer, concurrency_controller, job_scheduler).create(),
+        features, configuration, account_source, logger, run_options, account_lease_table, run_state_store, metrics, tracer, concurrency_controller, job_scheduler
     )
 
 def bootstrap_container() -> ApplicationContainer:
@@ -68,10 +145,66 @@ def bootstrap_container() -> ApplicationContainer:
         default='./data/configuration.yaml',
         help='Path to YAML file with configuration'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of worker processes to split the accounts across'
+    )
+    parser.add_argument(
+        '--shard-index',
+        type=int,
+        default=0,
+        help='Index of the account shard processed by this process (set by the supervisor)'
+    )
+    parser.add_argument(
+        '--shard-count',
+        type=int,
+        default=1,
+        help='Total number of account shards (set by the supervisor)'
+    )
+    parser.add_argument(
+        '--lease-db',
+        type=str,
+        required=False,
+        help='Path to a shared SQLite file used to coordinate accounts across hosts'
+    )
+    parser.add_argument(
+        '--run-id',
+        type=str,
+        required=False,
+        help='Identifier shared by all hosts of one run, defaults to the current UTC date'
+    )
+    parser.add_argument(
+        '--lease-ttl',
+        type=int,
+        default=7200,
+        help='Seconds after which the lease of a crashed worker can be taken over'
+    )
+    parser.add_argument(
+        '--startup-profile',
+        action='store_true',
+        help='Log how long the startup and the imports of every package took'
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Keep running and execute every feature of every account when it is due'
+    )
     args = parser.parse_args()
 
     application_container = ApplicationContainer()
     application_container.config_path.override(args.configurationYaml)
+    application_container.run_options.override(RunOptions(
+        workers=args.workers,
+        shard_index=args.shard_index,
+        shard_count=args.shard_count,
+        lease_db=args.lease_db,
+        run_id=args.run_id or datetime.now(timezone.utc).strftime('%Y-%m-%d'),
+        lease_ttl=args.lease_ttl,
+        startup_profile=args.startup_profile,
+        daemon=args.daemon
+    ))
     return application_container
 
 container = bootstrap_container()
\ No newline at end of file
@@ -260,6 +260,46 @@ ABI = {
         ],
         "stateMutability": "view",
         "type": "function"
-    }]
-}
- 
\ No newline at end of file
+    }],
+    "multicall3": [
+        {
+            "inputs": [
+                {
+                    "components": [
+                        { "internalType": "address", "name": "target", "type": "address" },
+                        { "internalType": "bool", "name": "allowFailure", "type": "bool" },
+                        { "internalType": "bytes", "name": "callData", "type": "bytes" }
+                    ],
+                    "internalType": "struct Multicall3.Call3[]",
+                    "name": "calls",
+                    "type": "tuple[]"
+                }
+            ],
+            "name": "aggregate3",
+            "outputs": [
+                {
+                    "components": [
+                        { "internalType": "bool", "name": "success", "type": "bool" },
+                        { "internalType": "bytes", "name": "returnData", "type": "bytes" }
+                    ],
+                    "internalType": "struct Multicall3.Result[]",
+                    "name": "returnData",
+                    "type": "tuple[]"
+                }
+            ],
+            "stateMutability": "payable",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "address", "name": "addr", "type": "address" }
+            ],
+            "name": "getEthBalance",
+            "outputs": [
+                { "internalType": "uint256", "name": "balance", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        }
+    ]
+}
\ No newline at end of file
@@ -1,6 +1,7 @@
 CHECKIN_API_URL = 'https://api.pharosnetwork.xyz/sign/in?address={address}'
 FAUCET_API_URL = 'https://api.pharosnetwork.xyz/faucet/daily?address={address}'
 FAUCET_CHECK_API_URL = 'https://api.pharosnetwork.xyz/faucet/status?address={address}'
+POOLS_SUBGRAPH_URL = 'https://subgraph.zenithswap.xyz/testnet/subgraphs/name/dex-subgraph'
 
 FETCH_POOLS_QUERY = """query PoolsBulkWithPriceChanges($oneDayAgo: Int!, $sevenDaysAgo: Int!) {
   pools(first: 20, orderBy: totalValueLockedUSD, orderDirection: desc) {
@@ -65,4 +66,17 @@ FETCH_POOLS_QUERY = """query PoolsBulkWithPriceChanges($oneDayAgo: Int!, $sevenD
     }
     __typename
   }
-}"""
\ No newline at end of file
+}"""
+API_HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "priority": "u=1, i",
+    "sec-ch-ua": "\"Chromium\";v=\"136\", \"Google Chrome\";v=\"136\", \"Not.A/Brand\";v=\"99\"",
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": "\"Windows\"",
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-site",
+    "Origin": "https://testnet.pharosnetwork.xyz",
+    "Referer": "https://testnet.pharosnetwork.xyz/",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
+}
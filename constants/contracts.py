@@ -6,4 +6,6 @@ TOKENS = {
 
 SWAP_ROUTER_ADDRESS = '0x1a4de519154ae51200b0ad7c90f7fac75547888a'
 
-LIQUIDITY_ROUTER_ADDRESS = '0xf8a1d4ff0f9b9af7ce58e1fc1833688f3bfd6115'
\ No newline at end of file
+LIQUIDITY_ROUTER_ADDRESS = '0xf8a1d4ff0f9b9af7ce58e1fc1833688f3bfd6115'
+
+MULTICALL3_ADDRESS = '0xca11bde05977b3631167028862be2a173976ca11'
\ No newline at end of file
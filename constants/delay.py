@@ -1,2 +0,0 @@
-MAX_SLEEP = 30
-MIN_SLEEP = 3
\ No newline at end of file
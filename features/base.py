@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 
-from models.configuration import AccountConfig
+from models.account_context import AccountContext
 
 
 class BaseFeature(ABC):
@@ -10,5 +10,6 @@ class BaseFeature(ABC):
         pass
 
     @abstractmethod
-    async def execute(self, account: AccountConfig):
-        pass
\ No newline at end of file
+    async def execute(self, context: AccountContext) -> bool:
+        """Run the feature for one account; returns whether its work of today is done."""
+        pass
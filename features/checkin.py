@@ -1,12 +1,14 @@
-import asyncio
-import random
-from eth_account import Account
 import httpx
 from constants.api import CHECKIN_API_URL
-from constants.delay import MAX_SLEEP, MIN_SLEEP
 from features.base import BaseFeature
-from models.configuration import AccountConfig, CheckinSettings
+from models.account_context import AccountContext
+from models.configuration import CheckinSettings
+from services.metrics import MetricsRegistry
+from services.tracer import Tracer
 from loguru._logger import Logger
+from services.pharos_api_client import PharosApiClient
+from services.retry_policy import RetryPolicy
+from services.run_state_store import RunStateStore
 from bootstrap.container import ApplicationContainer
 from dependency_injector.wiring import inject, Provide
 
@@ -16,54 +18,43 @@ class CheckIn(BaseFeature):
     def __init__(
         self, 
         settings: CheckinSettings = Provide[ApplicationContainer.checkin_settings],
+        state_store: RunStateStore = Provide[ApplicationContainer.run_state_store],
+        api_client: PharosApiClient = Provide[ApplicationContainer.pharos_api_client],
+        metrics: MetricsRegistry = Provide[ApplicationContainer.metrics],
+        tracer: Tracer = Provide[ApplicationContainer.tracer],
         logger: Logger = Provide[ApplicationContainer.logger]
     ):
         self._settings = settings
+        self._state_store = state_store
+        self._api_client = api_client
+        self._metrics = metrics
+        self._tracer = tracer
         self._logger = logger
+        self._retry_policy = RetryPolicy(self.name, settings.retry, metrics, tracer, logger)
     
     @property
     def name(self) -> str:
         return 'checkin'
 
-    async def execute(self, account_config: AccountConfig):
+    async def execute(self, context: AccountContext) -> bool:
         if not self._settings.enabled:
             self._logger.info(f'Checkin feature is disabled, skipping...')
-            return
+            return True
         
-        account = Account.from_key(account_config.private_key)
+        account = context.account
         endpoint = CHECKIN_API_URL.format(address=account.address)
         self._logger.info(f'[{account.address}] Sending request to {endpoint}')
 
-        for i in range(self._settings.retry_count):
-            self._logger.info(f'[{account.address}] Checkin Attempt {i + 1}/{self._settings.retry_count}')
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "accept": "application/json, text/plain, */*",
-                    "authorization": f"Bearer {account_config.auth_key}",
-                    "priority": "u=1, i",
-                    "sec-ch-ua": "\"Chromium\";v=\"136\", \"Google Chrome\";v=\"136\", \"Not.A/Brand\";v=\"99\"",
-                    "sec-ch-ua-mobile": "?0",
-                    "sec-ch-ua-platform": "\"Windows\"",
-                    "sec-fetch-dest": "empty",
-                    "sec-fetch-mode": "cors",
-                    "sec-fetch-site": "same-site",
-                    "Origin": "https://testnet.pharosnetwork.xyz",
-                    "Referer": "https://testnet.pharosnetwork.xyz/",
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
-                }
-
-                try:
-                    response = await client.post(endpoint, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    self._logger.success(f'[{account.address}] ✅ Checkin successful: {data["msg"]}')
+        for attempt in self._retry_policy.attempts(self._settings.retry_count):
+            self._logger.info(f'[{account.address}] Checkin Attempt {attempt.number}/{attempt.count}')
+            try:
+                data = await self._api_client.post(context, endpoint)
+                self._logger.success(f'[{account.address}] ✅ Checkin successful: {data["msg"]}')
+                await self._state_store.mark_done(account.address, self.name)
+                return True
+            except (httpx.HTTPStatusError, httpx.RequestError) as e:
+                self._logger.error(f'[{account.address}] ❌ Checkin request error: {e}')
+                if not await attempt.backoff(e, account.address):
                     break
-                except httpx.HTTPStatusError as e:
-                    self._logger.error(f'[{account.address}] ❌ Checkin request error: {e}')
-                except httpx.RequestError as e:
-                    self._logger.error(f'[{account.address}] ❌ Checkin request error: {e}')
-                finally:
-                    sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)
-                    self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before next checkin attempt')
-                    await asyncio.sleep(sleep_time)
+        return False
         
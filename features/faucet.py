@@ -1,19 +1,20 @@
-import asyncio
-import random
-from eth_account import Account
+import time
 import httpx
 from loguru._logger import Logger
 from dependency_injector.wiring import inject, Provide
-from twocaptcha import TwoCaptcha
 from datetime import datetime
-from eth_account.signers.local import LocalAccount
 
 from bootstrap.container import ApplicationContainer
 from constants.api import FAUCET_API_URL, FAUCET_CHECK_API_URL
-from constants.captcha import CAPTCHA_KEY, CAPTCHA_SITEURL
-from constants.delay import MAX_SLEEP, MIN_SLEEP
 from features.base import BaseFeature
-from models.configuration import AccountConfig, FaucetSettings
+from models.account_context import AccountContext
+from models.configuration import FaucetSettings
+from services.captcha_pool import CaptchaPool
+from services.metrics import MetricsRegistry
+from services.tracer import Tracer
+from services.pharos_api_client import PharosApiClient
+from services.retry_policy import RetryPolicy
+from services.run_state_store import RunStateStore
 
 
 class Faucet(BaseFeature):
@@ -21,111 +22,83 @@ class Faucet(BaseFeature):
     def __init__(
         self,
         settings: FaucetSettings = Provide[ApplicationContainer.faucet_settings],
+        state_store: RunStateStore = Provide[ApplicationContainer.run_state_store],
+        captcha_pool: CaptchaPool = Provide[ApplicationContainer.captcha_pool],
+        api_client: PharosApiClient = Provide[ApplicationContainer.pharos_api_client],
+        metrics: MetricsRegistry = Provide[ApplicationContainer.metrics],
+        tracer: Tracer = Provide[ApplicationContainer.tracer],
         logger: Logger = Provide[ApplicationContainer.logger],
     ):
         self._settings = settings
+        self._state_store = state_store
+        self._captcha_pool = captcha_pool
+        self._api_client = api_client
+        self._metrics = metrics
+        self._tracer = tracer
         self._logger = logger
+        self._retry_policy = RetryPolicy(self.name, settings.retry, metrics, tracer, logger)
         
 
     @property
     def name(self) -> str:
         return 'faucet'
 
-    async def execute(self, account_config: AccountConfig) -> None:
+    async def execute(self, context: AccountContext) -> bool:
         if not self._settings.enabled:
             self._logger.info(f'Faucet feature is disabled, skipping...')
-            return
+            return True
 
-        account = Account.from_key(account_config.private_key)
-        if await self._check_is_claimed(account, account_config):
-            return
+        account = context.account
+        next_claim_at = await self._state_store.get_next_faucet_claim(account.address)
+        if next_claim_at is not None and time.time() < next_claim_at:
+            self._logger.info(f'[{account.address}] Faucet is already claimed. Next claim will be available at {datetime.fromtimestamp(next_claim_at)}')
+            return True
 
-        solver = TwoCaptcha(self._settings.twocaptcha_key)
-        for i in range(self._settings.retry_captcha):
+        if await self._check_is_claimed(context):
+            return True
+
+        for attempt in self._retry_policy.attempts(self._settings.retry_captcha):
             try:
-                self._logger.info(f'[{account.address}] Solving captcha for account. Attempt {i + 1}/{self._settings.retry_captcha}')
-                captcha_result = solver.recaptcha(
-                    sitekey=CAPTCHA_KEY,
-                    url=CAPTCHA_SITEURL,
-                    proxy={
-                        "type": "HTTP",
-                        "uri": account_config.proxy.replace('http://', '')
-                    } if account_config.proxy else None
-                )
+                self._logger.info(f'[{account.address}] Solving captcha for account. Attempt {attempt.number}/{attempt.count}')
+                captcha_result = await self._captcha_pool.get_token(context.captcha_proxy)
 
                 self._logger.success(f'[{account.address}] ✅ Captcha solved')
                 break
             except Exception as e:
                 self._logger.error(f'[{account.address}] Error solving captcha: {e}')
-                if i == self._settings.retry_captcha - 1:
-                    self._logger.error(f'[{account.address}] ❌ Failed to solve captcha after {self._settings.retry_captcha} attempts')
-                    return
-            finally:
-                sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)
-                self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before next captcha attempt')
-                await asyncio.sleep(sleep_time)
+                if not await attempt.backoff(e, account.address):
+                    self._logger.error(f'[{account.address}] ❌ Failed to solve captcha after {attempt.number} attempts')
+                    return False
         
-        for i in range(self._settings.retry_count):
+        for attempt in self._retry_policy.attempts(self._settings.retry_count):
             try:
-                headers = {
-                    "accept": "application/json, text/plain, */*",
-                    "authorization": f"Bearer {account_config.auth_key}",
-                    "priority": "u=1, i",
-                    "sec-ch-ua": "\"Chromium\";v=\"136\", \"Google Chrome\";v=\"136\", \"Not.A/Brand\";v=\"99\"",
-                    "sec-ch-ua-mobile": "?0",
-                    "sec-ch-ua-platform": "\"Windows\"",
-                    "sec-fetch-dest": "empty",
-                    "sec-fetch-mode": "cors",
-                    "sec-fetch-site": "same-site",
-                    "Origin": "https://testnet.pharosnetwork.xyz",
-                    "Referer": "https://testnet.pharosnetwork.xyz/",
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
-                }
-                self._logger.info(f'[{account.address}] Claiming faucet for account. Attempt {i + 1}/{self._settings.retry_count}')
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(FAUCET_API_URL.format(address=account.address), headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    self._logger.success(f'[{account.address}] ✅ Faucet claimed: {data["msg"]}')
-                    break
-            except httpx.HTTPStatusError as e:
+                self._logger.info(f'[{account.address}] Claiming faucet for account. Attempt {attempt.number}/{attempt.count}')
+                data = await self._api_client.post(context, FAUCET_API_URL.format(address=account.address))
+                self._logger.success(f'[{account.address}] ✅ Faucet claimed: {data["msg"]}')
+                await self._state_store.mark_done(account.address, self.name)
+                return True
+            except (httpx.HTTPStatusError, httpx.RequestError) as e:
                 self._logger.error(f'[{account.address}] ❌ Faucet claim request error: {e}')
-            finally:
-                sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)
-                self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before next faucet claim attempt')
-                await asyncio.sleep(sleep_time)
+                if not await attempt.backoff(e, account.address):
+                    break
+        return False
         
-    async def _check_is_claimed(self, account: LocalAccount, account_config: AccountConfig) -> bool:
-        headers = {
-            "accept": "application/json, text/plain, */*",
-            "authorization": f"Bearer {account_config.auth_key}",
-            "priority": "u=1, i",
-            "sec-ch-ua": "\"Chromium\";v=\"136\", \"Google Chrome\";v=\"136\", \"Not.A/Brand\";v=\"99\"",
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": "\"Windows\"",
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-site",
-            "Origin": "https://testnet.pharosnetwork.xyz",
-            "Referer": "https://testnet.pharosnetwork.xyz/",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
-        }
+    async def _check_is_claimed(self, context: AccountContext) -> bool:
+        account = context.account
 
         try:
             endpoint = FAUCET_CHECK_API_URL.format(address=account.address)
             self._logger.info(f'[{account.address}] Checking if faucet is claimed.')
-            async with httpx.AsyncClient() as client:
-                response = await client.get(endpoint, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                claimed = data['data']['is_able_to_faucet'] == False
-                if claimed:
-                    next_claim_time = datetime.fromtimestamp(data['data']['avaliable_timestamp'])
-                    self._logger.info(f'[{account.address}] Faucet is already claimed. Next claim will be available at {next_claim_time}')
-                    return True
-                else:
-                    self._logger.info(f'[{account.address}] Faucet is not claimed.')
-                    return False
-        except httpx.HTTPStatusError as e:
+            data = await self._api_client.get(context, endpoint)
+            claimed = data['data']['is_able_to_faucet'] == False
+            if claimed:
+                await self._state_store.set_next_faucet_claim(account.address, data['data']['avaliable_timestamp'])
+                next_claim_time = datetime.fromtimestamp(data['data']['avaliable_timestamp'])
+                self._logger.info(f'[{account.address}] Faucet is already claimed. Next claim will be available at {next_claim_time}')
+                return True
+            else:
+                self._logger.info(f'[{account.address}] Faucet is not claimed.')
+                return False
+        except (httpx.HTTPStatusError, httpx.RequestError) as e:
             self._logger.error(f'[{account.address}] ❌ Failed to check faucet status: {e}')
             return False
@@ -1,27 +1,30 @@
-import asyncio
-from datetime import datetime, timedelta
 import random
-from eth_account import Account
-import httpx
 from loguru._logger import Logger
 from web3 import AsyncWeb3
 from bootstrap.container import ApplicationContainer
 from constants.abi import ABI
-from constants.api import FETCH_POOLS_QUERY
 from constants.chain import CHAIN_ID, MAX_TICK
 from constants.contracts import LIQUIDITY_ROUTER_ADDRESS, TOKENS
-from constants.delay import MAX_SLEEP, MIN_SLEEP
 from features.base import BaseFeature
-from models.configuration import AccountConfig, LiquiditySettings
+from models.configuration import LiquiditySettings
 from dependency_injector.wiring import inject, Provide
-from eth_account.signers.local import LocalAccount
 from eth_abi import decode
 
-from models.liquidity import LiquidityPool, LiquidityPoolToken
+from models.account_context import AccountContext
+from models.liquidity import LiquidityPool
 from services.approval_service import ApprovalService
 from services.balance_checker import BalanceChecker
+from services.chain_head_tracker import ChainHeadTracker
 from services.explorer_helper import ExplorerHelper
 from services.gas_helper import GasHelper
+from services.gas_oracle import GasOracle
+from services.metrics import MetricsRegistry
+from services.tracer import Tracer
+from services.nonce_manager import NonceManager
+from services.pool_registry import PoolRegistry
+from services.receipt_tracker import ReceiptTracker
+from services.retry_policy import RetryPolicy, TransactionReverted
+from services.run_state_store import RunStateStore
 from services.web3_factory import Web3Factory
 
 class Liquidity(BaseFeature):
@@ -31,10 +34,27 @@ class Liquidity(BaseFeature):
         balance_checker: BalanceChecker = Provide[ApplicationContainer.balance_checker],
         approval_service: ApprovalService = Provide[ApplicationContainer.approval_service],
         settings: LiquiditySettings = Provide[ApplicationContainer.liquidity_settings],
+        nonce_manager: NonceManager = Provide[ApplicationContainer.nonce_manager],
+        gas_oracle: GasOracle = Provide[ApplicationContainer.gas_oracle],
+        chain_head_tracker: ChainHeadTracker = Provide[ApplicationContainer.chain_head_tracker],
+        receipt_tracker: ReceiptTracker = Provide[ApplicationContainer.receipt_tracker],
+        pool_registry: PoolRegistry = Provide[ApplicationContainer.pool_registry],
+        state_store: RunStateStore = Provide[ApplicationContainer.run_state_store],
+        metrics: MetricsRegistry = Provide[ApplicationContainer.metrics],
+        tracer: Tracer = Provide[ApplicationContainer.tracer],
         logger: Logger = Provide[ApplicationContainer.logger],
     ):
         self._balance_checker = balance_checker
         self._approval_service = approval_service
+        self._nonce_manager = nonce_manager
+        self._gas_oracle = gas_oracle
+        self._chain_head_tracker = chain_head_tracker
+        self._receipt_tracker = receipt_tracker
+        self._pool_registry = pool_registry
+        self._state_store = state_store
+        self._metrics = metrics
+        self._tracer = tracer
+        self._retry_policy = RetryPolicy(self.name, settings.retry, metrics, tracer, logger)
         self._settings = settings
         self._logger = logger
     
@@ -42,81 +62,101 @@ class Liquidity(BaseFeature):
     def name(self) -> str:
         return 'liquidity'
     
-    async def execute(self, account_config: AccountConfig) -> None:
+    async def execute(self, context: AccountContext) -> bool:
         if not self._settings.enabled:
             self._logger.info(f'Liquidity feature is disabled, skipping...')
-            return
+            return True
         
-        account = Account.from_key(account_config.private_key)
+        account = context.account
+        count_of_transactions = await self._get_remaining_transactions(context)
+        if count_of_transactions <= 0:
+            self._logger.info(f'[{account.address}] All liquidity transactions of today are already done')
+            await self._state_store.mark_done(account.address, self.name)
+            return True
 
-        for i in range(self._settings.retry_count):
-            self._logger.info(f'[{account.address}] Fetching pools, attempt {i + 1}/{self._settings.retry_count}')
-            pools = await self._fetch_pools()
-            if pools:
+        pools = None
+        for attempt in self._retry_policy.attempts(self._settings.retry_count):
+            self._logger.info(f'[{account.address}] Fetching pools, attempt {attempt.number}/{attempt.count}')
+            try:
+                pools = await self._pool_registry.get_pools()
                 break
-
-            sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)   
-            self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before next attempt')
-            await asyncio.sleep(sleep_time)
+            except Exception as e:
+                # Passed on so that a rate limited subgraph is retried after its Retry-After
+                if not await attempt.backoff(e, account.address):
+                    break
             
         if not pools:
             self._logger.error(f'[{account.address}] Failed to fetch pools, exit...')
-            return
+            return False
         
         pools = self._remove_unsupported_pools(pools)
         if len(pools) == 0:
             self._logger.warning(f'[{account.address}] No supported pools found, exit...')
-            return
+            return False
         
-        count_of_transactions = random.randint(self._settings.count_of_transactions[0], self._settings.count_of_transactions[1])
         self._logger.info(f'[{account.address}] Will execute {count_of_transactions} transactions')
-        sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)   
-        self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before adding liquidity')
-        await asyncio.sleep(sleep_time)
+        await self._pause(account.address, 'before adding liquidity')
         
         for i in range(count_of_transactions):
+            if i > 0:
+                await self._pause(account.address, 'before next liquidity transaction')
             pool = random.choice(pools)
             self._logger.info(f'[{account.address}] {i + 1}/{count_of_transactions} Adding liquidity to {pool.token0.symbol} - {pool.token1.symbol}')
-            await self._add_liquidity(account_config, account, pool)
+            await self._add_liquidity(context, pool)
+
+        # Failed transactions are not counted, so the account is retried until the quota is reached
+        if not await self._state_store.mark_done_if_reached(account.address, self.name):
+            self._logger.warning(f'[{account.address}] Not all liquidity transactions of today succeeded, the rest is left for the next run')
+            return False
+        return True
+
+    async def _get_remaining_transactions(self, context: AccountContext) -> int:
+        # The quota is drawn once per day, so a rerun only executes the transactions that are left
+        progress = await self._state_store.get_progress(context.address, self.name)
+        target = progress.target
+        if target is None:
+            target = random.randint(self._settings.count_of_transactions[0], self._settings.count_of_transactions[1])
+            await self._state_store.set_target(context.address, self.name, target)
+        return target - progress.completed
         
-    async def _add_liquidity(self, account_config: AccountConfig, account: LocalAccount, pool: LiquidityPool) -> None:
-        async with Web3Factory(account_config) as web3:
-            for i in range(self._settings.retry_count):
+    async def _add_liquidity(self, context: AccountContext, pool: LiquidityPool) -> None:
+        account = context.account
+        async with Web3Factory(context) as web3:
+            for attempt in self._retry_policy.attempts(self._settings.retry_count):
                 try:
-                    self._logger.info(f'[{account.address}] Attempt {i + 1}/{self._settings.retry_count} Adding liquidity to {pool.token0.symbol} - {pool.token1.symbol}')
-                    await self._try_add_liquidity(account_config, account, pool, web3)
+                    self._logger.info(f'[{account.address}] Attempt {attempt.number}/{attempt.count} Adding liquidity to {pool.token0.symbol} - {pool.token1.symbol}')
+                    await self._try_add_liquidity(context, pool, web3)
                     break
                 except Exception as e:
-                    self._logger.error(f'[{account.address}] Attempt {i + 1}/{self._settings.retry_count} Failed to add liquidity to {pool.token0.symbol} - {pool.token1.symbol}: {e}')
-                finally:
-                    sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)   
-                    self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before next attempt')
-                    await asyncio.sleep(sleep_time)
+                    self._logger.error(f'[{account.address}] Attempt {attempt.number}/{attempt.count} Failed to add liquidity to {pool.token0.symbol} - {pool.token1.symbol}: {e}')
+                    for token in (pool.token0, pool.token1):
+                        await self._approval_service.invalidate_on_error(context, e, token.address, LIQUIDITY_ROUTER_ADDRESS)
+                    if not await attempt.backoff(e, account.address):
+                        break
+
+    async def _pause(self, address: str, reason: str) -> None:
+        # Pacing between successful actions, retries wait according to the retry policy instead
+        sleep_time = random.randint(self._settings.pause_between_actions[0], self._settings.pause_between_actions[1])
+        self._logger.info(f'[{address}] Sleeping for {sleep_time} seconds {reason}')
+        self._metrics.increment('pharos_sleep_seconds_total', sleep_time, feature=self.name)
+        await self._tracer.sleep(sleep_time)
 
 
     async def _try_add_liquidity(
         self, 
-        account_config: AccountConfig, 
-        account: LocalAccount, 
+        context: AccountContext, 
         pool: LiquidityPool, 
         web3: AsyncWeb3
     ) -> None:
+        account = context.account
         pm_contract = web3.eth.contract(
             address=web3.to_checksum_address(LIQUIDITY_ROUTER_ADDRESS), 
             abi=ABI['liquidity']
         )
 
-        token0_balance, _ = await self._balance_checker.get_balance(
-            account_config=account_config,
-            token_address=pool.token0.address,
-            account=account
-        )
-
-        token1_balance, _ = await self._balance_checker.get_balance(
-            account_config=account_config,
-            token_address=pool.token1.address,
-            account=account
-        )
+        balances = await self._balance_checker.get_account_balances(context)
+        token0_balance, _ = balances[pool.token0.symbol]
+        token1_balance, _ = balances[pool.token1.symbol]
 
         price = await self._get_pool_price(pool, web3)
         self._logger.info(f'[{account.address}] Fetched pool price: {price} {pool.token1.symbol}/{pool.token0.symbol}')
@@ -126,10 +166,13 @@ class Liquidity(BaseFeature):
         token1_amount = min(int(token0_amount * price), token1_balance)
         token0_amount = int(token1_amount * (1 / price))
 
+        await self._approval_service.prefetch_allowances(context, [
+            (token.address, pm_contract.address) for token in (pool.token0, pool.token1) if token.symbol != 'PHRS'
+        ])
+
         if pool.token0.symbol != 'PHRS':
             await self._approval_service.approve_token(
-                account_config=account_config,
-                account=account,
+                context=context,
                 token_address=pool.token0.address,
                 spender_address=pm_contract.address,
                 amount=token0_amount
@@ -137,8 +180,7 @@ class Liquidity(BaseFeature):
         
         if pool.token1.symbol != 'PHRS':
             await self._approval_service.approve_token(
-                account_config=account_config,
-                account=account,
+                context=context,
                 token_address=pool.token1.address,
                 spender_address=pm_contract.address,
                 amount=token1_amount
@@ -168,20 +210,28 @@ class Liquidity(BaseFeature):
         elif pool.token1.symbol == 'PHRS' or pool.token1.symbol == 'WPHRS':
             value = token1_amount
 
-        base_tx = {
-            'from': account.address,
-            'to': pm_contract.address,
-            'data': multicall_data,
-            'nonce': await web3.eth.get_transaction_count(account.address),
-            'chainId': CHAIN_ID,
-            'value': value
-        }
+        async with self._nonce_manager.reserve(web3, account.address) as nonce:
+            base_tx = {
+                'from': account.address,
+                'to': pm_contract.address,
+                'data': multicall_data,
+                'nonce': nonce,
+                'chainId': CHAIN_ID,
+                'value': value
+            }
 
-        await self._set_gas(base_tx, web3)
+            with self._metrics.transaction_stage('liquidity', 'build'), self._tracer.span('liquidity build', 'transaction'):
+                await self._set_gas(base_tx, web3)
 
-        signed_tx = account.sign_transaction(base_tx)
-        tx_hash = await web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = await web3.eth.wait_for_transaction_receipt(tx_hash)
+            with self._metrics.transaction_stage('liquidity', 'sign'), self._tracer.span('liquidity sign', 'transaction'):
+                signed_tx = account.sign_transaction(base_tx)
+            with self._metrics.transaction_stage('liquidity', 'send'), self._tracer.span('liquidity send', 'transaction'):
+                tx_hash = await web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        with self._metrics.transaction_stage('liquidity', 'confirm') as measurement, self._tracer.span('liquidity confirm', 'confirm'):
+            receipt = await self._receipt_tracker.wait_for_receipt(tx_hash)
+            if receipt['status'] != 1:
+                measurement.outcome = 'reverted'
+        await self._state_store.record_transaction(account.address, self.name, tx_hash.to_0x_hex(), receipt['status'] == 1)
         tx_url = ExplorerHelper.get_tx_url(tx_hash)
 
         if receipt['status'] == 1:
@@ -192,7 +242,7 @@ class Liquidity(BaseFeature):
             self._logger.success(f'[{account.address}] ✅ Added liquidity: {provided_amount0:.2f} {pool.token0.symbol} and {provided_amount1:.2f} {pool.token1.symbol}: {tx_url}')
         else:
             self._logger.error(f'[{account.address}] ❌ Failed to add liquidity to {pool.token0.symbol} - {pool.token1.symbol}: {tx_url}')
-            raise Exception('Transaction was not successful')
+            raise TransactionReverted('Transaction was not successful')
 
 
     async def _get_pool_price(self, pool: LiquidityPool, web3: AsyncWeb3) -> float:
@@ -208,84 +258,15 @@ class Liquidity(BaseFeature):
         return price
         
     
-    async def _fetch_pools(self) -> list[LiquidityPool] | None:
-        async with httpx.AsyncClient() as client:
-            try:
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                one_day_ago = today - timedelta(days=1)
-                seven_days_ago = today - timedelta(days=7)
-                
-                data = {
-                    "operationName": "PoolsBulkWithPriceChanges",
-                    "query": FETCH_POOLS_QUERY,
-                    "variables": {
-                        "oneDayAgo": int(one_day_ago.timestamp()),
-                        "sevenDaysAgo": int(seven_days_ago.timestamp())
-                    }
-                }
-                response = await client.post(
-                    'https://subgraph.zenithswap.xyz/testnet/subgraphs/name/dex-subgraph', 
-                    json=data, 
-                    headers={
-                        'Content-Type': 'application/json',
-                        'Accept': '*/*',
-                        'Origin': 'https://testnet.zenithfinance.xyz',
-                        'Referer': 'https://testnet.zenithfinance.xyz/',
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    },
-                    follow_redirects=True)
-                response.raise_for_status()
-                
-                data = response.json()
-                if 'errors' in data and len(data['errors']) > 0:
-                    raise Exception(data['errors'])
-                
-                pools = []
-                for pool in data['data']['pools']:
-                    token0 = LiquidityPoolToken(
-                        address=pool['token0']['address'],
-                        decimals=int(pool['token0']['decimals']),
-                        derivedETH=float(pool['token0']['derivedETH']),
-                        name=pool['token0']['name'],
-                        symbol=pool['token0']['symbol']
-                    )
-                    token1 = LiquidityPoolToken(
-                        address=pool['token1']['address'],
-                        decimals=int(pool['token1']['decimals']),
-                        derivedETH=float(pool['token1']['derivedETH']),
-                        name=pool['token1']['name'],
-                        symbol=pool['token1']['symbol']
-                    )
-                    
-                    pool_obj = LiquidityPool(
-                        id=pool['id'],
-                        hash=pool['hash'],
-                        feeTier=int(pool['feeTier']),
-                        token0=token0,
-                        token0Price=float(pool['token0Price']),
-                        token1=token1,
-                        token1Price=float(pool['token1Price']),
-                        tick=int(pool['tick'])
-                    )
-                    pools.append(pool_obj)
-                
-                return pools
-            except httpx.HTTPStatusError as e:
-                self._logger.error(f'Error fetching pools: {e}')
-                return None
-            except Exception as e:
-                self._logger.error(f'Error fetching pools: {e}')
-                return None
-            
     def _remove_unsupported_pools(self, pools: list[LiquidityPool]) -> list[LiquidityPool]:
         return [pool for pool in pools if pool.token0.symbol in TOKENS and pool.token1.symbol in TOKENS]
     
     async def _get_deadline(self, web3: AsyncWeb3) -> int:
-        return (await web3.eth.get_block('latest'))['timestamp'] + 1200
+        return (await self._chain_head_tracker.get_head(str(web3.provider.endpoint_uri))).timestamp + 1200
     
     async def _set_gas(self, tx: dict, web3: AsyncWeb3) -> None:
         gas = await GasHelper.estimate_gas(web3, tx)
-        gas_params = await GasHelper.get_gas_params(web3)
+        gas_params = await self._gas_oracle.get_gas_params(web3)
 
         tx.update({
             'gas': gas,
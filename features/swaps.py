@@ -2,7 +2,7 @@ import asyncio
 import random
 from typing import Tuple
 from dependency_injector.wiring import inject, Provide
-from eth_account import Account
+from hexbytes import HexBytes
 from loguru._logger import Logger
 from web3 import AsyncWeb3
 from eth_account.signers.local import LocalAccount
@@ -10,13 +10,21 @@ from eth_account.signers.local import LocalAccount
 from bootstrap.container import ApplicationContainer
 from constants.abi import ABI
 from constants.contracts import SWAP_ROUTER_ADDRESS, TOKENS
-from constants.delay import MAX_SLEEP, MIN_SLEEP
 from features.base import BaseFeature
-from models.configuration import SwapsSettings, AccountConfig
+from models.account_context import AccountContext
+from models.configuration import SwapsSettings
 from services.approval_service import ApprovalService
 from services.balance_checker import BalanceChecker
+from services.chain_head_tracker import ChainHeadTracker
 from services.swap_transaction_builder import SwapTransactionBuilder
 from services.explorer_helper import ExplorerHelper
+from services.gas_oracle import GasOracle
+from services.metrics import MetricsRegistry
+from services.tracer import Tracer
+from services.nonce_manager import NonceManager
+from services.receipt_tracker import ReceiptTracker
+from services.retry_policy import RetryPolicy, TransactionReverted
+from services.run_state_store import RunStateStore
 from services.web3_factory import Web3Factory
 
 class Swaps(BaseFeature):
@@ -26,12 +34,27 @@ class Swaps(BaseFeature):
         balance_checker: BalanceChecker = Provide[ApplicationContainer.balance_checker],
         settings: SwapsSettings = Provide[ApplicationContainer.swaps_settings],
         approval_service: ApprovalService = Provide[ApplicationContainer.approval_service],
+        nonce_manager: NonceManager = Provide[ApplicationContainer.nonce_manager],
+        gas_oracle: GasOracle = Provide[ApplicationContainer.gas_oracle],
+        chain_head_tracker: ChainHeadTracker = Provide[ApplicationContainer.chain_head_tracker],
+        receipt_tracker: ReceiptTracker = Provide[ApplicationContainer.receipt_tracker],
+        state_store: RunStateStore = Provide[ApplicationContainer.run_state_store],
+        metrics: MetricsRegistry = Provide[ApplicationContainer.metrics],
+        tracer: Tracer = Provide[ApplicationContainer.tracer],
         logger: Logger = Provide[ApplicationContainer.logger]
     ):
         self._balance_checker = balance_checker
         self._settings = settings
         self._logger = logger
         self._approval_service = approval_service
+        self._nonce_manager = nonce_manager
+        self._gas_oracle = gas_oracle
+        self._chain_head_tracker = chain_head_tracker
+        self._receipt_tracker = receipt_tracker
+        self._state_store = state_store
+        self._metrics = metrics
+        self._tracer = tracer
+        self._retry_policy = RetryPolicy(self.name, settings.retry, metrics, tracer, logger)
         self._pairs = [
             { 'in': 'PHRS', 'out': 'USDT' },
             { 'in': 'PHRS', 'out': 'USDC' },
@@ -49,25 +72,53 @@ class Swaps(BaseFeature):
     def name(self) -> str:
         return 'swaps'
 
-    async def execute(self, account_config: AccountConfig):
-        async with Web3Factory(account_config) as web3:
-            account = Account.from_key(account_config.private_key)
-            token_balances = await self._fetch_token_balances(account_config,account)
+    async def execute(self, context: AccountContext) -> bool:
+        account = context.account
+        count_of_swaps = await self._get_remaining_swaps(context)
+        if count_of_swaps <= 0:
+            self._logger.info(f'[{account.address}] All swaps of today are already done')
+            await self._state_store.mark_done(account.address, self.name)
+            return True
+
+        async with Web3Factory(context) as web3:
+            token_balances = await self._fetch_token_balances(context)
             self._logger.info(f'[{account.address}] Fetched tokens')
             self._display_token_balances(account, token_balances)
+            await self._approval_service.prefetch_allowances(
+                context,
+                [(TOKENS[token], SWAP_ROUTER_ADDRESS) for token in TOKENS]
+            )
 
-            count_of_swaps = random.randint(self._settings.count_of_swaps[0], self._settings.count_of_swaps[1])
             self._logger.info(f'[{account.address}] Will execute {count_of_swaps} swaps')
-            sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)   
-            self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before swapping')
-            await asyncio.sleep(sleep_time)
-            for i in range(count_of_swaps):
-                self._logger.info(f'[{account.address}] Executing swap #{i + 1}')
-                await self._execute_swap(account_config, account, web3)
+            await self._pause(account.address, 'before swapping')
+            if self._settings.pipeline:
+                await self._execute_pipelined_swaps(context, web3, dict(token_balances), count_of_swaps)
+            else:
+                for i in range(count_of_swaps):
+                    if i > 0:
+                        await self._pause(account.address, 'before next swap')
+                    self._logger.info(f'[{account.address}] Executing swap #{i + 1}')
+                    await self._execute_swap(context, web3)
 
-        
-    async def _execute_swap(self, account_config: AccountConfig, account: LocalAccount, web3: AsyncWeb3) -> None:
-        valid_tokens = await self._filter_out_insufficient_balances(account_config, account)
+        # Failed swaps are not counted, so the account is retried until the quota is reached
+        if not await self._state_store.mark_done_if_reached(account.address, self.name):
+            self._logger.warning(f'[{account.address}] Not all swaps of today succeeded, the rest is left for the next run')
+            return False
+        return True
+
+    async def _get_remaining_swaps(self, context: AccountContext) -> int:
+        # The quota is drawn once per day, so a rerun only executes the swaps that are left
+        progress = await self._state_store.get_progress(context.address, self.name)
+        target = progress.target
+        if target is None:
+            target = random.randint(self._settings.count_of_swaps[0], self._settings.count_of_swaps[1])
+            await self._state_store.set_target(context.address, self.name, target)
+        return target - progress.completed
+
+    async def _execute_swap(self, context: AccountContext, web3: AsyncWeb3) -> None:
+        account = context.account
+        balances = await self._balance_checker.get_account_balances(context)
+        valid_tokens = self._filter_out_insufficient_balances(account, balances)
             
         valid_pairs = [pair for pair in self._pairs if pair['in'] in valid_tokens]
         
@@ -76,74 +127,176 @@ class Swaps(BaseFeature):
             return
             
         pair = random.choice(valid_pairs)
-        balance, decimals = await self._balance_checker.get_balance(account_config, TOKENS[pair['in']], account) \
-                            if pair['in'] != 'PHRS' \
-                            else await self._balance_checker.get_native_balance(account, account_config)
+        balance, decimals = balances[pair['in']]
         
         swap_percentage = random.randint(self._settings.percentage_of_balance[0], self._settings.percentage_of_balance[1])
         swap_amount = int(balance * swap_percentage / 100)
         
-        for i in range(self._settings.retry_count):
-            self._logger.info(f'[{account.address}] Attempt {i + 1}: Swapping {(swap_amount / 10 ** decimals):.4f} {pair["in"]} to {pair["out"]}')
+        for attempt in self._retry_policy.attempts(self._settings.retry_count):
+            self._logger.info(f'[{account.address}] Attempt {attempt.number}: Swapping {(swap_amount / 10 ** decimals):.4f} {pair["in"]} to {pair["out"]}')
             try:
                 if pair['in'] != 'PHRS':
-                    await self._approval_service.approve_token(account_config, account, TOKENS[pair['in']], SWAP_ROUTER_ADDRESS, swap_amount)
+                    await self._approval_service.approve_token(context, TOKENS[pair['in']], SWAP_ROUTER_ADDRESS, swap_amount)
+                
+                tx_hash = await self._send_swap(context, web3, pair, swap_amount)
+                with self._metrics.transaction_stage('swap', 'confirm') as measurement, self._tracer.span('swap confirm', 'confirm'):
+                    receipt = await self._receipt_tracker.wait_for_receipt(tx_hash)
+                    if receipt['status'] != 1:
+                        measurement.outcome = 'reverted'
+                await self._state_store.record_transaction(account.address, self.name, tx_hash.to_0x_hex(), receipt['status'] == 1)
                 
+                tx_url = ExplorerHelper.get_tx_url(tx_hash)
+                
+                if receipt['status'] != 1:
+                    self._logger.error(f'[{account.address}] ❌ Swap transaction failed: {tx_url}')
+                    raise TransactionReverted(f'Swap transaction {tx_url} reverted')
+                self._logger.success(f'[{account.address}] ✅ Swap transaction was successful: {tx_url}')
+                break
+            except Exception as e:
+                self._logger.error(f'[{account.address}] Error during a swap: {e}')
+                if pair['in'] != 'PHRS':
+                    await self._approval_service.invalidate_on_error(context, e, TOKENS[pair['in']], SWAP_ROUTER_ADDRESS)
+                if not await attempt.backoff(e, account.address):
+                    break
+
+    async def _pause(self, address: str, reason: str) -> None:
+        # Pacing between successful actions, retries wait according to the retry policy instead
+        sleep_time = random.randint(self._settings.pause_between_actions[0], self._settings.pause_between_actions[1])
+        self._logger.info(f'[{address}] Sleeping for {sleep_time} seconds {reason}')
+        self._metrics.increment('pharos_sleep_seconds_total', sleep_time, feature=self.name)
+        await self._tracer.sleep(sleep_time)
+
+    async def _execute_pipelined_swaps(
+        self,
+        context: AccountContext,
+        web3: AsyncWeb3,
+        balances: dict[str, Tuple[int, int]],
+        count_of_swaps: int
+    ) -> None:
+        """
+        Send all swaps back to back and confirm them together.
+
+        The swaps are planned from one balance snapshot and at most `max_in_flight` of
+        them are unconfirmed at a time. Once a swap fails, the swaps that were not sent
+        yet are cancelled.
+        """
+        account = context.account
+        plan = self._plan_swaps(balances, count_of_swaps)
+        if not plan:
+            self._logger.warning(f'[{account.address}] No valid pairs found for swapping')
+            return
+
+        # Approvals have to be mined before the swaps spending the tokens can be estimated
+        approvals: dict[str, int] = {}
+        for pair, amount in plan:
+            if pair['in'] != 'PHRS':
+                approvals[pair['in']] = approvals.get(pair['in'], 0) + amount
+        for token, amount in approvals.items():
+            try:
+                await self._approval_service.approve_token(context, TOKENS[token], SWAP_ROUTER_ADDRESS, amount)
+            except Exception as e:
+                self._logger.error(f'[{account.address}] Failed to approve {token}, dropping its swaps: {e}')
+                plan = [(pair, amount) for pair, amount in plan if pair['in'] != token]
+
+        window = asyncio.Semaphore(self._settings.max_in_flight)
+        failed = asyncio.Event()
+        confirmations = []
+        for i, (pair, amount) in enumerate(plan):
+            await window.acquire()
+            if failed.is_set():
+                window.release()
+                self._logger.warning(f'[{account.address}] Cancelling {len(plan) - i} unsent swaps after a failed swap')
+                break
+
+            decimals = balances[pair['in']][1]
+            self._logger.info(f'[{account.address}] Sending swap #{i + 1}/{len(plan)}: {(amount / 10 ** decimals):.4f} {pair["in"]} to {pair["out"]}')
+            try:
+                tx_hash = await self._send_swap(context, web3, pair, amount)
+            except Exception as e:
+                window.release()
+                self._logger.error(f'[{account.address}] Error during a swap: {e}')
+                if pair['in'] != 'PHRS':
+                    await self._approval_service.invalidate_on_error(context, e, TOKENS[pair['in']], SWAP_ROUTER_ADDRESS)
+                failed.set()
+                continue
+
+            confirmations.append(asyncio.create_task(self._confirm_swap(context, tx_hash, window, failed)))
+
+        await asyncio.gather(*confirmations)
+
+    def _plan_swaps(self, balances: dict[str, Tuple[int, int]], count_of_swaps: int) -> list[Tuple[dict[str, str], int]]:
+        # Outputs are not credited, so every planned swap is covered by the snapshot alone
+        remaining = {token: balance for token, (balance, _) in balances.items()}
+        plan = []
+        for _ in range(count_of_swaps):
+            valid_tokens = [token for token, balance in remaining.items() if balance / 10 ** balances[token][1] > 0.001]
+            valid_pairs = [pair for pair in self._pairs if pair['in'] in valid_tokens]
+            if not valid_pairs:
+                break
+
+            pair = random.choice(valid_pairs)
+            swap_percentage = random.randint(self._settings.percentage_of_balance[0], self._settings.percentage_of_balance[1])
+            amount = int(remaining[pair['in']] * swap_percentage / 100)
+            remaining[pair['in']] -= amount
+            plan.append((pair, amount))
+
+        return plan
+
+    async def _confirm_swap(self, context: AccountContext, tx_hash: HexBytes, window: asyncio.Semaphore, failed: asyncio.Event) -> None:
+        tx_url = ExplorerHelper.get_tx_url(tx_hash)
+        try:
+            with self._metrics.transaction_stage('swap', 'confirm') as measurement, self._tracer.span('swap confirm', 'confirm'):
+                receipt = await self._receipt_tracker.wait_for_receipt(tx_hash)
+                if receipt['status'] != 1:
+                    measurement.outcome = 'reverted'
+            await self._state_store.record_transaction(context.address, self.name, tx_hash.to_0x_hex(), receipt['status'] == 1)
+            if receipt['status'] == 1:
+                self._logger.success(f'[{context.address}] ✅ Swap transaction was successful: {tx_url}')
+                return
+
+            self._logger.error(f'[{context.address}] ❌ Swap transaction failed: {tx_url}')
+        except Exception as e:
+            self._logger.error(f'[{context.address}] ❌ Swap transaction was not confirmed: {tx_url}: {e}')
+            # The nonce may still be pending, the next reservation resyncs it from the node
+            self._nonce_manager.invalidate(context.address)
+        finally:
+            window.release()
+        failed.set()
+
+    async def _send_swap(self, context: AccountContext, web3: AsyncWeb3, pair: dict[str, str], amount: int) -> HexBytes:
+        account = context.account
+        head = await self._chain_head_tracker.get_head()
+        async with self._nonce_manager.reserve(web3, account.address) as nonce:
+            with self._metrics.transaction_stage('swap', 'build'), self._tracer.span('swap build', 'transaction'):
                 transaction = await SwapTransactionBuilder() \
                     .with_in(pair['in']) \
                     .with_out(pair['out']) \
-                    .with_amount(swap_amount) \
+                    .with_amount(amount) \
                     .with_account(account) \
                     .with_web3(web3) \
+                    .with_nonce(nonce) \
+                    .with_gas_oracle(self._gas_oracle) \
+                    .with_deadline(head.timestamp + 1200) \
                     .with_router(SWAP_ROUTER_ADDRESS, ABI['swap_router']) \
                     .build()
-                
+
+            with self._metrics.transaction_stage('swap', 'sign'), self._tracer.span('swap sign', 'transaction'):
                 signed_tx = account.sign_transaction(transaction)
-                
-                tx_hash = await web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-                receipt = await web3.eth.wait_for_transaction_receipt(tx_hash)
-                
-                tx_url = ExplorerHelper.get_tx_url(tx_hash)
-                
-                if receipt['status'] == 1:
-                    self._logger.success(f'[{account.address}] ✅ Swap transaction was successful: {tx_url}')
-                    break
-                else:
-                    self._logger.error(f'[{account.address}] ❌ Swap transaction failed: {tx_url}')
-                
-            except Exception as e:
-                self._logger.error(f'[{account.address}] Error during a swap: {e}')
-            finally:
-                sleep_time = random.randint(MIN_SLEEP, MAX_SLEEP)   
-                self._logger.info(f'[{account.address}] Sleeping for {sleep_time} seconds before next swap')
-                await asyncio.sleep(sleep_time)
-
-    async def _fetch_token_balances(self, account_config: AccountConfig, account: LocalAccount) -> list[Tuple[str, Tuple[int, int]]]:
-        balances = []
-
-        native_balance, native_decimals = await self._balance_checker.get_native_balance(account, account_config)
-        balances.append(('PHRS', (native_balance, native_decimals)))
-        for token in TOKENS:
-            balance, decimals = await self._balance_checker.get_balance(account_config, TOKENS[token], account)
-            balances.append((token, (balance, decimals)))
-        
-        return balances
+            with self._metrics.transaction_stage('swap', 'send'), self._tracer.span('swap send', 'transaction'):
+                return await web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+    async def _fetch_token_balances(self, context: AccountContext) -> list[Tuple[str, Tuple[int, int]]]:
+        balances = await self._balance_checker.get_account_balances(context)
+        return list(balances.items())
     
     def _display_token_balances(self, account: LocalAccount, balances: list[Tuple[str, Tuple[int, int]]]) -> None:
         for token, (balance, decimals) in balances:
             formatted_balance = balance / 10 ** decimals
             self._logger.info(f'[{account.address}]: {formatted_balance:.4f} {token}')
 
-    async def _filter_out_insufficient_balances(self, account_config: AccountConfig, account: LocalAccount) -> list[str]:
+    def _filter_out_insufficient_balances(self, account: LocalAccount, balances: dict[str, Tuple[int, int]]) -> list[str]:
         filtered_tokens = []
-        balance, decimals = await self._balance_checker.get_native_balance(account, account_config)
-        if balance / 10 ** decimals > 0.001:
-            filtered_tokens.append('PHRS')
-        else:
-            self._logger.warning(f'[{account.address}] Insufficient balance for PHRS to swap')
-
-        for token in TOKENS:
-            balance, decimals = await self._balance_checker.get_balance(account_config, TOKENS[token], account)
+        for token, (balance, decimals) in balances.items():
             if balance / 10 ** decimals > 0.001:
                 filtered_tokens.append(token)
             else:
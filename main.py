@@ -1,13 +1,33 @@
+import sys
+
+# Installed before any other import, so that the profile covers all of them
+profiler = None
+if '--startup-profile' in sys.argv:
+    from startup_profile import ImportProfiler
+    profiler = ImportProfiler.install()
+
 import asyncio
 import urllib3
-import sys
 from loguru import logger
 import platform
 
 from bootstrap.container import container
-import runner
-from features import faucet, swaps, checkin, liquidity
-import services
+
+# Modules wired for every feature; features are imported and wired only when enabled
+FEATURE_MODULES = {
+    'faucet': ['features.faucet'],
+    'checkin': ['features.checkin'],
+    'swaps': ['features.swaps', 'services.web3_factory'],
+    'liquidity': ['features.liquidity', 'services.web3_factory'],
+}
+# Services closed on shutdown, if their module was loaded by an enabled feature
+CLOSEABLE_SERVICES = {
+    'services.captcha_pool': container.captcha_pool,
+    'services.pharos_api_client': container.pharos_api_client,
+    'services.receipt_tracker': container.receipt_tracker,
+    'services.chain_head_tracker': container.chain_head_tracker,
+    'services.rpc_session_pool': container.rpc_session_pool,
+}
 
 log_format = (
     "<light-blue>[</light-blue><yellow>{time:HH:mm:ss}</yellow><light-blue>]</light-blue> | "
@@ -15,18 +35,46 @@ log_format = (
     "<cyan>{file}:{line}</cyan> | "
     "<level>{message}</level>"
 )
+shard_log_format = "[shard {extra[shard]}] {time:HH:mm:ss} | {level: <8} | {file}:{line} | {message}"
 
 def configure():
     container.init_resources()
-    container.wire(modules=[runner, swaps, checkin, faucet, services, liquidity, __name__])
+    modules = {
+        module
+        for name in container.configuration().settings.enabled_features
+        for module in FEATURE_MODULES[name]
+    }
+    container.wire(modules=['runner', *sorted(modules), __name__])
 
-async def start():
+async def start() -> int:
     runner = container.runner()
-    await runner.run()
+    if profiler is not None:
+        profiler.report(logger)
+    metrics = container.metrics()
+    tracer = container.tracer()
+    await metrics.start()
+    try:
+        await runner.run()
+    finally:
+        await metrics.close()
+        await tracer.close()
+        for module, service in CLOSEABLE_SERVICES.items():
+            # Creating an unused service only to close it would import its dependencies
+            if module in sys.modules:
+                await service().close()
+    return 1 if runner.failed_accounts else 0
 
-async def main():
+async def main() -> int:
     urllib3.disable_warnings()
+    run_options = container.run_options()
     logger.remove()
+    if run_options.is_shard:
+        # The supervisor relays this output to its own console and log file
+        logger.configure(extra={'shard': run_options.shard_index})
+        logger.add(sys.stdout, colorize=False, format=shard_log_format)
+        configure()
+        return await start()
+
     logger.add(
         sys.stdout,
         colorize=True,
@@ -40,12 +88,17 @@ async def main():
         level="INFO",
     )
 
+    if run_options.workers > 1:
+        from sharding import ShardSupervisor
+        return await ShardSupervisor(run_options, logger).run()
+
     configure()
-    await start()
+    return await start()
 
 
 if __name__ == '__main__':
-    if platform.system() == 'Windows':
-        # Use SelectorEventLoop instead of ProactorEventLoop on Windows
+    if platform.system() == 'Windows' and container.run_options().workers <= 1:
+        # Use SelectorEventLoop instead of ProactorEventLoop on Windows; the shard
+        # supervisor keeps the Proactor loop, only it can spawn subprocesses there
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    asyncio.run(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+from models.configuration import AccountConfig
+
+if TYPE_CHECKING:
+    from eth_account.signers.local import LocalAccount
+    from eth_typing import ChecksumAddress
+
+@dataclass
+class AccountContext:
+    config: AccountConfig
+    account: 'LocalAccount'
+    proxy: Optional[str]
+    captcha_proxy: Optional[dict[str, str]]
+    cache: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def address(self) -> 'ChecksumAddress':
+        return self.account.address
+
+    @property
+    def auth_key(self) -> str:
+        return self.config.auth_key
+
+    @classmethod
+    def from_config(cls, config: AccountConfig) -> 'AccountContext':
+        # Imported on first use, the web3 stack is the largest part of the startup time
+        from eth_account import Account
+
+        proxy = config.proxy or None
+        return cls(
+            config=config,
+            account=Account.from_key(config.private_key),
+            proxy=proxy,
+            captcha_proxy={
+                "type": "HTTP",
+                "uri": proxy.replace('http://', '')
+            } if proxy else None
+        )
@@ -0,0 +1,6 @@
+from dataclasses import dataclass
+
+@dataclass
+class CaptchaToken:
+    value: str
+    expires_at: float
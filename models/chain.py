@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class ChainHead:
+    number: int
+    timestamp: int
+    base_fee: Optional[int]
+    observed_at: float
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 from enum import Enum
 
@@ -8,12 +8,26 @@ class AccountConfig:
     proxy: Optional[str]
     auth_key: str
 
+@dataclass
+class RetrySettings:
+    base_delay: float = 2
+    max_delay: float = 60
+    multiplier: float = 2
+    rate_limit_delay: float = 30
+    budget_ratio: float = 0.2
+    budget_burst: int = 10
+
 @dataclass
 class SwapsSettings:
     percentage_of_balance: list[int]
     count_of_swaps: list[int]
     swap_back_to_native: bool
     retry_count: int
+    enabled: bool = True
+    pipeline: bool = False
+    max_in_flight: int = 3
+    retry: RetrySettings = field(default_factory=RetrySettings)
+    pause_between_actions: list[int] = field(default_factory=lambda: [3, 30])
 
 @dataclass
 class FaucetSettings:
@@ -21,6 +35,10 @@ class FaucetSettings:
     twocaptcha_key: str
     retry_captcha: int
     retry_count: int
+    captcha_pool_size: int = 0
+    captcha_token_ttl: int = 110
+    captcha_parallel_solves: int = 5
+    retry: RetrySettings = field(default_factory=RetrySettings)
 
 @dataclass
 class LiquiditySettings:
@@ -30,6 +48,10 @@ class LiquiditySettings:
     retry_count: int
     remove: bool
     slippage: int
+    pools_ttl: int = 300
+    pools_cache_path: str = 'data/cache/pools.json'
+    retry: RetrySettings = field(default_factory=RetrySettings)
+    pause_between_actions: list[int] = field(default_factory=lambda: [3, 30])
 
 class AccountsMode(Enum):
     SEQUENTIAL = 'sequential'
@@ -40,6 +62,102 @@ class CheckinSettings:
     enabled: bool
     retry_count: int
     pause_between_attempts: list[int]
+    retry: RetrySettings = field(default_factory=RetrySettings)
+
+class GasMode(Enum):
+    LATEST = 'latest'
+    FEE_HISTORY = 'fee_history'
+
+@dataclass
+class GasSettings:
+    mode: GasMode = GasMode.LATEST
+    ttl: float = 2
+    fee_history_blocks: int = 10
+    fee_history_percentile: int = 50
+
+@dataclass
+class RpcSettings:
+    connection_limit: int = 100
+    idle_timeout: int = 300
+    request_timeout: int = 30
+    batch_requests: bool = False
+    batch_window_ms: int = 10
+    batch_max_size: int = 50
+    head_poll_min_interval: float = 0.5
+    head_poll_max_interval: float = 5
+    endpoints: list[str] = field(default_factory=list)
+    write_endpoint: Optional[str] = None
+    eject_after_errors: int = 3
+    eject_seconds: float = 30
+    max_eject_seconds: float = 300
+    latency_decay: float = 0.2
+
+@dataclass
+class ReceiptSettings:
+    timeout: float = 120
+    fallback_interval: float = 5
+    max_blocks_per_poll: int = 20
+
+@dataclass
+class ConcurrencySettings:
+    max_accounts: int = 50
+    min_accounts: int = 1
+    initial_accounts: int = 10
+    adaptive: bool = True
+    target_latency_ms: int = 2000
+    max_error_rate: float = 0.05
+    decrease_factor: float = 0.5
+    adjust_interval: float = 10
+
+@dataclass
+class ApiSettings:
+    http2: bool = False
+    request_timeout: float = 30
+    connect_timeout: float = 10
+    max_connections: int = 100
+    keepalive_expiry: float = 30
+
+@dataclass
+class MetricsSettings:
+    port: Optional[int] = None
+    host: str = '127.0.0.1'
+    path: Optional[str] = None
+    interval: float = 15
+
+class TraceFormat(Enum):
+    CHROME = 'chrome'
+    OTLP = 'otlp'
+
+@dataclass
+class TracingSettings:
+    enabled: bool = False
+    path: str = 'logs/trace.json'
+    format: TraceFormat = TraceFormat.CHROME
+    summary_accounts: int = 10
+    max_spans: int = 1_000_000
+
+@dataclass
+class RateLimit:
+    rate: float
+    burst: int = 1
+
+    def __post_init__(self):
+        if self.rate <= 0:
+            raise ValueError(f'Rate limit rate must be positive, got {self.rate}')
+        if self.burst < 1:
+            raise ValueError(f'Rate limit burst must be at least 1, got {self.burst}')
+
+@dataclass
+class RateLimitSettings:
+    hosts: dict[str, RateLimit] = field(default_factory=dict)
+    default_host: Optional[RateLimit] = None
+    proxy: Optional[RateLimit] = None
+    account: Optional[RateLimit] = None
+
+@dataclass
+class DaemonSettings:
+    retry_delay: int = 900
+    jitter: int = 3600
 
 @dataclass
 class Settings:
@@ -49,9 +167,29 @@ class Settings:
     checkin: CheckinSettings
     accounts_mode: AccountsMode = AccountsMode.SEQUENTIAL
     randomize_feature_order: bool = False
+    allowance_cache_path: str = 'data/cache/allowances.sqlite'
+    state_db_path: str = 'data/state.sqlite'
+    rpc: RpcSettings = field(default_factory=RpcSettings)
+    gas: GasSettings = field(default_factory=GasSettings)
+    receipts: ReceiptSettings = field(default_factory=ReceiptSettings)
+    concurrency: ConcurrencySettings = field(default_factory=ConcurrencySettings)
+    api: ApiSettings = field(default_factory=ApiSettings)
+    metrics: MetricsSettings = field(default_factory=MetricsSettings)
+    tracing: TracingSettings = field(default_factory=TracingSettings)
+    daemon: DaemonSettings = field(default_factory=DaemonSettings)
+    rate_limits: RateLimitSettings = field(default_factory=RateLimitSettings)
+
+    @property
+    def enabled_features(self) -> list[str]:
+        """Names of the enabled features, in execution order."""
+        return [
+            name for name in ('faucet', 'checkin', 'swaps', 'liquidity')
+            if getattr(self, name).enabled
+        ]
 
 @dataclass
 class Configuration:
-    accounts: list[AccountConfig]
     settings: Settings
+    accounts: list[AccountConfig] = field(default_factory=list)
+    accounts_file: Optional[str] = None
 
@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class RunOptions:
+    workers: int = 1
+    shard_index: int = 0
+    shard_count: int = 1
+    lease_db: Optional[str] = None
+    run_id: Optional[str] = None
+    lease_ttl: int = 7200
+    startup_profile: bool = False
+    daemon: bool = False
+
+    @property
+    def is_shard(self) -> bool:
+        return self.shard_count > 1
+
+    def includes(self, position: int) -> bool:
+        return position % self.shard_count == self.shard_index
@@ -0,0 +1,8 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class FeatureProgress:
+    done: bool = False
+    completed: int = 0
+    target: Optional[int] = None
@@ -1,64 +1,319 @@
 from abc import ABC, abstractmethod
+from typing import Iterator, Optional
 import random
 import asyncio
+import time
 
-import inject
 from features.base import BaseFeature
+from models.account_context import AccountContext
 from models.configuration import Configuration, AccountsMode, AccountConfig, Settings
+from models.run_options import RunOptions
 from loguru._logger import Logger
+from services.account_lease_table import AccountLeaseTable
+from services.account_source import AccountSource
+from services.concurrency_controller import ConcurrencyController
+from services.job_scheduler import JobScheduler
+from services.metrics import MetricsRegistry
+from services.run_state_store import RunStateStore
+from services.tracer import Tracer
 
 class BaseRunner(ABC):
-    def __init__(self, features: list[BaseFeature]):
+    def __init__(
+        self,
+        features: list[BaseFeature],
+        configuration: Configuration,
+        account_source: AccountSource,
+        logger: Logger,
+        run_options: RunOptions,
+        state_store: RunStateStore,
+        metrics: MetricsRegistry,
+        tracer: Tracer,
+        lease_table: Optional[AccountLeaseTable] = None
+    ):
         self._features = features
+        self._configuration = configuration
+        self._account_source = account_source
+        self._logger = logger
+        self._run_options = run_options
+        self._state_store = state_store
+        self._metrics = metrics
+        self._tracer = tracer
+        self._lease_table = lease_table
+        self.processed_accounts = 0
+        self.failed_accounts = 0
 
     @abstractmethod
     async def run(self):
         pass
 
-    async def _run_account(self, account: AccountConfig, settings: Settings):
+    def _accounts(self) -> Iterator[AccountConfig]:
+        """Accounts of this shard; all of them unless the run is split across processes."""
+        for position, account in enumerate(self._account_source):
+            if self._run_options.includes(position):
+                yield account
+
+    async def _process_account(self, account: AccountConfig, settings: Settings):
+        if self._lease_table is None:
+            self._record_result(await self._run_account(account, settings))
+            return
+
+        # A failing lease table (e.g. the shared file is locked) fails the account, not the worker
+        try:
+            claimed = await self._lease_table.claim(account)
+        except Exception as e:
+            self._logger.exception(f'Failed to claim the account lease: {e}')
+            self._record_result(False)
+            return
+        if not claimed:
+            self._logger.info('Account is already claimed in this run, skipping')
+            return
+
+        heartbeat = asyncio.create_task(self._renew_lease(account))
+        try:
+            success = await self._run_account(account, settings)
+        finally:
+            heartbeat.cancel()
+        self._record_result(success)
+        try:
+            await self._lease_table.complete(account, success)
+        except Exception as e:
+            self._logger.exception(f'Failed to complete the account lease: {e}')
+
+    async def _renew_lease(self, account: AccountConfig):
+        while True:
+            await asyncio.sleep(self._lease_table.renew_interval)
+            try:
+                await self._lease_table.renew(account)
+            except Exception as e:
+                self._logger.warning(f'Failed to renew the account lease: {e}')
+
+    def _record_result(self, success: bool):
+        self.processed_accounts += 1
+        self._metrics.increment('pharos_accounts_total', outcome='success' if success else 'failure')
+        if not success:
+            self.failed_accounts += 1
+
+    async def _run_account(self, account: AccountConfig, settings: Settings) -> bool:
         features: list[BaseFeature] = self._features
         if settings.randomize_feature_order:
-            features = random.shuffle(self._features)
-        
-        for feature in features:
-            self._logger.info(f'Running feature: {feature.name}')
-            await feature.execute(account)
-            
+            # A per-account copy, the feature list is shared by every account
+            features = random.sample(self._features, len(self._features))
+
+        try:
+            # Shared by every feature, so the key is derived once per account
+            context = AccountContext.from_config(account)
+        except Exception as e:
+            self._logger.exception(f'Account run failed: {e}')
+            return False
+        return await self._run_features(context, features)
+
+    async def _run_features(self, context: AccountContext, features: list[BaseFeature]) -> bool:
+        try:
+            with self._tracer.account(context.address):
+                for feature in features:
+                    if (await self._state_store.get_progress(context.address, feature.name)).done:
+                        self._logger.info(f'[{context.address}] Feature {feature.name} already finished today, skipping')
+                        continue
+                    self._logger.info(f'Running feature: {feature.name}')
+                    with self._metrics.measure('pharos_feature_run', feature=feature.name) as measurement, self._tracer.span(feature.name, 'feature'):
+                        if not await feature.execute(context):
+                            measurement.outcome = 'failure'
+        except Exception as e:
+            self._logger.exception(f'Account run failed: {e}')
+            return False
+        return True
+
 
 class ParallelRunner(BaseRunner):
-    def __init__(self, features: list[BaseFeature], configuration: Configuration, logger: Logger):
-        super().__init__(features)
-        self._configuration = configuration
-        self._logger = logger
+    def __init__(
+        self,
+        features: list[BaseFeature],
+        configuration: Configuration,
+        account_source: AccountSource,
+        logger: Logger,
+        run_options: RunOptions,
+        state_store: RunStateStore,
+        metrics: MetricsRegistry,
+        tracer: Tracer,
+        lease_table: Optional[AccountLeaseTable],
+        concurrency_controller: ConcurrencyController
+    ):
+        super().__init__(features, configuration, account_source, logger, run_options, state_store, metrics, tracer, lease_table)
+        self._concurrency_controller = concurrency_controller
 
     async def run(self):
-        self._logger.info(f"Running in parallel, number of accounts: {len(self._configuration.accounts)}")
-        tasks = [
-            self._run_account(account, self._configuration.settings)
-            for account in self._configuration.accounts
-        ]
-        await asyncio.gather(*tasks)
+        concurrency = self._configuration.settings.concurrency
+        self._logger.info(f"Running in parallel, max concurrent accounts: {concurrency.max_accounts}")
+        # Bounded, so that only the accounts about to be processed are read from the source
+        queue: asyncio.Queue[Optional[AccountConfig]] = asyncio.Queue(maxsize=concurrency.max_accounts)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(concurrency.max_accounts)]
+        producer = asyncio.create_task(self._produce(queue, len(workers)))
+        try:
+            await asyncio.gather(producer, *workers)
+        finally:
+            for task in (producer, *workers):
+                task.cancel()
+            await self._concurrency_controller.close()
+        self._logger.info(f"Processed {self.processed_accounts} accounts, failed: {self.failed_accounts}")
+
+    async def _produce(self, queue: asyncio.Queue[Optional[AccountConfig]], worker_count: int):
+        for account in self._accounts():
+            await queue.put(account)
+        for _ in range(worker_count):
+            await queue.put(None)
+
+    async def _worker(self, queue: asyncio.Queue[Optional[AccountConfig]]):
+        while (account := await queue.get()) is not None:
+            async with self._concurrency_controller.slot():
+                await self._process_account(account, self._configuration.settings)
 
 class SequentialRunner(BaseRunner):
-    def __init__(self, features: list[BaseFeature], configuration: Configuration, logger: Logger):
-        super().__init__(features)
-        self._configuration = configuration
-        self._logger = logger
+    async def run(self):
+        self._logger.info("Running sequentially")
+        for account in self._accounts():
+            await self._process_account(account, self._configuration.settings)
+        self._logger.info(f"Processed {self.processed_accounts} accounts, failed: {self.failed_accounts}")
+
+class DaemonRunner(BaseRunner):
+    """
+    Runs until stopped, executing the features of every account when they are due.
+
+    After a run, a feature is rescheduled at the next faucet claim reported by the
+    API, at a random time after the next UTC midnight once today's work is done,
+    or after `daemon.retry_delay` seconds if it is not.
+    """
+
+    def __init__(
+        self,
+        features: list[BaseFeature],
+        configuration: Configuration,
+        account_source: AccountSource,
+        logger: Logger,
+        run_options: RunOptions,
+        state_store: RunStateStore,
+        metrics: MetricsRegistry,
+        tracer: Tracer,
+        concurrency_controller: ConcurrencyController,
+        job_scheduler: JobScheduler
+    ):
+        super().__init__(features, configuration, account_source, logger, run_options, state_store, metrics, tracer)
+        self._concurrency_controller = concurrency_controller
+        self._job_scheduler = job_scheduler
 
     async def run(self):
-        self._logger.info(f"Running sequentially, number of accounts: {len(self._configuration.accounts)}")
-        for account in self._configuration.accounts:
-            await self._run_account(account, self._configuration.settings)
-        pass
+        # Keyed like the lease table, so the keys of accounts that are not due are never derived
+        accounts = {AccountLeaseTable.account_key(account): account for account in self._accounts()}
+        await self._job_scheduler.load(accounts.keys(), [feature.name for feature in self._features])
+        concurrency = self._configuration.settings.concurrency
+        self._logger.info(f"Running as a daemon with {len(accounts)} accounts, max concurrent accounts: {concurrency.max_accounts}")
+        workers = [asyncio.create_task(self._worker(accounts)) for _ in range(concurrency.max_accounts)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await self._concurrency_controller.close()
+
+    async def _worker(self, accounts: dict[str, AccountConfig]):
+        while True:
+            account_key, due_features = await self._job_scheduler.next_jobs()
+            features = [feature for feature in self._features if feature.name in due_features]
+            if self._configuration.settings.randomize_feature_order:
+                random.shuffle(features)
+            async with self._concurrency_controller.slot():
+                due_times = await self._run_jobs(accounts[account_key], features)
+            await self._job_scheduler.reschedule(account_key, due_times)
+
+    async def _run_jobs(self, account: AccountConfig, features: list[BaseFeature]) -> dict[str, float]:
+        try:
+            context = AccountContext.from_config(account)
+        except Exception as e:
+            self._logger.exception(f'Account run failed: {e}')
+            return {feature.name: self._job_scheduler.retry_at() for feature in features}
+
+        success = await self._run_features(context, features)
+        self.processed_accounts += 1
+        self._metrics.increment('pharos_accounts_total', outcome='success' if success else 'failure')
+        due_times = {}
+        for feature in features:
+            outcome, due_times[feature.name] = await self._next_due(context, feature.name)
+            self._metrics.increment('pharos_jobs_total', feature=feature.name, outcome=outcome)
+        return due_times
+
+    async def _next_due(self, context: AccountContext, feature: str) -> tuple[str, float]:
+        if feature == 'faucet':
+            next_claim_at = await self._state_store.get_next_faucet_claim(context.address)
+            if next_claim_at is not None and next_claim_at > time.time():
+                return 'waiting', next_claim_at
+        if (await self._state_store.get_progress(context.address, feature)).done:
+            return 'done', self._job_scheduler.next_day()
+        return 'retry', self._job_scheduler.retry_at()
 
 class RunnerFactory:
-    def __init__(self, features: list[BaseFeature], configuration: Configuration, logger: Logger):
+    def __init__(
+        self,
+        features: list[BaseFeature],
+        configuration: Configuration,
+        account_source: AccountSource,
+        logger: Logger,
+        run_options: RunOptions,
+        lease_table: Optional[AccountLeaseTable],
+        state_store: RunStateStore,
+        metrics: MetricsRegistry,
+        tracer: Tracer,
+        concurrency_controller: ConcurrencyController,
+        job_scheduler: JobScheduler
+    ):
         self._configuration = configuration
+        self._account_source = account_source
         self._logger = logger
         self._features = features
+        self._run_options = run_options
+        self._state_store = state_store
+        self._lease_table = lease_table
+        self._metrics = metrics
+        self._tracer = tracer
+        self._concurrency_controller = concurrency_controller
+        self._job_scheduler = job_scheduler
 
     def create(self) -> BaseRunner:
+        if self._run_options.daemon:
+            return DaemonRunner(
+                self._features,
+                self._configuration,
+                self._account_source,
+                self._logger,
+                self._run_options,
+                self._state_store,
+                self._metrics,
+                self._tracer,
+                self._concurrency_controller,
+                self._job_scheduler
+            )
+
         if self._configuration.settings.accounts_mode == AccountsMode.PARALLEL:
-            return ParallelRunner(self._features, self._configuration, self._logger)
+            return ParallelRunner(
+                self._features,
+                self._configuration,
+                self._account_source,
+                self._logger,
+                self._run_options,
+                self._state_store,
+                self._metrics,
+                self._tracer,
+                self._lease_table,
+                self._concurrency_controller
+            )
+
+        return SequentialRunner(
+            self._features,
+            self._configuration,
+            self._account_source,
+            self._logger,
+            self._run_options,
+            self._state_store,
+            self._metrics,
+            self._tracer,
+            self._lease_table
+        )
 
-        return SequentialRunner(self._features, self._configuration, self._logger)
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+
+from models.configuration import AccountConfig
+
+
+class AccountLeaseTable:
+    """
+    Lease table in a shared SQLite file that lets several processes or hosts split one run.
+
+    An account is processed by whoever inserts its lease row first. The owner renews
+    the lease every `renew_interval` seconds while it processes the account, so only
+    the leases of crashed workers expire after `ttl` seconds and can then be claimed
+    again; finished accounts are never handed out twice within the same run id.
+    """
+
+    def __init__(self, path: str, run_id: str, ttl: int):
+        self._path = path
+        self._run_id = run_id
+        self._ttl = ttl
+        self._owner = f'{socket.gethostname()}:{os.getpid()}'
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS account_leases ('
+                ' run_id TEXT NOT NULL,'
+                ' account_key TEXT NOT NULL,'
+                ' owner TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' PRIMARY KEY (run_id, account_key))'
+            )
+
+    @property
+    def renew_interval(self) -> float:
+        # A third of the TTL, so that a missed renewal does not cost the lease yet
+        return self._ttl / 3
+
+    @staticmethod
+    def account_key(account: AccountConfig) -> str:
+        # Never store the private key itself in a shared file
+        return hashlib.sha256(account.private_key.encode()).hexdigest()
+
+    async def claim(self, account: AccountConfig) -> bool:
+        return await asyncio.to_thread(self._claim, self.account_key(account))
+
+    async def renew(self, account: AccountConfig) -> None:
+        await asyncio.to_thread(self._renew, self.account_key(account))
+
+    async def complete(self, account: AccountConfig, success: bool) -> None:
+        await asyncio.to_thread(self._complete, self.account_key(account), 'done' if success else 'failed')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=30, isolation_level=None)
+
+    def _claim(self, account_key: str) -> bool:
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO account_leases (run_id, account_key, owner, status, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (self._run_id, account_key, self._owner, 'leased', now + self._ttl)
+                )
+                if cursor.rowcount == 0:
+                    cursor = connection.execute(
+                        'UPDATE account_leases SET owner = ?, expires_at = ? '
+                        'WHERE run_id = ? AND account_key = ? AND status = ? AND expires_at < ?',
+                        (self._owner, now + self._ttl, self._run_id, account_key, 'leased', now)
+                    )
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            return cursor.rowcount == 1
+
+    def _renew(self, account_key: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE account_leases SET expires_at = ? '
+                'WHERE run_id = ? AND account_key = ? AND owner = ? AND status = ?',
+                (time.time() + self._ttl, self._run_id, account_key, self._owner, 'leased')
+            )
+
+    def _complete(self, account_key: str, status: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE account_leases SET status = ? WHERE run_id = ? AND account_key = ? AND owner = ?',
+                (status, self._run_id, account_key, self._owner)
+            )
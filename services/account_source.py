@@ -0,0 +1,81 @@
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+from models.configuration import AccountConfig, Configuration
+
+
+class AccountSource(ABC):
+    """
+    Iterable of the accounts to process.
+
+    Every iteration starts from the first account, file based sources read the
+    file lazily so that only the accounts in progress are held in memory.
+    """
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[AccountConfig]:
+        pass
+
+
+class InlineAccountSource(AccountSource):
+    """Accounts listed under `accounts` in the configuration file."""
+
+    def __init__(self, accounts: list[AccountConfig]):
+        self._accounts = accounts
+
+    def __iter__(self) -> Iterator[AccountConfig]:
+        return iter(self._accounts)
+
+
+class CsvAccountSource(AccountSource):
+    """CSV file with a `private_key,proxy,auth_key` header row."""
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def __iter__(self) -> Iterator[AccountConfig]:
+        with open(self._path, newline='') as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield _to_account(row, self._path, reader.line_num)
+
+
+class JsonlAccountSource(AccountSource):
+    """File with one JSON object per line, using the keys of the inline accounts."""
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def __iter__(self) -> Iterator[AccountConfig]:
+        with open(self._path) as file:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield _to_account(json.loads(line), self._path, line_number)
+
+
+def _to_account(row: dict, path: str, line_number: int) -> AccountConfig:
+    # Built directly instead of through dacite, which is too slow for large files
+    try:
+        return AccountConfig(
+            private_key=row['private_key'],
+            proxy=row.get('proxy') or None,
+            auth_key=row['auth_key']
+        )
+    except KeyError as e:
+        raise ValueError(f'{path}:{line_number}: missing account field {e}') from None
+
+
+def create_account_source(configuration: Configuration) -> AccountSource:
+    path = configuration.accounts_file
+    if path is None:
+        return InlineAccountSource(configuration.accounts)
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return CsvAccountSource(path)
+    if extension in ('.jsonl', '.ndjson'):
+        return JsonlAccountSource(path)
+    raise ValueError(f'Unsupported accounts file {path}, expected a .csv or .jsonl file')
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import re
+import sqlite3
+
+from loguru._logger import Logger
+
+# Allowances at or above this value are not used up by transfers in practice
+UNLIMITED_ALLOWANCE = 2 ** 255
+
+
+class AllowanceCache:
+    """
+    Persistent set of (owner, token, spender) triples with an effectively unlimited allowance.
+
+    Only unlimited allowances are cached: transfers do not use them up, so an entry stays
+    valid until a transfer fails with an allowance error and the entry is invalidated.
+    Entries are stored in a SQLite file and loaded on startup.
+    """
+
+    def __init__(self, path: str, logger: Logger):
+        self._path = path
+        self._logger = logger
+        self._allowances: set[tuple[str, str, str]] = set()
+        if self._path:
+            self._load()
+
+    def is_unlimited(self, owner: str, token: str, spender: str) -> bool:
+        return self._key(owner, token, spender) in self._allowances
+
+    async def record(self, owner: str, token: str, spender: str, allowance: int) -> None:
+        key = self._key(owner, token, spender)
+        if allowance >= UNLIMITED_ALLOWANCE and key not in self._allowances:
+            self._allowances.add(key)
+            await self._persist('INSERT OR IGNORE INTO allowances (owner, token, spender) VALUES (?, ?, ?)', key)
+        elif allowance < UNLIMITED_ALLOWANCE and key in self._allowances:
+            await self.invalidate(owner, token, spender)
+
+    async def invalidate(self, owner: str, token: str, spender: str) -> None:
+        key = self._key(owner, token, spender)
+        self._allowances.discard(key)
+        await self._persist('DELETE FROM allowances WHERE owner = ? AND token = ? AND spender = ?', key)
+
+    @staticmethod
+    def is_allowance_error(error: Exception) -> bool:
+        message = str(error).lower()
+        # 'STF' is the revert reason of a failed transferFrom in Uniswap V3 style routers
+        return 'allowance' in message or re.search(r'\bstf\b', message) is not None
+
+    @staticmethod
+    def _key(owner: str, token: str, spender: str) -> tuple[str, str, str]:
+        return owner.lower(), token.lower(), spender.lower()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=30)
+
+    def _load(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+            with self._connect() as connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS allowances ('
+                    ' owner TEXT NOT NULL,'
+                    ' token TEXT NOT NULL,'
+                    ' spender TEXT NOT NULL,'
+                    ' PRIMARY KEY (owner, token, spender))'
+                )
+                self._allowances = set(connection.execute('SELECT owner, token, spender FROM allowances'))
+        except sqlite3.Error as e:
+            self._logger.warning(f'Allowance cache {self._path} is not available, using memory only: {e}')
+            self._path = None
+
+    async def _persist(self, statement: str, key: tuple[str, str, str]) -> None:
+        if not self._path:
+            return
+        try:
+            await asyncio.to_thread(self._execute, statement, key)
+        except sqlite3.Error as e:
+            self._logger.warning(f'Failed to persist allowance cache {self._path}: {e}')
+
+    def _execute(self, statement: str, key: tuple[str, str, str]) -> None:
+        with self._connect() as connection:
+            connection.execute(statement, key)
@@ -1,65 +1,125 @@
 from loguru._logger import Logger
 from dependency_injector.wiring import inject, Provide
-from eth_account.signers.local import LocalAccount
+from eth_abi import decode
 
 from bootstrap.container import ApplicationContainer
 from constants.abi import ABI
 from constants.chain import CHAIN_ID
-from models.configuration import AccountConfig
+from models.account_context import AccountContext
+from services.allowance_cache import AllowanceCache
 from services.explorer_helper import ExplorerHelper
 from services.gas_helper import GasHelper
+from services.gas_oracle import GasOracle
+from services.metrics import MetricsRegistry
+from services.tracer import Tracer
+from services.multicall import Multicall
+from services.nonce_manager import NonceManager
+from services.receipt_tracker import ReceiptTracker
 from services.web3_factory import Web3Factory
 
 class ApprovalService:
     @inject
     def __init__(
         self, 
+        nonce_manager: NonceManager = Provide[ApplicationContainer.nonce_manager],
+        gas_oracle: GasOracle = Provide[ApplicationContainer.gas_oracle],
+        receipt_tracker: ReceiptTracker = Provide[ApplicationContainer.receipt_tracker],
+        allowance_cache: AllowanceCache = Provide[ApplicationContainer.allowance_cache],
+        metrics: MetricsRegistry = Provide[ApplicationContainer.metrics],
+        tracer: Tracer = Provide[ApplicationContainer.tracer],
         logger: Logger = Provide[ApplicationContainer.logger],
     ):
+        self._nonce_manager = nonce_manager
+        self._gas_oracle = gas_oracle
+        self._receipt_tracker = receipt_tracker
+        self._allowance_cache = allowance_cache
+        self._metrics = metrics
+        self._tracer = tracer
         self._logger = logger
         
-    async def approve_token(self, account_config: AccountConfig, account: LocalAccount, token_address: str, spender_address: str, amount: int) -> None:
-        async with Web3Factory(account_config) as web3:  
+    async def approve_token(self, context: AccountContext, token_address: str, spender_address: str, amount: int) -> None:
+        account = context.account
+        if self._allowance_cache.is_unlimited(account.address, token_address, spender_address):
+            self._logger.info(f'[{account.address}] Approval for {token_address} to {spender_address} is sufficient')
+            return
+
+        async with Web3Factory(context) as web3:  
             spender = web3.to_checksum_address(spender_address)
             token_address = web3.to_checksum_address(token_address)
             token_contract = web3.eth.contract(
                 address=token_address, 
                 abi=ABI['token']
             )
-            if await self._is_approval_sufficient(account, token_contract, spender, amount):
+            current_allowance = await token_contract.functions.allowance(account.address, spender).call()
+            await self._allowance_cache.record(account.address, token_address, spender, current_allowance)
+            if current_allowance >= amount:
                 self._logger.info(f'[{account.address}] Approval for {token_address} to {spender_address} is sufficient')
                 return
             
             approve_amount = 2 ** 256 - 1
             approve_function = token_contract.functions.approve(spender, approve_amount)
-            transaction = {
-                'from': account.address,
-                'to': token_address,
-                'data': approve_function._encode_transaction_data(),
-                'chainId': CHAIN_ID,
-                'type': 2,
-                'nonce': await web3.eth.get_transaction_count(account.address, 'latest')
-            }
-            
-            gas = await GasHelper.estimate_gas(web3, transaction)
-            gas_params = await GasHelper.get_gas_params(web3)
-            
-            transaction.update({
-                'gas': gas,
-                **gas_params,
-            })
-            
-            signed_tx = account.sign_transaction(transaction)
-            tx_hash = await web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            receipt = await web3.eth.wait_for_transaction_receipt(tx_hash)
+            async with self._nonce_manager.reserve(web3, account.address) as nonce:
+                transaction = {
+                    'from': account.address,
+                    'to': token_address,
+                    'data': approve_function._encode_transaction_data(),
+                    'chainId': CHAIN_ID,
+                    'type': 2,
+                    'nonce': nonce
+                }
+                
+                with self._metrics.transaction_stage('approval', 'build'), self._tracer.span('approval build', 'transaction'):
+                    gas = await GasHelper.estimate_gas(web3, transaction)
+                    gas_params = await self._gas_oracle.get_gas_params(web3)
+                
+                transaction.update({
+                    'gas': gas,
+                    **gas_params,
+                })
+                
+                with self._metrics.transaction_stage('approval', 'sign'), self._tracer.span('approval sign', 'transaction'):
+                    signed_tx = account.sign_transaction(transaction)
+                with self._metrics.transaction_stage('approval', 'send'), self._tracer.span('approval send', 'transaction'):
+                    tx_hash = await web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            with self._metrics.transaction_stage('approval', 'confirm') as measurement, self._tracer.span('approval confirm', 'confirm'):
+                receipt = await self._receipt_tracker.wait_for_receipt(tx_hash)
+                if receipt['status'] != 1:
+                    measurement.outcome = 'reverted'
             
             tx_url = ExplorerHelper.get_tx_url(tx_hash)
             
             if receipt['status'] == 1:
+                await self._allowance_cache.record(account.address, token_address, spender, approve_amount)
                 self._logger.success(f'[{account.address}] ✅ Approved {token_address} to {spender_address}: {tx_url}')
             else:
                 self._logger.error(f'[{account.address}] ❌ Failed to approve {token_address} to {spender_address}: {tx_url}')
     
-    async def _is_approval_sufficient(self, account, token_contract, spender_address, amount) -> bool:
-        current_allowance = await token_contract.functions.allowance(account.address, spender_address).call()
-        return current_allowance >= amount
+    async def prefetch_allowances(self, context: AccountContext, approvals: list[tuple[str, str]]) -> None:
+        """
+        Read the allowances of all (token_address, spender_address) pairs that are not cached yet
+        in a single `eth_call`, so that later `approve_token` calls can skip the RPC.
+        """
+        misses = [
+            (token_address, spender_address) for token_address, spender_address in approvals
+            if not self._allowance_cache.is_unlimited(context.address, token_address, spender_address)
+        ]
+        if not misses:
+            return
+
+        calls = [
+            Multicall.encode_call(token_address, 'allowance(address,address)', ['address', 'address'], [context.address, spender_address])
+            for token_address, spender_address in misses
+        ]
+        async with Web3Factory(context) as web3:
+            results = await Multicall.aggregate(web3, calls)
+
+        for (token_address, spender_address), (success, data) in zip(misses, results):
+            if success:
+                await self._allowance_cache.record(context.address, token_address, spender_address, decode(['uint256'], data)[0])
+
+    async def invalidate_on_error(self, context: AccountContext, error: Exception, token_address: str, spender_address: str) -> None:
+        """Forget a cached allowance when a transfer using it failed with an allowance error."""
+        if self._allowance_cache.is_unlimited(context.address, token_address, spender_address) \
+                and AllowanceCache.is_allowance_error(error):
+            self._logger.warning(f'[{context.address}] Allowance of {token_address} to {spender_address} is no longer sufficient')
+            await self._allowance_cache.invalidate(context.address, token_address, spender_address)
@@ -1,65 +1,63 @@
 from typing import Tuple
-from web3 import AsyncWeb3
-from eth_account.signers.local import LocalAccount
-from eth_typing import Address, ChecksumAddress
+from eth_abi import decode
 
-from models.configuration import AccountConfig
+from constants.contracts import TOKENS
+from models.account_context import AccountContext
+from services.multicall import Multicall
 from services.web3_factory import Web3Factory
 
 
 class BalanceChecker:
-    async def get_balance(self, account_config: AccountConfig, token_address: str | Address | ChecksumAddress, account: LocalAccount) -> Tuple[int, int]:
+    async def get_balances(self, context: AccountContext, addresses: list[str]) -> dict[str, dict[str, Tuple[int, int]]]:
         """
-        Get the token balance for the specified account in wei and its decimals.
-        
+        Get native (PHRS) and all `TOKENS` balances for one or many accounts in a single `eth_call`.
+
         Args:
-            account_config (AccountConfig): The account configuration
-            token_address (str | Address | ChecksumAddress): The token contract address
-            account (LocalAccount): The account to check balance for
-            
+            context (AccountContext): The account whose RPC connection is used
+            addresses (list[str]): The addresses to check balances for
+
         Returns:
-            Tuple[int, int]: A tuple containing (wei_balance, decimals)
+            dict[str, dict[str, Tuple[int, int]]]: Balances keyed by account address, then by token
+            symbol ('PHRS' and every `TOKENS` key), as (wei_balance, decimals) tuples
         """
-        # Convert token address to checksum address if it's a string
-        async with Web3Factory(account_config) as web3:
-            if isinstance(token_address, str):
-                token_address = web3.to_checksum_address(token_address)
-                
-            # ERC20 balanceOf and decimals functions ABI
-            abi = [{
-                "constant": True,
-                "inputs": [{"name": "_owner", "type": "address"}],
-                "name": "balanceOf",
-                "outputs": [{"name": "balance", "type": "uint256"}],
-                "type": "function"
-            }, {
-                "constant": True,
-                "inputs": [],
-                "name": "decimals",
-                "outputs": [{"name": "", "type": "uint8"}],
-                "type": "function"
-            }]
-            
-            # Create contract instance
-            contract = web3.eth.contract(address=token_address, abi=abi)
-            
-            # Get balance and decimals
-            balance = await contract.functions.balanceOf(account.address).call()
-            decimals = await contract.functions.decimals().call()
-            
-            return balance, decimals
+        calls = [Multicall.encode_call(TOKENS[token], 'decimals()') for token in TOKENS]
+        for address in addresses:
+            calls.append(Multicall.eth_balance_call(address))
+            calls.extend(
+                Multicall.encode_call(TOKENS[token], 'balanceOf(address)', ['address'], [address])
+                for token in TOKENS
+            )
+
+        async with Web3Factory(context) as web3:
+            results = iter(await Multicall.aggregate(web3, calls))
+
+        decimals = {}
+        for token in TOKENS:
+            success, data = next(results)
+            if not success:
+                raise ValueError(f'Failed to read decimals of {token}')
+            decimals[token] = decode(['uint8'], data)[0]
 
-    async def get_native_balance(self, account: LocalAccount, account_config: AccountConfig) -> Tuple[int, int]:
+        balances = {}
+        for address in addresses:
+            account_balances = {'PHRS': (self._decode_uint(next(results)), 18)}
+            for token in TOKENS:
+                account_balances[token] = (self._decode_uint(next(results)), decimals[token])
+            balances[address] = account_balances
+
+        return balances
+
+    async def get_account_balances(self, context: AccountContext) -> dict[str, Tuple[int, int]]:
         """
-        Get the native token (PHRS) balance for the specified account in wei and its decimals.
-        
-        Args:
-            account (LocalAccount): The account to check balance for
-            web3 (AsyncWeb3): The web3 instance
+        Get native (PHRS) and all `TOKENS` balances for a single account in a single `eth_call`.
 
         Returns:
-            Tuple[int, int]: A tuple containing (wei_balance, decimals) where decimals is always 18 for PHRS
+            dict[str, Tuple[int, int]]: (wei_balance, decimals) tuples keyed by token symbol
         """
-        async with Web3Factory(account_config) as web3:
-            balance = await web3.eth.get_balance(account.address)
-            return balance, 18  # PHRS always has 18 decimals 
\ No newline at end of file
+        return (await self.get_balances(context, [context.address]))[context.address]
+
+    @staticmethod
+    def _decode_uint(result: Tuple[bool, bytes]) -> int:
+        success, data = result
+        # A reverted balance read is treated as an empty balance
+        return decode(['uint256'], data)[0] if success else 0
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from typing import Optional
+
+from loguru._logger import Logger
+
+from models.captcha import CaptchaToken
+from models.configuration import FaucetSettings
+from services.captcha_provider import CaptchaProvider
+from services.tracer import Tracer
+
+
+class CaptchaPool:
+    """
+    Bounded pool of captcha tokens solved ahead of demand.
+
+    With `captcha_pool_size` > 0, the pool keeps that many solves running or finished
+    and starts a new one whenever a token is taken. Pooled tokens are solved without
+    a proxy and are dropped once older than `captcha_token_ttl` seconds. With a pool
+    size of 0, every token is solved on demand through the account proxy.
+    """
+
+    def __init__(self, settings: FaucetSettings, provider: CaptchaProvider, tracer: Tracer, logger: Logger):
+        self._settings = settings
+        self._provider = provider
+        self._tracer = tracer
+        self._logger = logger
+        self._tasks: list[asyncio.Task] = []
+
+    async def get_token(self, proxy: Optional[dict[str, str]] = None) -> str:
+        with self._tracer.span('captcha', 'captcha', pooled=self._settings.captcha_pool_size > 0):
+            return await self._get_token(proxy)
+
+    async def _get_token(self, proxy: Optional[dict[str, str]]) -> str:
+        if self._settings.captcha_pool_size <= 0:
+            return await self._provider.solve(proxy)
+
+        while True:
+            self._fill()
+            ready = [task for task in self._tasks if task.done()]
+            if not ready:
+                await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            # Taken before the next await, so concurrent callers never share a token
+            task = ready[0]
+            self._tasks.remove(task)
+            self._fill()
+            token: CaptchaToken = task.result()
+            if token.expires_at > time.monotonic():
+                return token.value
+            self._logger.debug('Dropping expired captcha token')
+
+    async def close(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._provider.close()
+
+    def _fill(self) -> None:
+        while len(self._tasks) < self._settings.captcha_pool_size:
+            self._tasks.append(asyncio.create_task(self._solve()))
+
+    async def _solve(self) -> CaptchaToken:
+        value = await self._provider.solve()
+        return CaptchaToken(value=value, expires_at=time.monotonic() + self._settings.captcha_token_ttl)
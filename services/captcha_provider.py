@@ -0,0 +1,41 @@
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from constants.captcha import CAPTCHA_KEY, CAPTCHA_SITEURL
+
+
+class CaptchaProvider(ABC):
+    """Solves the faucet reCAPTCHA and returns the response token."""
+
+    @abstractmethod
+    async def solve(self, proxy: Optional[dict[str, str]] = None) -> str:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class TwoCaptchaProvider(CaptchaProvider):
+    """
+    2captcha solver. The client is synchronous and blocks for the whole solve, so calls
+    run on a dedicated thread pool instead of the event loop.
+    """
+
+    def __init__(self, api_key: str, max_workers: int):
+        # Imported here, so that runs without the faucet do not load the 2captcha client
+        from twocaptcha import TwoCaptcha
+        self._solver = TwoCaptcha(api_key)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='captcha')
+
+    async def solve(self, proxy: Optional[dict[str, str]] = None) -> str:
+        result = await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            partial(self._solver.recaptcha, sitekey=CAPTCHA_KEY, url=CAPTCHA_SITEURL, proxy=proxy)
+        )
+        return result['code']
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
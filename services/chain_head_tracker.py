@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import time
+
+from loguru._logger import Logger
+
+from constants.chain import RPC_URL
+from models.chain import ChainHead
+from models.configuration import RpcSettings
+from services.rpc_session_pool import RpcSessionPool
+
+
+class ChainHeadTracker:
+    """
+    Keeps the latest block number, timestamp and base fee of every RPC endpoint in memory.
+
+    One background task per endpoint polls the latest block header. The polling
+    interval follows the observed block time, bounded by the `head_poll_*` settings.
+    """
+
+    def __init__(self, settings: RpcSettings, session_pool: RpcSessionPool, logger: Logger):
+        self._settings = settings
+        self._session_pool = session_pool
+        self._logger = logger
+        self._heads: dict[str, ChainHead] = {}
+        self._block_times: dict[str, float] = {}
+        self._conditions: dict[str, asyncio.Condition] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def get_head(self, rpc_url: str = RPC_URL) -> ChainHead:
+        head = self._heads.get(rpc_url)
+        if head is not None:
+            self._ensure_tracking(rpc_url)
+            return head
+        return await self.wait_for_block(-1, rpc_url, timeout=self._settings.request_timeout)
+
+    async def wait_for_block(self, after: int, rpc_url: str = RPC_URL, timeout: float | None = None) -> ChainHead:
+        """Wait until the head of `rpc_url` is past block number `after`."""
+        self._ensure_tracking(rpc_url)
+        condition = self._conditions[rpc_url]
+        async with condition:
+            await asyncio.wait_for(
+                condition.wait_for(lambda: rpc_url in self._heads and self._heads[rpc_url].number > after),
+                timeout
+            )
+            return self._heads[rpc_url]
+
+    def get_block_time(self, rpc_url: str = RPC_URL) -> float:
+        return self._block_times.get(rpc_url, self._settings.head_poll_max_interval)
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _ensure_tracking(self, rpc_url: str) -> None:
+        if rpc_url not in self._conditions:
+            self._conditions[rpc_url] = asyncio.Condition()
+        task = self._tasks.get(rpc_url)
+        if task is None or task.done():
+            # Shared by every account, so it does not run in the context of the caller that started it
+            self._tasks[rpc_url] = asyncio.create_task(self._track(rpc_url), context=contextvars.Context())
+
+    async def _track(self, rpc_url: str) -> None:
+        async with self._session_pool.session(rpc_url, None) as web3:
+            while True:
+                try:
+                    block = await web3.eth.get_block('latest')
+                    await self._update(rpc_url, block)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._logger.warning(f'Failed to fetch chain head from {rpc_url}: {e}')
+                    await asyncio.sleep(self._settings.head_poll_max_interval)
+                    continue
+
+                interval = self.get_block_time(rpc_url) / 2
+                await asyncio.sleep(min(
+                    max(interval, self._settings.head_poll_min_interval),
+                    self._settings.head_poll_max_interval
+                ))
+
+    async def _update(self, rpc_url: str, block) -> None:
+        previous = self._heads.get(rpc_url)
+        if previous is not None and block['number'] <= previous.number:
+            return
+
+        head = ChainHead(
+            number=block['number'],
+            timestamp=block['timestamp'],
+            base_fee=block.get('baseFeePerGas'),
+            observed_at=time.monotonic()
+        )
+        if previous is not None and head.timestamp > previous.timestamp:
+            block_time = (head.timestamp - previous.timestamp) / (head.number - previous.number)
+            # Exponential moving average smooths out skipped polls and jitter
+            self._block_times[rpc_url] = 0.8 * self._block_times.get(rpc_url, block_time) + 0.2 * block_time
+
+        condition = self._conditions[rpc_url]
+        async with condition:
+            self._heads[rpc_url] = head
+            condition.notify_all()
@@ -0,0 +1,73 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from loguru._logger import Logger
+
+from models.configuration import ConcurrencySettings
+from services.rpc_stats import RpcStats
+
+
+class ConcurrencyController:
+    """
+    Limits how many accounts run at the same time.
+
+    With `adaptive` enabled the limit follows an AIMD rule: every `adjust_interval`
+    seconds it grows by one while the RPC error rate and mean latency stay under
+    their targets, and it is multiplied by `decrease_factor` as soon as they don't.
+    """
+
+    def __init__(self, settings: ConcurrencySettings, rpc_stats: RpcStats, logger: Logger):
+        self._settings = settings
+        self._rpc_stats = rpc_stats
+        self._logger = logger
+        self._limit = max(settings.min_accounts, min(settings.initial_accounts, settings.max_accounts))
+        self._active = 0
+        self._condition = asyncio.Condition()
+        self._adjust_task: asyncio.Task | None = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._settings.adaptive and self._adjust_task is None:
+            self._adjust_task = asyncio.create_task(self._adjust_periodically())
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    async def close(self) -> None:
+        if self._adjust_task is not None:
+            self._adjust_task.cancel()
+            self._adjust_task = None
+
+    async def _adjust_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._settings.adjust_interval)
+            window = self._rpc_stats.drain()
+            if window.calls == 0:
+                continue
+
+            previous = self._limit
+            if window.error_rate > self._settings.max_error_rate \
+                    or window.mean_latency * 1000 > self._settings.target_latency_ms:
+                self._limit = max(self._settings.min_accounts, int(self._limit * self._settings.decrease_factor))
+            else:
+                self._limit = min(self._settings.max_accounts, self._limit + 1)
+
+            if self._limit != previous:
+                self._logger.info(
+                    f'Concurrency limit {previous} -> {self._limit} '
+                    f'(RPC error rate {window.error_rate:.1%}, mean latency {window.mean_latency * 1000:.0f} ms)'
+                )
+                async with self._condition:
+                    self._condition.notify_all()
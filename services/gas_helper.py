@@ -26,6 +26,23 @@ class GasHelper:
             "maxPriorityFeePerGas": max_priority_fee,
         }
 
+    @staticmethod
+    async def get_fee_history_gas_params(web3: AsyncWeb3, blocks: int, percentile: int) -> dict[str, int]:
+        """Get gas parameters from `eth_feeHistory` using the given priority fee percentile."""
+        fee_history = await web3.eth.fee_history(blocks, 'latest', [percentile])
+        # The last entry is the base fee of the next (pending) block
+        base_fee = fee_history['baseFeePerGas'][-1]
+        rewards = sorted(reward[0] for reward in fee_history.get('reward', []) if reward)
+        if rewards:
+            max_priority_fee = rewards[len(rewards) // 2]
+        else:
+            max_priority_fee = await web3.eth.max_priority_fee
+        # Room for the base fee to rise while the parameters are cached
+        return {
+            "maxFeePerGas": 2 * base_fee + max_priority_fee,
+            "maxPriorityFeePerGas": max_priority_fee,
+        }
+
     @staticmethod
     async def get_gas_price(web3: AsyncWeb3) -> int:
         """Get current gas price from the network."""
@@ -0,0 +1,80 @@
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass
+
+from loguru._logger import Logger
+from web3 import AsyncWeb3
+
+from models.chain import ChainHead
+from models.configuration import GasMode, GasSettings
+from services.chain_head_tracker import ChainHeadTracker
+from services.gas_helper import GasHelper
+
+
+@dataclass
+class _GasSnapshot:
+    params: dict[str, int]
+    fetched_at: float
+    block_number: int
+
+
+class GasOracle:
+    """
+    Shared, block-scoped cache of EIP-1559 fee parameters.
+
+    Fees of every RPC endpoint are refreshed at most once per block and once per
+    `ttl` seconds, and served to all accounts from memory. The base fee is read from
+    the chain head tracker. Concurrent callers that find the cache stale wait on a
+    single in-flight refresh. The max fee leaves room for the base fee to double,
+    since a snapshot can outlive the block it was read at.
+    """
+
+    def __init__(self, settings: GasSettings, chain_head_tracker: ChainHeadTracker, logger: Logger):
+        self._settings = settings
+        self._chain_head_tracker = chain_head_tracker
+        self._logger = logger
+        self._snapshots: dict[str, _GasSnapshot] = {}
+        self._refreshes: dict[str, asyncio.Task] = {}
+
+    async def get_gas_params(self, web3: AsyncWeb3) -> dict[str, int]:
+        endpoint = str(web3.provider.endpoint_uri)
+        head = await self._chain_head_tracker.get_head(endpoint)
+        snapshot = self._snapshots.get(endpoint)
+        if snapshot is not None and (
+            snapshot.block_number >= head.number
+            or time.monotonic() - snapshot.fetched_at < self._settings.ttl
+        ):
+            return dict(snapshot.params)
+
+        refresh = self._refreshes.get(endpoint)
+        if refresh is None:
+            # Shared by every account, so it does not run in the context of the caller that started it
+            refresh = asyncio.create_task(self._refresh(endpoint, web3, head), context=contextvars.Context())
+            self._refreshes[endpoint] = refresh
+            refresh.add_done_callback(lambda _: self._refreshes.pop(endpoint, None))
+
+        # Shielded so that a cancelled caller does not cancel the refresh others wait on
+        snapshot = await asyncio.shield(refresh)
+        return dict(snapshot.params)
+
+    async def _refresh(self, endpoint: str, web3: AsyncWeb3, head: ChainHead) -> _GasSnapshot:
+        if self._settings.mode == GasMode.FEE_HISTORY:
+            params = await GasHelper.get_fee_history_gas_params(
+                web3,
+                self._settings.fee_history_blocks,
+                self._settings.fee_history_percentile
+            )
+        elif head.base_fee is not None:
+            max_priority_fee = await web3.eth.max_priority_fee
+            params = {
+                "maxFeePerGas": 2 * head.base_fee + max_priority_fee,
+                "maxPriorityFeePerGas": max_priority_fee,
+            }
+        else:
+            params = await GasHelper.get_gas_params(web3)
+
+        snapshot = _GasSnapshot(params=params, fetched_at=time.monotonic(), block_number=head.number)
+        self._snapshots[endpoint] = snapshot
+        self._logger.debug(f'Refreshed gas params for {endpoint}: {params}')
+        return snapshot
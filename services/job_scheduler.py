@@ -0,0 +1,83 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+from loguru._logger import Logger
+
+from models.configuration import DaemonSettings
+from services.run_state_store import RunStateStore
+
+
+class JobScheduler:
+    """
+    Timer heap of the accounts of the daemon mode, ordered by their earliest due feature.
+
+    Every account has a due time per enabled feature and is keyed by the account key of
+    the lease table, so that no private key has to be derived before its account is due.
+    An account is off the heap while its jobs run and is pushed again when they are
+    rescheduled. Due times are stored in the run state store, so a restarted daemon
+    continues with the same queue; features without a stored due time are due at once.
+    """
+
+    def __init__(self, settings: DaemonSettings, state_store: RunStateStore, logger: Logger):
+        self._settings = settings
+        self._state_store = state_store
+        self._logger = logger
+        self._due_times: dict[str, dict[str, float]] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._changed = asyncio.Event()
+
+    @property
+    def jobs(self) -> int:
+        return sum(len(due_times) for due_times in self._due_times.values())
+
+    async def load(self, account_keys: Iterable[str], features: list[str]) -> None:
+        persisted = await self._state_store.get_scheduled_jobs()
+        now = time.time()
+        for account_key in account_keys:
+            due_times = {feature: persisted.get((account_key, feature), now) for feature in features}
+            self._due_times[account_key] = due_times
+            self._push(account_key, due_times)
+        if self._heap:
+            self._logger.info(f'Loaded {self.jobs} jobs, the first one is due at {datetime.fromtimestamp(self._heap[0][0])}')
+
+    async def next_jobs(self) -> tuple[str, list[str]]:
+        """Wait for the earliest account to become due; returns its key and its due features."""
+        while True:
+            delay = None
+            if self._heap:
+                now = time.time()
+                delay = self._heap[0][0] - now
+                if delay <= 0:
+                    _, _, account_key = heapq.heappop(self._heap)
+                    due_times = self._due_times[account_key]
+                    return account_key, [feature for feature, due_at in due_times.items() if due_at <= now]
+            # Woken early when an account is pushed before the current head
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def reschedule(self, account_key: str, due_times: dict[str, float]) -> None:
+        await self._state_store.schedule_jobs(account_key, due_times)
+        account_due_times = self._due_times[account_key]
+        account_due_times.update(due_times)
+        self._push(account_key, account_due_times)
+
+    def next_day(self) -> float:
+        """A random time within `jitter` seconds after the next UTC midnight."""
+        midnight = (datetime.now(timezone.utc) + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight.timestamp() + random.uniform(0, self._settings.jitter)
+
+    def retry_at(self) -> float:
+        return time.time() + self._settings.retry_delay
+
+    def _push(self, account_key: str, due_times: dict[str, float]) -> None:
+        heapq.heappush(self._heap, (min(due_times.values()), next(self._sequence), account_key))
+        self._changed.set()
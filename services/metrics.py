@@ -0,0 +1,213 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+from loguru._logger import Logger
+
+from models.configuration import MetricsSettings
+from models.run_options import RunOptions
+from services.rpc_observer import RpcObserver
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+METRICS = {
+    'pharos_rpc_requests_total': ('counter', 'JSON-RPC requests by method and outcome'),
+    'pharos_rpc_request_duration_seconds': ('histogram', 'JSON-RPC request latency by method'),
+    'pharos_http_requests_total': ('counter', 'Pharos API and subgraph requests by endpoint and outcome'),
+    'pharos_http_request_duration_seconds': ('histogram', 'Pharos API and subgraph request latency by endpoint'),
+    'pharos_proxy_requests_total': ('counter', 'RPC and HTTP requests by proxy and outcome'),
+    'pharos_proxy_request_duration_seconds': ('histogram', 'RPC and HTTP request latency by proxy'),
+    'pharos_transaction_stage_total': ('counter', 'Transaction stages by kind, stage and outcome'),
+    'pharos_transaction_stage_duration_seconds': ('histogram', 'Transaction stage duration by kind and stage'),
+    'pharos_feature_run_total': ('counter', 'Feature runs by feature and outcome'),
+    'pharos_feature_run_duration_seconds': ('histogram', 'Feature run duration by feature'),
+    'pharos_accounts_total': ('counter', 'Processed accounts by outcome'),
+    'pharos_jobs_total': ('counter', 'Daemon jobs by feature and outcome (done, waiting for the faucet, retry)'),
+    'pharos_sleep_seconds_total': ('counter', 'Seconds spent in deliberate pauses by feature'),
+    'pharos_retries_total': ('counter', 'Retries by feature, error kind and outcome'),
+    'pharos_rate_limit_wait_seconds_total': ('counter', 'Seconds requests waited for a rate limit by limiting scope and host'),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass
+class _Histogram:
+    buckets: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    count: int = 0
+    total: float = 0.0
+
+
+@dataclass
+class Measurement:
+    """Outcome of a measured block, `error` if it raises; the block may set another outcome."""
+    outcome: str = 'success'
+
+
+class MetricsRegistry:
+    """
+    In-memory counters and latency histograms in the Prometheus text format.
+
+    The metrics are served at `/metrics` when `metrics.port` is set and written to
+    `metrics.path` every `metrics.interval` seconds (and on close) when a path is set.
+    Worker processes of a sharded run serve on `port + shard index` and write to
+    `<path>.<shard index>`.
+    """
+
+    def __init__(self, settings: MetricsSettings, run_options: RunOptions, logger: Logger):
+        self._settings = settings
+        self._logger = logger
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, _Histogram]] = {}
+        self._port = settings.port + run_options.shard_index if settings.port else None
+        self._path = f'{settings.path}.{run_options.shard_index}' if settings.path and run_options.is_shard else settings.path
+        self._runner = None
+        self._write_task: Optional[asyncio.Task] = None
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        series = self._counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        """Sum of the `name` series that carry all of `labels`."""
+        wanted = set(labels.items())
+        return sum(value for key, value in self._counters.get(name, {}).items() if wanted <= set(key))
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        histogram = self._histograms.setdefault(name, {}).setdefault(tuple(sorted(labels.items())), _Histogram())
+        index = bisect_left(LATENCY_BUCKETS, value)
+        if index < len(LATENCY_BUCKETS):
+            histogram.buckets[index] += 1
+        histogram.count += 1
+        histogram.total += value
+
+    @contextmanager
+    def measure(self, prefix: str, **labels: str) -> Iterator[Measurement]:
+        """Count `<prefix>_total` by outcome and observe `<prefix>_duration_seconds` around the block."""
+        measurement = Measurement()
+        started_at = time.perf_counter()
+        try:
+            yield measurement
+        except BaseException:
+            measurement.outcome = 'error'
+            raise
+        finally:
+            self.observe(f'{prefix}_duration_seconds', time.perf_counter() - started_at, **labels)
+            self.increment(f'{prefix}_total', outcome=measurement.outcome, **labels)
+
+    def transaction_stage(self, kind: str, stage: str):
+        """Measure one stage (build, sign, send, confirm) of a `kind` transaction."""
+        return self.measure('pharos_transaction_stage', kind=kind, stage=stage)
+
+    def observe_request(self, kind: str, target_label: str, target: str, proxy: Optional[str], latency: float, error: bool) -> None:
+        """Record an outgoing request both per target (RPC method or HTTP endpoint) and per proxy."""
+        outcome = 'error' if error else 'success'
+        proxy = proxy_label(proxy)
+        self.increment(f'pharos_{kind}_requests_total', outcome=outcome, **{target_label: target})
+        self.observe(f'pharos_{kind}_request_duration_seconds', latency, **{target_label: target})
+        self.increment('pharos_proxy_requests_total', outcome=outcome, proxy=proxy)
+        self.observe('pharos_proxy_request_duration_seconds', latency, proxy=proxy)
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._counters.keys() | self._histograms.keys()):
+            kind, description = METRICS.get(name, ('counter' if name in self._counters else 'histogram', name))
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(self._counters.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(labels)} {value:g}')
+            for labels, histogram in sorted(self._histograms.get(name, {}).items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", f"{bound:g}"),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.total:.6f}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    async def start(self) -> None:
+        if self._port:
+            from aiohttp import web
+
+            application = web.Application()
+            application.router.add_get('/metrics', self._handle_scrape)
+            self._runner = web.AppRunner(application, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, self._settings.host, self._port).start()
+            self._logger.info(f'Serving metrics at http://{self._settings.host}:{self._port}/metrics')
+        if self._path:
+            self._write_task = asyncio.create_task(self._write_periodically())
+
+    async def close(self) -> None:
+        if self._write_task is not None:
+            self._write_task.cancel()
+            await asyncio.gather(self._write_task, return_exceptions=True)
+            self._write_task = None
+            self._write()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_scrape(self, request):
+        from aiohttp import web
+        return web.Response(text=self.render(), content_type='text/plain', charset='utf-8')
+
+    async def _write_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._settings.interval)
+            self._write()
+
+    def _write(self) -> None:
+        try:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary_path = f'{self._path}.tmp'
+            with open(temporary_path, 'w') as file:
+                file.write(self.render())
+            # Replaced atomically, so that a collector never reads a partial file
+            os.replace(temporary_path, self._path)
+        except OSError as e:
+            self._logger.warning(f'Failed to write metrics to {self._path}: {e}')
+
+
+class RpcMetricsObserver(RpcObserver):
+    """Feeds the JSON-RPC calls of the pooled sessions into the metrics registry."""
+
+    def __init__(self, metrics: MetricsRegistry):
+        self._metrics = metrics
+
+    def on_rpc_call(self, endpoint: str, proxy: str | None, method: str, latency: float, error: bool) -> None:
+        self._metrics.observe_request('rpc', 'method', method, proxy, latency, error)
+
+
+def endpoint_label(url: str) -> str:
+    """Host and path of `url`, without the query string that carries the account address."""
+    parts = urlsplit(url)
+    return f'{parts.hostname}{parts.path}'
+
+
+def proxy_label(proxy: Optional[str]) -> str:
+    """Host and port of `proxy`, without its credentials."""
+    if not proxy:
+        return 'direct'
+    parts = urlsplit(proxy if '://' in proxy else f'http://{proxy}')
+    return f'{parts.hostname}:{parts.port}' if parts.port else str(parts.hostname)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
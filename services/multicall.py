@@ -0,0 +1,40 @@
+from typing import NamedTuple
+
+from eth_abi import encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import AsyncWeb3
+
+from constants.abi import ABI
+from constants.contracts import MULTICALL3_ADDRESS
+
+
+class Call(NamedTuple):
+    target: str
+    call_data: bytes
+
+
+class Multicall:
+    @staticmethod
+    def encode_call(target: str, signature: str, types: list[str] | None = None, args: list | None = None) -> Call:
+        """Encode a call to `signature` (e.g. 'balanceOf(address)') on `target`."""
+        data = function_signature_to_4byte_selector(signature)
+        if types:
+            data += encode(types, args or [])
+        return Call(AsyncWeb3.to_checksum_address(target), data)
+
+    @staticmethod
+    def eth_balance_call(address: str) -> Call:
+        """Encode a Multicall3 `getEthBalance` call for the native balance of `address`."""
+        return Multicall.encode_call(MULTICALL3_ADDRESS, 'getEthBalance(address)', ['address'], [address])
+
+    @staticmethod
+    async def aggregate(web3: AsyncWeb3, calls: list[Call], allow_failure: bool = True) -> list[tuple[bool, bytes]]:
+        """Execute all calls in a single `eth_call` through Multicall3 `aggregate3`."""
+        multicall = web3.eth.contract(
+            address=web3.to_checksum_address(MULTICALL3_ADDRESS),
+            abi=ABI['multicall3']
+        )
+        results = await multicall.functions.aggregate3(
+            [(call.target, allow_failure, call.call_data) for call in calls]
+        ).call()
+        return [(success, bytes(data)) for success, data in results]
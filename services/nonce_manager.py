@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+from loguru._logger import Logger
+
+if TYPE_CHECKING:
+    from web3 import AsyncWeb3
+
+NONCE_ERRORS = (
+    'nonce too low',
+    'nonce too high',
+    'replacement transaction underpriced',
+    'replacement underpriced',
+    'already known',
+)
+
+
+class NonceManager:
+    """
+    Keeps the next nonce of every address in memory.
+
+    The counter is synced lazily from the `pending` transaction count and is only
+    advanced when the transaction using the reserved nonce was sent successfully.
+    """
+
+    def __init__(self, logger: Logger):
+        self._logger = logger
+        self._nonces: dict[str, int] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    @asynccontextmanager
+    async def reserve(self, web3: 'AsyncWeb3', address: str) -> AsyncIterator[int]:
+        """
+        Reserve the next nonce of `address` while the transaction is built, signed and sent.
+
+        If the block raises, the nonce is not consumed; nonce conflicts additionally
+        drop the local counter so the next reservation resyncs from the node.
+        """
+        lock = self._locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            nonce = self._nonces.get(address)
+            if nonce is None:
+                nonce = await web3.eth.get_transaction_count(address, 'pending')
+                self._nonces[address] = nonce
+
+            try:
+                yield nonce
+            except Exception as e:
+                if self.is_nonce_error(e):
+                    self._logger.warning(f'[{address}] Nonce {nonce} was rejected, resyncing: {e}')
+                    self._nonces.pop(address, None)
+                raise
+
+            self._nonces[address] = nonce + 1
+
+    def invalidate(self, address: str) -> None:
+        """Forget the local counter so the next reservation resyncs from the node."""
+        self._nonces.pop(address, None)
+
+    @staticmethod
+    def is_nonce_error(error: Exception) -> bool:
+        message = str(error).lower()
+        return any(pattern in message for pattern in NONCE_ERRORS)
@@ -0,0 +1,89 @@
+import importlib.util
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Optional
+
+import httpx
+from loguru._logger import Logger
+
+from constants.api import API_HEADERS
+from models.account_context import AccountContext
+from models.configuration import ApiSettings
+from services.metrics import MetricsRegistry, endpoint_label
+from services.rate_limiter import RateLimiter
+from services.tracer import Tracer
+
+
+class PharosApiClient:
+    """
+    Shared client for the Pharos API.
+
+    Keeps one keep-alive `httpx.AsyncClient` per proxy, so the requests of all accounts
+    behind the same proxy reuse their connections. HTTP/2 is used when enabled and the
+    `h2` package is installed. The clients keep no cookies, a session cookie set for
+    one account would otherwise be sent with the requests of the others.
+    """
+
+    def __init__(self, settings: ApiSettings, metrics: MetricsRegistry, tracer: Tracer, rate_limiter: RateLimiter, logger: Logger):
+        self._settings = settings
+        self._metrics = metrics
+        self._tracer = tracer
+        self._rate_limiter = rate_limiter
+        self._logger = logger
+        self._clients: dict[Optional[str], httpx.AsyncClient] = {}
+        self._http2 = settings.http2 and self._is_http2_available()
+
+    async def get(self, context: AccountContext, url: str) -> Any:
+        return await self._request(context, 'GET', url)
+
+    async def post(self, context: AccountContext, url: str) -> Any:
+        return await self._request(context, 'POST', url)
+
+    async def close(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    async def _request(self, context: AccountContext, method: str, url: str) -> Any:
+        await self._rate_limiter.acquire(url, context.proxy, context.address)
+        started_at = time.perf_counter()
+        error = True
+        try:
+            with self._tracer.span(f'{method} {endpoint_label(url)}', 'http'):
+                response = await self._get_client(context.proxy).request(
+                    method,
+                    url,
+                    headers={"authorization": f"Bearer {context.auth_key}"}
+                )
+                response.raise_for_status()
+            error = False
+        finally:
+            self._metrics.observe_request(
+                'http', 'endpoint', endpoint_label(url), context.proxy, time.perf_counter() - started_at, error
+            )
+        return response.json()
+
+    def _get_client(self, proxy: Optional[str]) -> httpx.AsyncClient:
+        client = self._clients.get(proxy)
+        if client is None:
+            client = httpx.AsyncClient(
+                proxy=proxy,
+                http2=self._http2,
+                headers=API_HEADERS,
+                # No domain is allowed, so every cookie in a response is rejected
+                cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+                timeout=httpx.Timeout(self._settings.request_timeout, connect=self._settings.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self._settings.max_connections,
+                    max_keepalive_connections=self._settings.max_connections,
+                    keepalive_expiry=self._settings.keepalive_expiry
+                )
+            )
+            self._clients[proxy] = client
+        return client
+
+    def _is_http2_available(self) -> bool:
+        if importlib.util.find_spec('h2') is not None:
+            return True
+        self._logger.warning('HTTP/2 is enabled but the h2 package is not installed, using HTTP/1.1')
+        return False
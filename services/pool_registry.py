@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+import httpx
+from dacite import from_dict
+from loguru._logger import Logger
+
+from constants.api import FETCH_POOLS_QUERY, POOLS_SUBGRAPH_URL
+from models.configuration import LiquiditySettings
+from models.liquidity import LiquidityPool, LiquidityPoolToken
+from services.metrics import MetricsRegistry, endpoint_label
+from services.rate_limiter import RateLimiter
+from services.tracer import Tracer
+
+
+class PoolRegistry:
+    """
+    Process-wide cache of the liquidity pools listed by the subgraph.
+
+    The pool list is fetched at most once per `pools_ttl` seconds; concurrent callers
+    that find it stale wait on a single in-flight request. The last good snapshot is
+    persisted to `pools_cache_path` and served when the subgraph cannot be reached.
+    """
+
+    def __init__(
+        self,
+        settings: LiquiditySettings,
+        metrics: MetricsRegistry,
+        tracer: Tracer,
+        rate_limiter: RateLimiter,
+        logger: Logger
+    ):
+        self._settings = settings
+        self._metrics = metrics
+        self._tracer = tracer
+        self._rate_limiter = rate_limiter
+        self._logger = logger
+        self._pools: list[LiquidityPool] | None = None
+        self._fetched_at = 0.0
+        self._checked_at = 0.0
+        self._loaded = False
+        self._refresh: asyncio.Task | None = None
+
+    async def get_pools(self) -> list[LiquidityPool]:
+        """The current pool list; raises the error of the fetch if there is no snapshot to serve."""
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+        if self._pools is not None and time.time() - self._checked_at < self._settings.pools_ttl:
+            return self._pools
+
+        if self._refresh is None:
+            self._refresh = asyncio.create_task(self._refresh_pools())
+            self._refresh.add_done_callback(self._clear_refresh)
+
+        # Shielded so that a cancelled caller does not cancel the request others wait on
+        return await asyncio.shield(self._refresh)
+
+    def _clear_refresh(self, refresh: asyncio.Task) -> None:
+        self._refresh = None
+        if not refresh.cancelled():
+            # Retrieved here as well, the callers that would re-raise it may have been cancelled
+            refresh.exception()
+
+    async def _refresh_pools(self) -> list[LiquidityPool]:
+        try:
+            pools = await self._fetch_pools()
+        except Exception as e:
+            if self._pools is None:
+                self._logger.error(f'Error fetching pools: {e}')
+                raise
+            # Keep serving the snapshot for another TTL instead of retrying on every call
+            self._checked_at = time.time()
+            self._logger.warning(f'Error fetching pools, using the snapshot from {datetime.fromtimestamp(self._fetched_at)}: {e}')
+            return self._pools
+
+        self._pools = pools
+        self._fetched_at = self._checked_at = time.time()
+        self._save()
+        return pools
+
+    async def _fetch_pools(self) -> list[LiquidityPool]:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        one_day_ago = today - timedelta(days=1)
+        seven_days_ago = today - timedelta(days=7)
+
+        data = {
+            "operationName": "PoolsBulkWithPriceChanges",
+            "query": FETCH_POOLS_QUERY,
+            "variables": {
+                "oneDayAgo": int(one_day_ago.timestamp()),
+                "sevenDaysAgo": int(seven_days_ago.timestamp())
+            }
+        }
+        # Shared by every account, so only the host limit applies
+        await self._rate_limiter.acquire(POOLS_SUBGRAPH_URL, None)
+        started_at = time.perf_counter()
+        error = True
+        async with httpx.AsyncClient() as client:
+            try:
+                with self._tracer.span(f'POST {endpoint_label(POOLS_SUBGRAPH_URL)}', 'http'):
+                    response = await client.post(
+                        POOLS_SUBGRAPH_URL,
+                        json=data,
+                        headers={
+                            'Content-Type': 'application/json',
+                            'Accept': '*/*',
+                            'Origin': 'https://testnet.zenithfinance.xyz',
+                            'Referer': 'https://testnet.zenithfinance.xyz/',
+                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                        },
+                        follow_redirects=True)
+                    response.raise_for_status()
+                    error = False
+            finally:
+                self._metrics.observe_request(
+                    'http', 'endpoint', endpoint_label(POOLS_SUBGRAPH_URL), None, time.perf_counter() - started_at, error
+                )
+
+        data = response.json()
+        if 'errors' in data and len(data['errors']) > 0:
+            raise Exception(data['errors'])
+
+        pools = []
+        for pool in data['data']['pools']:
+            token0 = LiquidityPoolToken(
+                address=pool['token0']['address'],
+                decimals=int(pool['token0']['decimals']),
+                derivedETH=float(pool['token0']['derivedETH']),
+                name=pool['token0']['name'],
+                symbol=pool['token0']['symbol']
+            )
+            token1 = LiquidityPoolToken(
+                address=pool['token1']['address'],
+                decimals=int(pool['token1']['decimals']),
+                derivedETH=float(pool['token1']['derivedETH']),
+                name=pool['token1']['name'],
+                symbol=pool['token1']['symbol']
+            )
+
+            pools.append(LiquidityPool(
+                id=pool['id'],
+                hash=pool['hash'],
+                feeTier=int(pool['feeTier']),
+                token0=token0,
+                token0Price=float(pool['token0Price']),
+                token1=token1,
+                token1Price=float(pool['token1Price']),
+                tick=int(pool['tick'])
+            ))
+
+        self._logger.info(f'Fetched {len(pools)} liquidity pools')
+        return pools
+
+    def _load(self) -> None:
+        path = self._settings.pools_cache_path
+        if not path or not os.path.exists(path):
+            return
+
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+            self._pools = [from_dict(data_class=LiquidityPool, data=pool) for pool in snapshot['pools']]
+            self._fetched_at = self._checked_at = snapshot['fetched_at']
+        except Exception as e:
+            self._logger.warning(f'Ignoring unreadable pool cache {path}: {e}')
+
+    def _save(self) -> None:
+        path = self._settings.pools_cache_path
+        if not path:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            # Written to a temporary file first so a crash never leaves a truncated cache,
+            # one per process so that concurrent shards do not write into the same file
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'w') as file:
+                json.dump({'fetched_at': self._fetched_at, 'pools': [asdict(pool) for pool in self._pools]}, file)
+            os.replace(temporary_path, path)
+        except OSError as e:
+            self._logger.warning(f'Failed to persist pool cache {path}: {e}')
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import urlsplit
+
+from models.configuration import RateLimit, RateLimitSettings
+from services.metrics import MetricsRegistry
+
+# Address of the account the RPC calls of the current task are made for, set by `Web3Factory`
+current_account: ContextVar[Optional[str]] = ContextVar('current_account', default=None)
+
+
+class TokenBucket:
+    """`rate` requests per second on average, with bursts of up to `burst` requests."""
+
+    def __init__(self, limit: RateLimit):
+        self._rate = limit.rate
+        self._burst = limit.burst
+        self._tokens = float(self._burst)
+        self._updated_at = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Take a token, going into debt if there is none; returns the seconds until it is paid off."""
+        self._tokens = min(self._tokens + (now - self._updated_at) * self._rate, self._burst)
+        self._updated_at = now
+        self._tokens -= 1
+        return max(-self._tokens / self._rate, 0)
+
+
+class RateLimiter:
+    """
+    Token buckets shared by every outgoing RPC and HTTP request.
+
+    A request takes a token from the bucket of its destination host, of its proxy
+    (requests without a proxy share one bucket) and of the account it is made for,
+    and waits until the slowest of them has paid it off. Tokens are taken up front,
+    so waiting requests go out in the order they arrived. Hosts without an entry in
+    `hosts` use `default_host`; a scope without a limit is not limited.
+    """
+
+    def __init__(self, settings: RateLimitSettings, metrics: MetricsRegistry):
+        self._settings = settings
+        self._metrics = metrics
+        self._buckets: dict[tuple[str, Optional[str]], TokenBucket] = {}
+        self._enabled = bool(settings.hosts) or any(
+            limit is not None for limit in (settings.default_host, settings.proxy, settings.account)
+        )
+
+    async def acquire(self, url: str, proxy: Optional[str], account: Optional[str] = None, account_scope: bool = True) -> None:
+        """
+        Wait for a request to `url`; `account` defaults to the account of the current task.
+
+        Requests of several accounts, such as a coalesced batch, pass `account_scope=False`.
+        """
+        if not self._enabled:
+            return
+        host = urlsplit(url).hostname or url
+        account = (account or current_account.get()) if account_scope else None
+        scopes = [
+            ('host', host, self._settings.hosts.get(host, self._settings.default_host)),
+            ('proxy', proxy, self._settings.proxy),
+            ('account', account, self._settings.account if account else None),
+        ]
+
+        now = time.monotonic()
+        wait, limited_by = 0.0, None
+        for scope, key, limit in scopes:
+            if limit is None:
+                continue
+            bucket = self._buckets.get((scope, key))
+            if bucket is None:
+                bucket = self._buckets[(scope, key)] = TokenBucket(limit)
+            delay = bucket.reserve(now)
+            if delay > wait:
+                wait, limited_by = delay, scope
+
+        if wait > 0:
+            self._metrics.increment('pharos_rate_limit_wait_seconds_total', wait, scope=limited_by, host=host)
+            await asyncio.sleep(wait)
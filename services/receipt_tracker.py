@@ -0,0 +1,159 @@
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass
+
+from hexbytes import HexBytes
+from loguru._logger import Logger
+from web3 import AsyncWeb3
+from web3._utils.method_formatters import receipt_formatter
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+from web3.types import TxReceipt
+
+from constants.chain import RPC_URL
+from models.configuration import ReceiptSettings
+from services.chain_head_tracker import ChainHeadTracker
+from services.rpc_middleware import make_observed_batch_request, make_observed_request
+from services.rpc_providers import BatchRejectedError
+from services.rpc_session_pool import RpcSessionPool
+
+# JSON-RPC error of a node that does not implement the method, other errors are transient
+METHOD_NOT_FOUND = -32601
+
+
+@dataclass
+class _PendingReceipt:
+    future: asyncio.Future
+    checked: bool = False
+
+
+class ReceiptTracker:
+    """
+    Confirms transactions of all accounts with one polling loop per RPC endpoint.
+
+    Every new block reported by the chain head tracker is scanned with
+    `eth_getBlockReceipts`. Hashes that were not found there (newly registered ones,
+    and all of them when the node lacks `eth_getBlockReceipts`) are looked up with a
+    single batched `eth_getTransactionReceipt` request.
+    """
+
+    def __init__(
+        self,
+        settings: ReceiptSettings,
+        chain_head_tracker: ChainHeadTracker,
+        session_pool: RpcSessionPool,
+        logger: Logger
+    ):
+        self._settings = settings
+        self._chain_head_tracker = chain_head_tracker
+        self._session_pool = session_pool
+        self._logger = logger
+        self._pending: dict[str, dict[str, _PendingReceipt]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._block_receipts_supported: dict[str, bool] = {}
+
+    async def wait_for_receipt(self, tx_hash: HexBytes | str, timeout: float | None = None, rpc_url: str = RPC_URL) -> TxReceipt:
+        key = HexBytes(tx_hash).to_0x_hex().lower()
+        timeout = timeout or self._settings.timeout
+        pending = self._pending.setdefault(rpc_url, {})
+        if key not in pending:
+            pending[key] = _PendingReceipt(future=asyncio.get_running_loop().create_future())
+        entry = pending[key]
+        self._ensure_polling(rpc_url)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry.future), timeout)
+        except asyncio.TimeoutError:
+            raise TimeExhausted(f'Transaction {key} is not in the chain after {timeout} seconds')
+        finally:
+            if pending.get(key) is entry:
+                del pending[key]
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _ensure_polling(self, rpc_url: str) -> None:
+        task = self._tasks.get(rpc_url)
+        if task is None or task.done():
+            # Shared by every account, so it does not run in the context of the caller that started it
+            self._tasks[rpc_url] = asyncio.create_task(self._poll(rpc_url), context=contextvars.Context())
+
+    async def _poll(self, rpc_url: str) -> None:
+        pending = self._pending[rpc_url]
+        async with self._session_pool.session(rpc_url, None) as web3:
+            last_scanned = None
+            last_fallback = time.monotonic()
+            while pending:
+                try:
+                    # Inside the retry loop, the waiters would hang until their timeout if polling died
+                    if last_scanned is None:
+                        last_scanned = (await self._chain_head_tracker.get_head(rpc_url)).number
+                    try:
+                        head = await self._chain_head_tracker.wait_for_block(
+                            last_scanned, rpc_url, timeout=self._settings.fallback_interval
+                        )
+                    except asyncio.TimeoutError:
+                        head = None
+
+                    if head is not None and self._block_receipts_supported.get(rpc_url, True):
+                        first_block = max(last_scanned + 1, head.number - self._settings.max_blocks_per_poll + 1)
+                        for number in range(first_block, head.number + 1):
+                            if not pending or not await self._scan_block(web3, rpc_url, number, pending):
+                                break
+                        last_scanned = head.number
+                    elif head is not None:
+                        last_scanned = head.number
+
+                    fallback_due = time.monotonic() - last_fallback >= self._settings.fallback_interval
+                    to_check = [
+                        key for key, entry in pending.items()
+                        if not entry.checked or fallback_due or not self._block_receipts_supported.get(rpc_url, True)
+                    ]
+                    if to_check:
+                        await self._check_receipts(web3, to_check, pending)
+                    if fallback_due:
+                        last_fallback = time.monotonic()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._logger.warning(f'Failed to poll transaction receipts from {rpc_url}: {e}')
+                    await asyncio.sleep(self._chain_head_tracker.get_block_time(rpc_url))
+
+    async def _scan_block(self, web3: AsyncWeb3, rpc_url: str, number: int, pending: dict[str, _PendingReceipt]) -> bool:
+        response = await make_observed_request(web3, 'eth_getBlockReceipts', [hex(number)])
+        error = response.get('error')
+        if isinstance(error, dict) and error.get('code') == METHOD_NOT_FOUND:
+            self._logger.info(f'eth_getBlockReceipts is not available on {rpc_url}, polling receipts by hash')
+            self._block_receipts_supported[rpc_url] = False
+            return False
+        if error is not None or response.get('result') is None:
+            # Throttled, or the node has not caught up with the head yet; the by-hash fallback covers it
+            return False
+
+        for raw_receipt in response['result']:
+            self._resolve(pending, raw_receipt)
+        return True
+
+    async def _check_receipts(self, web3: AsyncWeb3, keys: list[str], pending: dict[str, _PendingReceipt]) -> None:
+        requests = [('eth_getTransactionReceipt', [key]) for key in keys]
+        try:
+            responses = await make_observed_batch_request(web3, requests)
+        except BatchRejectedError:
+            responses = await asyncio.gather(*(make_observed_request(web3, *request) for request in requests))
+
+        for key, response in zip(keys, responses):
+            entry = pending.get(key)
+            if entry is not None:
+                entry.checked = True
+            if response.get('result'):
+                self._resolve(pending, response['result'])
+
+    def _resolve(self, pending: dict[str, _PendingReceipt], raw_receipt: dict) -> None:
+        entry = pending.get(raw_receipt['transactionHash'].lower())
+        if entry is not None and not entry.future.done():
+            entry.future.set_result(AttributeDict.recursive(receipt_formatter(raw_receipt)))
@@ -0,0 +1,176 @@
+import asyncio
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Iterator, Optional
+
+import aiohttp
+import httpx
+from loguru._logger import Logger
+
+from models.configuration import RetrySettings
+from services.allowance_cache import AllowanceCache
+from services.metrics import MetricsRegistry
+from services.nonce_manager import NonceManager
+from services.tracer import Tracer
+
+# Web3 exceptions are matched by name, so that the API features do not import web3
+_REVERT_ERRORS = ('ContractLogicError', 'ContractCustomError', 'ContractPanicError')
+_REVERT_MESSAGES = ('execution reverted', 'insufficient funds')
+_RATE_LIMIT_MESSAGE = re.compile(r'\b429\b|too many requests|rate limit')
+
+
+class ErrorKind(Enum):
+    RATE_LIMITED = 'rate_limited'
+    NETWORK = 'network'
+    UNCONFIRMED = 'unconfirmed'
+    NONCE = 'nonce'
+    ALLOWANCE = 'allowance'
+    PERMANENT = 'permanent'
+    UNKNOWN = 'unknown'
+
+
+class TransactionReverted(Exception):
+    """A transaction was mined with a failed status."""
+
+
+def classify(error: Optional[BaseException]) -> ErrorKind:
+    if error is None:
+        return ErrorKind.UNKNOWN
+    status = _status_code(error)
+    message = str(error).lower()
+    if status == 429 or _RATE_LIMIT_MESSAGE.search(message):
+        return ErrorKind.RATE_LIMITED
+    if NonceManager.is_nonce_error(error):
+        return ErrorKind.NONCE
+    if AllowanceCache.is_allowance_error(error):
+        return ErrorKind.ALLOWANCE
+    if isinstance(error, TransactionReverted) \
+            or type(error).__name__ in _REVERT_ERRORS \
+            or any(pattern in message for pattern in _REVERT_MESSAGES):
+        return ErrorKind.PERMANENT
+    if type(error).__name__ == 'TimeExhausted':
+        # The transaction was broadcast and may still be mined, a retry would send another one
+        return ErrorKind.UNCONFIRMED
+    if status is not None:
+        # Other client errors (bad request, unauthorized, ...) fail the same way again
+        return ErrorKind.NETWORK if status >= 500 or status == 408 else ErrorKind.PERMANENT
+    if isinstance(error, (httpx.TransportError, aiohttp.ClientError, asyncio.TimeoutError, OSError)):
+        return ErrorKind.NETWORK
+    return ErrorKind.UNKNOWN
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from the `Retry-After` header of an HTTP error response, if there is one."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(error, 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status
+    return None
+
+
+class Attempt:
+    def __init__(self, policy: 'RetryPolicy', number: int, count: int):
+        self._policy = policy
+        self.number = number
+        self.count = count
+
+    @property
+    def is_last(self) -> bool:
+        return self.number >= self.count
+
+    async def backoff(self, error: Optional[BaseException], address: str) -> bool:
+        """
+        Wait before the next attempt after `error`.
+
+        Returns False without waiting if the error is permanent, this was the last
+        attempt or the retry budget of the feature is spent.
+        """
+        return await self._policy.backoff(self, error, address)
+
+
+class RetryPolicy:
+    """
+    Backoff between the attempts of one operation of a feature, by error kind.
+
+    - rate limited: the `Retry-After` of the response, else `rate_limit_delay`;
+      not retried if the server asks for more than `max_delay`
+    - network and unknown errors: exponential backoff with full jitter,
+      `base_delay * multiplier ** (attempt - 1)` capped at `max_delay`
+    - nonce conflicts and stale allowances: retried at once, the nonce manager
+      has resynced and the allowance cache entry was dropped by then
+    - permanent errors (reverts, client errors): not retried
+    - receipt timeouts: not retried, the transaction was sent and may still be mined
+
+    Retries of all accounts draw from one budget per feature, a bucket of at most
+    `budget_burst` retries that every first attempt refills by `budget_ratio`, so
+    retries stop instead of multiplying the load while an API or RPC endpoint is down.
+    Pacing between successful actions is not a retry and is left to the features.
+    """
+
+    def __init__(self, feature: str, settings: RetrySettings, metrics: MetricsRegistry, tracer: Tracer, logger: Logger):
+        self._feature = feature
+        self._settings = settings
+        self._metrics = metrics
+        self._tracer = tracer
+        self._logger = logger
+        self._budget = float(settings.budget_burst)
+
+    def attempts(self, count: int) -> Iterator[Attempt]:
+        self._budget = min(self._budget + self._settings.budget_ratio, self._settings.budget_burst)
+        for number in range(1, max(count, 1) + 1):
+            yield Attempt(self, number, count)
+
+    async def backoff(self, attempt: Attempt, error: Optional[BaseException], address: str) -> bool:
+        kind = classify(error)
+        if kind == ErrorKind.PERMANENT:
+            self._logger.warning(f'[{address}] Not retrying a permanent error: {error}')
+            return False
+        if kind == ErrorKind.UNCONFIRMED:
+            self._logger.warning(f'[{address}] Not retrying a sent transaction that is not confirmed yet: {error}')
+            return False
+        if attempt.is_last:
+            return False
+        delay = self._delay(kind, attempt.number, error)
+        if delay > self._settings.max_delay:
+            self._logger.warning(f'[{address}] Rate limited for {delay:.0f} seconds, not retrying')
+            return False
+        if self._budget < 1:
+            self._metrics.increment('pharos_retries_total', feature=self._feature, kind=kind.value, outcome='budget_exhausted')
+            self._logger.warning(f'[{address}] Retry budget of {self._feature} is spent, not retrying')
+            return False
+
+        self._budget -= 1
+        self._metrics.increment('pharos_retries_total', feature=self._feature, kind=kind.value, outcome='retried')
+        if delay > 0:
+            self._logger.info(f'[{address}] Retrying after {delay:.1f} seconds ({kind.value} error)')
+            self._metrics.increment('pharos_sleep_seconds_total', delay, feature=self._feature)
+            await self._tracer.sleep(delay, 'backoff')
+        return True
+
+    def _delay(self, kind: ErrorKind, number: int, error: Optional[BaseException]) -> float:
+        if kind in (ErrorKind.NONCE, ErrorKind.ALLOWANCE):
+            return 0
+        if kind == ErrorKind.RATE_LIMITED:
+            delay = retry_after(error)
+            return delay if delay is not None else self._settings.rate_limit_delay
+        ceiling = min(self._settings.base_delay * self._settings.multiplier ** (number - 1), self._settings.max_delay)
+        return random.uniform(0, ceiling)
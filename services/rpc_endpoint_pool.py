@@ -0,0 +1,134 @@
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from loguru._logger import Logger
+
+from constants.chain import RPC_URL
+from models.configuration import RpcSettings
+from services.rpc_observer import RpcObserver
+
+WRITE_METHODS = frozenset({'eth_sendRawTransaction', 'eth_sendTransaction'})
+# The nonce is read from the node that receives the transactions, other nodes may not have them pending yet
+WRITE_AFFINE_METHODS = WRITE_METHODS | {'eth_getTransactionCount'}
+# Share of reads sent to another healthy endpoint than the fastest, so that every score stays current
+EXPLORE_RATIO = 0.05
+
+
+@dataclass
+class _EndpointHealth:
+    latency: Optional[float] = None
+    consecutive_errors: int = 0
+    ejections: int = 0
+    ejected_until: float = 0
+    probing: bool = False
+
+    def on_probation(self, now: float) -> bool:
+        return self.ejections > 0 and self.ejected_until <= now
+
+
+class RpcEndpointPool(RpcObserver):
+    """
+    Health and latency scores of the configured RPC endpoints.
+
+    Every RPC call is reported to the pool, which keeps an exponentially weighted
+    mean latency per endpoint. Requests are routed to the fastest available endpoint,
+    writes (and nonce reads) to `write_endpoint` while it is available. After
+    `eject_after_errors` consecutive errors an endpoint is ejected for `eject_seconds`,
+    doubled with every repeated ejection up to `max_eject_seconds`. When that time is
+    up it is on probation: it receives one request at a time until one succeeds, and
+    is ejected again as soon as one fails.
+    """
+
+    def __init__(self, settings: RpcSettings, logger: Logger):
+        self._settings = settings
+        self._logger = logger
+        self._endpoints = list(settings.endpoints) or [RPC_URL]
+        self._write_endpoint = settings.write_endpoint
+        self._health = {endpoint: _EndpointHealth() for endpoint in [*self._endpoints, self._write_endpoint] if endpoint}
+
+    @property
+    def routed(self) -> bool:
+        """Whether there is more than one endpoint to choose from."""
+        return len(self._health) > 1
+
+    @property
+    def endpoints(self) -> list[str]:
+        return list(self._health)
+
+    def route(self, method: str) -> list[str]:
+        """
+        Endpoints to send a `method` request to, the preferred one first.
+
+        The preferred one is claimed for the request, the others have to be claimed
+        with `claim` before a request is failed over to them.
+        """
+        now = time.monotonic()
+        available = [endpoint for endpoint in self._endpoints if self._is_available(endpoint, now)]
+        if not available:
+            # Everything is ejected, the endpoint that is back first is the best guess
+            return [min(self._endpoints, key=lambda endpoint: self._health[endpoint].ejected_until)]
+
+        ranked = sorted(available, key=self._score)
+        if len(ranked) > 1 and random.random() < EXPLORE_RATIO:
+            index = random.randrange(1, len(ranked))
+            ranked[0], ranked[index] = ranked[index], ranked[0]
+        if method in WRITE_AFFINE_METHODS and self._write_endpoint and self._is_available(self._write_endpoint, now):
+            ranked = [self._write_endpoint, *(endpoint for endpoint in ranked if endpoint != self._write_endpoint)]
+
+        self.claim(ranked[0])
+        return ranked
+
+    def claim(self, endpoint: str) -> bool:
+        """Take an endpoint for a request; False if it is ejected, or on probation with its probe taken."""
+        now = time.monotonic()
+        if not self._is_available(endpoint, now):
+            return False
+        health = self._health[endpoint]
+        if health.on_probation(now):
+            health.probing = True
+        return True
+
+    def release(self, endpoint: str) -> None:
+        """Give back the probe of an endpoint whose request was cancelled before it completed."""
+        health = self._health.get(endpoint)
+        if health is not None:
+            health.probing = False
+
+    def on_rpc_call(self, endpoint: str, proxy: str | None, method: str, latency: float, error: bool) -> None:
+        health = self._health.get(endpoint)
+        if health is None:
+            return
+        now = time.monotonic()
+        health.probing = False
+        if not error:
+            if health.ejections:
+                self._logger.info(f'RPC endpoint {endpoint} recovered')
+            health.ejections = 0
+            health.consecutive_errors = 0
+            health.latency = latency if health.latency is None \
+                else health.latency + self._settings.latency_decay * (latency - health.latency)
+            return
+
+        if now < health.ejected_until:
+            # A request that was sent before the endpoint was ejected
+            return
+        health.consecutive_errors += 1
+        if health.on_probation(now) or health.consecutive_errors >= self._settings.eject_after_errors:
+            duration = min(self._settings.eject_seconds * 2 ** health.ejections, self._settings.max_eject_seconds)
+            health.ejections += 1
+            health.ejected_until = now + duration
+            health.consecutive_errors = 0
+            self._logger.warning(f'RPC endpoint {endpoint} is failing, ejected for {duration:.0f} seconds')
+
+    def _is_available(self, endpoint: str, now: float) -> bool:
+        health = self._health[endpoint]
+        if health.ejected_until > now:
+            return False
+        return not (health.on_probation(now) and health.probing)
+
+    def _score(self, endpoint: str) -> float:
+        # Endpoints without a measurement yet are tried first
+        latency = self._health[endpoint].latency
+        return 0 if latency is None else latency
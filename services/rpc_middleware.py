@@ -0,0 +1,61 @@
+import time
+from typing import Any
+
+from web3 import AsyncWeb3
+from web3.middleware import Web3Middleware
+from web3.types import RPCEndpoint, RPCResponse
+
+from services.rpc_observer import RpcObserver, is_throttled_response
+
+# Name of the observer middleware in the middleware onion of a pooled `AsyncWeb3`
+OBSERVER_MIDDLEWARE = 'rpc_observer'
+
+
+def build_observer_middleware(endpoint: str, proxy: str | None, observers: list[RpcObserver]) -> type[Web3Middleware]:
+    """Build a web3 middleware that reports the latency and outcome of every RPC call to `observers`."""
+
+    def notify(method: str, latency: float, error: bool) -> None:
+        for observer in observers:
+            observer.on_rpc_call(endpoint, proxy, method, latency, error)
+
+    class RpcObserverMiddleware(Web3Middleware):
+        # Used for the raw batches, which web3 does not pass through the middleware
+        report = staticmethod(notify)
+
+        async def async_wrap_make_request(self, make_request):
+            async def middleware(method: RPCEndpoint, params: Any) -> RPCResponse:
+                started_at = time.perf_counter()
+                try:
+                    response = await make_request(method, params)
+                except Exception:
+                    notify(method, time.perf_counter() - started_at, True)
+                    raise
+                notify(method, time.perf_counter() - started_at, is_throttled_response(response))
+                return response
+
+            return middleware
+
+    return RpcObserverMiddleware
+
+
+async def make_observed_request(web3: AsyncWeb3, method: RPCEndpoint, params: Any) -> RPCResponse:
+    """Send a raw request through the middleware of `web3`, without formatting the response."""
+    make_request = await web3.provider.request_func(web3, web3.middleware_onion)
+    return await make_request(method, params)
+
+
+async def make_observed_batch_request(web3: AsyncWeb3, requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse]:
+    """Send a raw batch with `make_raw_batch_request`, reporting it to the observers of `web3` as one call."""
+    middleware = web3.middleware_onion.get(OBSERVER_MIDDLEWARE)
+    if middleware is None:
+        # Not observed, or a routing provider that reports the calls itself
+        return await web3.provider.make_raw_batch_request(requests)
+
+    started_at = time.perf_counter()
+    try:
+        responses = await web3.provider.make_raw_batch_request(requests)
+    except Exception:
+        middleware.report('batch', time.perf_counter() - started_at, True)
+        raise
+    middleware.report('batch', time.perf_counter() - started_at, any(is_throttled_response(r) for r in responses))
+    return responses
@@ -0,0 +1,18 @@
+from abc import ABC, abstractmethod
+
+# JSON-RPC error codes that mean the node is overloaded rather than the request being invalid
+THROTTLING_ERROR_CODES = (-32005, -32029, 429)
+
+
+class RpcObserver(ABC):
+    @abstractmethod
+    def on_rpc_call(self, endpoint: str, proxy: str | None, method: str, latency: float, error: bool) -> None:
+        pass
+
+
+def is_throttled_response(response: dict) -> bool:
+    error = response.get('error')
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get('message', '')).lower()
+    return error.get('code') in THROTTLING_ERROR_CODES or 'rate limit' in message or 'too many requests' in message
@@ -0,0 +1,230 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from aiohttp import ClientConnectorError, ClientError
+from web3 import AsyncHTTPProvider
+from web3._utils.caching import async_handle_request_caching
+from web3.providers.async_base import AsyncBaseProvider
+from web3.types import RPCEndpoint, RPCRequest, RPCResponse
+
+from services.rate_limiter import RateLimiter
+from services.rpc_endpoint_pool import WRITE_METHODS, RpcEndpointPool
+from services.rpc_observer import RpcObserver, is_throttled_response
+
+T = TypeVar('T')
+
+
+class BatchRejectedError(Exception):
+    def __init__(self, response: RPCResponse):
+        super().__init__(f'JSON-RPC batch was rejected: {response}')
+        self.response = response
+
+
+class PooledHTTPProvider(AsyncHTTPProvider):
+    """
+    AsyncHTTPProvider used for pooled RPC sessions.
+
+    Adds `make_raw_batch_request`, which sends a JSON-RPC batch without switching the
+    shared provider into web3's batching mode (that flag would capture the concurrent
+    requests of every other caller on the same provider).
+
+    Every HTTP request waits for the rate limiter first; a batch counts as one request.
+    """
+
+    def __init__(self, endpoint_uri: str, rate_limiter: RateLimiter, proxy: str | None = None, **kwargs: Any):
+        super().__init__(endpoint_uri, **kwargs)
+        self._rate_limiter = rate_limiter
+        self._proxy = proxy
+
+    async def _make_request(self, method: RPCEndpoint, request_data: bytes) -> bytes:
+        await self._rate_limiter.acquire(self.endpoint_uri, self._proxy)
+        return await super()._make_request(method, request_data)
+
+    async def make_raw_batch_request(self, requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse]:
+        """Send `requests` as one batch POST and return the responses in request order."""
+        return await self._post_batch([self.form_request(method, params) for method, params in requests])
+
+    async def _post_batch(self, requests: list[RPCRequest]) -> list[RPCResponse]:
+        request_data = b'[' + b', '.join(self.encode_rpc_dict(request) for request in requests) + b']'
+        # A batch may carry the requests of several accounts, it only counts for the endpoint and proxy
+        await self._rate_limiter.acquire(self.endpoint_uri, self._proxy, account_scope=False)
+        raw_response = await self._request_session_manager.async_make_post_request(
+            self.endpoint_uri, request_data, **self.get_request_kwargs()
+        )
+        responses = self.decode_rpc_response(raw_response)
+        if not isinstance(responses, list):
+            # The node rejected the batch as a whole (e.g. batching is not supported)
+            raise BatchRejectedError(responses)
+
+        responses_by_id = {response.get('id'): response for response in responses}
+        return [
+            responses_by_id.get(request['id']) or {
+                'jsonrpc': '2.0',
+                'id': request['id'],
+                'error': {'code': -32603, 'message': 'Missing response in JSON-RPC batch'}
+            }
+            for request in requests
+        ]
+
+
+class BatchingHTTPProvider(PooledHTTPProvider):
+    """
+    Pooled provider that coalesces concurrent requests into JSON-RPC batches.
+
+    Requests issued within `window` seconds of each other (up to `max_size` per batch)
+    are sent as one batch POST. Every caller receives its own response, so JSON-RPC
+    errors stay isolated to the request that caused them.
+    """
+
+    def __init__(self, endpoint_uri: str, window: float, max_size: int, **kwargs: Any):
+        super().__init__(endpoint_uri, **kwargs)
+        self._window = window
+        self._max_size = max_size
+        self._pending: list[tuple[RPCRequest, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._in_flight: set[asyncio.Task] = set()
+
+    @async_handle_request_caching
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((self.form_request(method, params), future))
+
+        if len(self._pending) >= self._max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # Not in the context of the caller that happened to schedule the flush, the batch is not its own
+        task = asyncio.create_task(self._send(batch), context=contextvars.Context())
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: list[tuple[RPCRequest, asyncio.Future]]) -> None:
+        if len(batch) == 1:
+            await self._send_single(*batch[0])
+            return
+
+        try:
+            responses = await self._post_batch([request for request, _ in batch])
+        except BatchRejectedError:
+            await asyncio.gather(*(self._send_single(request, future) for request, future in batch))
+            return
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
+
+    async def _send_single(self, request: RPCRequest, future: asyncio.Future) -> None:
+        try:
+            raw_response = await self._make_request(request['method'], self.encode_rpc_dict(request))
+            response = self.decode_rpc_response(raw_response)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        if not future.done():
+            future.set_result(response)
+
+
+class RoutingHTTPProvider(AsyncBaseProvider):
+    """
+    Provider that sends every request to the endpoint chosen by an `RpcEndpointPool`.
+
+    Holds one pooled provider per endpoint. A read that fails with a connection
+    error, timeout or throttling response is sent once more to the next endpoint;
+    a write only if the connection to the first one could not be established, so a
+    transaction is never sent twice. The calls are reported to the observers with
+    the endpoint that served them, which is how the pool keeps its scores current.
+    `endpoint_uri` is the logical RPC URL the provider stands for.
+    """
+
+    def __init__(
+        self,
+        endpoint_uri: str,
+        providers: dict[str, PooledHTTPProvider],
+        endpoint_pool: RpcEndpointPool,
+        proxy: str | None,
+        observers: list[RpcObserver],
+        **kwargs: Any
+    ):
+        super().__init__(**kwargs)
+        self.endpoint_uri = endpoint_uri
+        self._providers = providers
+        self._endpoint_pool = endpoint_pool
+        self._proxy = proxy
+        self._observers = observers
+
+    @async_handle_request_caching
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return await self._route(method, lambda provider: provider.make_request(method, params))
+
+    async def make_raw_batch_request(self, requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse]:
+        # A batch that carries a transaction is routed and failed over like the transaction
+        method = next((method for method, _ in requests if method in WRITE_METHODS), RPCEndpoint('batch'))
+        return await self._route(method, lambda provider: provider.make_raw_batch_request(requests))
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+    async def disconnect(self) -> None:
+        for provider in self._providers.values():
+            await provider.disconnect()
+
+    async def _route(self, method: str, send: Callable[[PooledHTTPProvider], Awaitable[T]]) -> T:
+        endpoint, *fallbacks = self._endpoint_pool.route(method)
+        while True:
+            started_at = time.perf_counter()
+            try:
+                response = await send(self._providers[endpoint])
+            except asyncio.CancelledError:
+                # Not an outcome of the endpoint, but a probe it was given has to be released
+                self._endpoint_pool.release(endpoint)
+                raise
+            except Exception as e:
+                self._notify(endpoint, method, time.perf_counter() - started_at, True)
+                fallback = self._claim_fallback(fallbacks) if self._can_fail_over(method, e) else None
+                if fallback is None:
+                    raise
+                endpoint, fallbacks = fallback, []
+                continue
+
+            throttled = isinstance(response, dict) and is_throttled_response(response)
+            self._notify(endpoint, method, time.perf_counter() - started_at, throttled)
+            fallback = self._claim_fallback(fallbacks) if throttled and method not in WRITE_METHODS else None
+            if fallback is None:
+                return response
+            endpoint, fallbacks = fallback, []
+
+    def _claim_fallback(self, endpoints: list[str]) -> str | None:
+        # Claimed only now, an endpoint on probation may have been given to another request meanwhile
+        return next((endpoint for endpoint in endpoints if self._endpoint_pool.claim(endpoint)), None)
+
+    def _notify(self, endpoint: str, method: str, latency: float, error: bool) -> None:
+        for observer in self._observers:
+            observer.on_rpc_call(endpoint, self._proxy, method, latency, error)
+
+    @staticmethod
+    def _can_fail_over(method: str, error: Exception) -> bool:
+        if method in WRITE_METHODS:
+            return isinstance(error, ClientConnectorError)
+        return isinstance(error, (ClientError, asyncio.TimeoutError, OSError))
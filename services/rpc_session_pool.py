@@ -0,0 +1,173 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from loguru._logger import Logger
+from web3 import AsyncWeb3
+
+from constants.chain import RPC_URL
+from models.configuration import RpcSettings
+from services.rate_limiter import RateLimiter
+from services.rpc_endpoint_pool import RpcEndpointPool
+from services.rpc_middleware import OBSERVER_MIDDLEWARE, build_observer_middleware
+from services.rpc_observer import RpcObserver
+from services.rpc_providers import BatchingHTTPProvider, PooledHTTPProvider, RoutingHTTPProvider
+
+# web3 validates the chain id before every call, it never changes. The validation threshold
+# only applies to block-dependent requests; fixing it keeps web3 from switching the cache
+# off while it looks the chain up, which lets concurrent callers past the cache
+CACHE_KWARGS = {
+    "cache_allowed_requests": True,
+    "cacheable_requests": {'eth_chainId'},
+    "request_cache_validation_threshold": None
+}
+
+
+@dataclass
+class _PooledSession:
+    provider: PooledHTTPProvider | RoutingHTTPProvider
+    web3: AsyncWeb3
+    leases: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class RpcSessionPool:
+    """
+    Process-wide registry of keep-alive RPC sessions.
+
+    One provider (and one aiohttp connection pool) is kept per (RPC URL, proxy)
+    pair and shared by every caller that uses the same route. Sessions that
+    have not been leased for `idle_timeout` seconds are closed in the background.
+    With `batch_requests` enabled, concurrent requests on a route are coalesced
+    into JSON-RPC batches. Every call made through a pooled `AsyncWeb3` is reported
+    to the registered observers.
+
+    When several endpoints are configured, the sessions of `RPC_URL` route each
+    request to the endpoint chosen by the endpoint pool.
+    """
+
+    def __init__(
+        self,
+        settings: RpcSettings,
+        endpoint_pool: RpcEndpointPool,
+        rate_limiter: RateLimiter,
+        logger: Logger,
+        observers: list[RpcObserver] | None = None
+    ):
+        self._settings = settings
+        self._endpoint_pool = endpoint_pool
+        self._rate_limiter = rate_limiter
+        self._logger = logger
+        self._observers = observers or []
+        self._sessions: dict[tuple[str, str | None], _PooledSession] = {}
+        self._lock = asyncio.Lock()
+        self._eviction_task: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def session(self, rpc_url: str, proxy: str | None) -> AsyncIterator[AsyncWeb3]:
+        web3 = await self.acquire(rpc_url, proxy)
+        try:
+            yield web3
+        finally:
+            self.release(rpc_url, proxy)
+
+    async def acquire(self, rpc_url: str, proxy: str | None) -> AsyncWeb3:
+        key = (rpc_url, proxy or None)
+        async with self._lock:
+            pooled = self._sessions.get(key)
+            if pooled is None:
+                pooled = await self._open(rpc_url, proxy or None)
+                self._sessions[key] = pooled
+            pooled.leases += 1
+            pooled.last_used = time.monotonic()
+            self._ensure_eviction_task()
+            return pooled.web3
+
+    def release(self, rpc_url: str, proxy: str | None) -> None:
+        pooled = self._sessions.get((rpc_url, proxy or None))
+        if pooled is None:
+            return
+        pooled.leases = max(0, pooled.leases - 1)
+        pooled.last_used = time.monotonic()
+
+    async def close(self) -> None:
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+            self._eviction_task = None
+
+        async with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for pooled in sessions:
+            await pooled.provider.disconnect()
+        if sessions:
+            self._logger.info(f'Closed {len(sessions)} pooled RPC session(s)')
+
+    async def _open(self, rpc_url: str, proxy: str | None) -> _PooledSession:
+        if rpc_url == RPC_URL and self._endpoint_pool.routed:
+            providers = {endpoint: await self._open_provider(endpoint, proxy) for endpoint in self._endpoint_pool.endpoints}
+            provider = RoutingHTTPProvider(rpc_url, providers, self._endpoint_pool, proxy, self._observers, **CACHE_KWARGS)
+            # The routing provider reports the calls itself, with the endpoint that served them
+            return _PooledSession(provider=provider, web3=AsyncWeb3(provider))
+
+        provider = await self._open_provider(rpc_url, proxy)
+        web3 = AsyncWeb3(provider)
+        if self._observers:
+            web3.middleware_onion.add(build_observer_middleware(rpc_url, proxy, self._observers), OBSERVER_MIDDLEWARE)
+        return _PooledSession(provider=provider, web3=web3)
+
+    async def _open_provider(self, rpc_url: str, proxy: str | None) -> PooledHTTPProvider:
+        provider_kwargs = {
+            "request_kwargs": {
+                "proxy": proxy,
+                "ssl": False
+            },
+            "rate_limiter": self._rate_limiter,
+            "proxy": proxy,
+            **CACHE_KWARGS
+        }
+        if self._settings.batch_requests:
+            provider = BatchingHTTPProvider(
+                rpc_url,
+                window=self._settings.batch_window_ms / 1000,
+                max_size=self._settings.batch_max_size,
+                **provider_kwargs
+            )
+        else:
+            provider = PooledHTTPProvider(rpc_url, **provider_kwargs)
+        # web3 creates `force_close` sessions by default, which defeats keep-alive
+        await provider.cache_async_session(ClientSession(
+            raise_for_status=True,
+            timeout=ClientTimeout(total=self._settings.request_timeout),
+            connector=TCPConnector(
+                limit=self._settings.connection_limit,
+                keepalive_timeout=self._settings.idle_timeout,
+                enable_cleanup_closed=True
+            )
+        ))
+        return provider
+
+    def _ensure_eviction_task(self) -> None:
+        if self._eviction_task is None or self._eviction_task.done():
+            self._eviction_task = asyncio.create_task(self._evict_idle_sessions())
+
+    async def _evict_idle_sessions(self) -> None:
+        interval = max(1, self._settings.idle_timeout / 2)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            async with self._lock:
+                idle = [
+                    key for key, pooled in self._sessions.items()
+                    if pooled.leases == 0 and now - pooled.last_used >= self._settings.idle_timeout
+                ]
+                evicted = [self._sessions.pop(key) for key in idle]
+
+            for pooled in evicted:
+                await pooled.provider.disconnect()
+            if evicted:
+                self._logger.debug(f'Evicted {len(evicted)} idle RPC session(s)')
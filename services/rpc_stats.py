@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+
+from services.rpc_observer import RpcObserver
+
+
+@dataclass
+class RpcWindow:
+    calls: int
+    errors: int
+    mean_latency: float
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+
+class RpcStats(RpcObserver):
+    """Aggregates RPC call outcomes into windows that are drained by the concurrency controller."""
+
+    def __init__(self):
+        self._calls = 0
+        self._errors = 0
+        self._total_latency = 0.0
+
+    def on_rpc_call(self, endpoint: str, proxy: str | None, method: str, latency: float, error: bool) -> None:
+        self._calls += 1
+        self._total_latency += latency
+        if error:
+            self._errors += 1
+
+    def drain(self) -> RpcWindow:
+        window = RpcWindow(
+            calls=self._calls,
+            errors=self._errors,
+            mean_latency=self._total_latency / self._calls if self._calls else 0.0
+        )
+        self._calls = 0
+        self._errors = 0
+        self._total_latency = 0.0
+        return window
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from loguru._logger import Logger
+
+from models.run_state import FeatureProgress
+
+
+class RunStateStore:
+    """
+    Per-account, per-feature and per-day outcomes of previous runs in a SQLite file.
+
+    Lets a rerun skip features that already finished today, continue transaction quotas
+    where a crashed run stopped and skip faucet claims until the next claim is available.
+    Also holds the job queue of the daemon mode. Days are UTC dates.
+    """
+
+    def __init__(self, path: str, logger: Logger):
+        self._path = path
+        self._logger = logger
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as connection:
+            # WAL lets the worker processes of a sharded run read while another one writes
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS feature_runs ('
+                ' address TEXT NOT NULL,'
+                ' feature TEXT NOT NULL,'
+                ' day TEXT NOT NULL,'
+                ' done INTEGER NOT NULL DEFAULT 0,'
+                ' completed INTEGER NOT NULL DEFAULT 0,'
+                ' target INTEGER,'
+                ' PRIMARY KEY (address, feature, day))'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS transactions ('
+                ' tx_hash TEXT PRIMARY KEY,'
+                ' address TEXT NOT NULL,'
+                ' feature TEXT NOT NULL,'
+                ' day TEXT NOT NULL,'
+                ' success INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS faucet_claims ('
+                ' address TEXT PRIMARY KEY,'
+                ' next_claim_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS scheduled_jobs ('
+                ' account_key TEXT NOT NULL,'
+                ' feature TEXT NOT NULL,'
+                ' due_at REAL NOT NULL,'
+                ' PRIMARY KEY (account_key, feature))'
+            )
+
+    async def get_progress(self, address: str, feature: str) -> FeatureProgress:
+        rows = await self._execute(
+            'SELECT done, completed, target FROM feature_runs WHERE address = ? AND feature = ? AND day = ?',
+            (address.lower(), feature, self._today())
+        )
+        if not rows:
+            return FeatureProgress()
+        done, completed, target = rows[0]
+        return FeatureProgress(done=bool(done), completed=completed, target=target)
+
+    async def mark_done(self, address: str, feature: str) -> None:
+        await self._execute(
+            'INSERT INTO feature_runs (address, feature, day, done) VALUES (?, ?, ?, 1) '
+            'ON CONFLICT (address, feature, day) DO UPDATE SET done = 1',
+            (address.lower(), feature, self._today())
+        )
+
+    async def mark_done_if_reached(self, address: str, feature: str) -> bool:
+        """Mark the feature done if today's quota of successful transactions is reached; returns whether it is."""
+        progress = await self.get_progress(address, feature)
+        if progress.target is None or progress.completed < progress.target:
+            return False
+        await self.mark_done(address, feature)
+        return True
+
+    async def set_target(self, address: str, feature: str, target: int) -> None:
+        await self._execute(
+            'INSERT INTO feature_runs (address, feature, day, target) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (address, feature, day) DO UPDATE SET target = excluded.target',
+            (address.lower(), feature, self._today(), target)
+        )
+
+    async def record_transaction(self, address: str, feature: str, tx_hash: str, success: bool) -> None:
+        """Store the transaction; successful ones count towards today's quota of the feature."""
+        day = self._today()
+        statements = [(
+            'INSERT OR REPLACE INTO transactions (tx_hash, address, feature, day, success, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (tx_hash, address.lower(), feature, day, int(success), time.time())
+        )]
+        if success:
+            statements.append((
+                'INSERT INTO feature_runs (address, feature, day, completed) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT (address, feature, day) DO UPDATE SET completed = completed + 1',
+                (address.lower(), feature, day)
+            ))
+        await asyncio.to_thread(self._execute_many, statements)
+
+    async def get_next_faucet_claim(self, address: str) -> float | None:
+        rows = await self._execute('SELECT next_claim_at FROM faucet_claims WHERE address = ?', (address.lower(),))
+        return rows[0][0] if rows else None
+
+    async def set_next_faucet_claim(self, address: str, timestamp: float) -> None:
+        await self._execute(
+            'INSERT OR REPLACE INTO faucet_claims (address, next_claim_at) VALUES (?, ?)',
+            (address.lower(), timestamp)
+        )
+
+    async def get_scheduled_jobs(self) -> dict[tuple[str, str], float]:
+        """Due times of the daemon jobs by account key and feature."""
+        rows = await self._execute('SELECT account_key, feature, due_at FROM scheduled_jobs', ())
+        return {(account_key, feature): due_at for account_key, feature, due_at in rows}
+
+    async def schedule_jobs(self, account_key: str, due_times: dict[str, float]) -> None:
+        await asyncio.to_thread(self._execute_many, [
+            ('INSERT OR REPLACE INTO scheduled_jobs (account_key, feature, due_at) VALUES (?, ?, ?)', (account_key, feature, due_at))
+            for feature, due_at in due_times.items()
+        ])
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=30)
+
+    async def _execute(self, statement: str, parameters: tuple[Any, ...]) -> list[tuple]:
+        return (await asyncio.to_thread(self._execute_many, [(statement, parameters)]))[-1]
+
+    def _execute_many(self, statements: list[tuple[str, tuple[Any, ...]]]) -> list[list[tuple]]:
+        with self._connect() as connection:
+            return [connection.execute(statement, parameters).fetchall() for statement, parameters in statements]
@@ -7,6 +7,7 @@ from constants.abi import ABI
 from constants.chain import CHAIN_ID
 from constants.contracts import TOKENS
 from services.gas_helper import GasHelper
+from services.gas_oracle import GasOracle
 
 
 class SwapTransactionBuilder:
@@ -18,6 +19,9 @@ class SwapTransactionBuilder:
         self._router_contract = None
         self._router_abi = None
         self._web3 = None
+        self._nonce = None
+        self._gas_oracle = None
+        self._deadline = None
         self._slippage = 0.99  # 1% slippage protection
 
     def with_in(self, token_in: str) -> Self:
@@ -45,11 +49,25 @@ class SwapTransactionBuilder:
         self._web3 = web3
         return self
 
+    def with_nonce(self, nonce: int) -> Self:
+        self._nonce = nonce
+        return self
+
+    def with_gas_oracle(self, gas_oracle: GasOracle) -> Self:
+        self._gas_oracle = gas_oracle
+        return self
+
+    def with_deadline(self, deadline: int) -> Self:
+        self._deadline = deadline
+        return self
+
     async def build(self) -> dict:
         if self._account is None:
             raise ValueError('Account is not set')
         if self._web3 is None:
             raise ValueError('Web3 instance is not set')
+        if self._nonce is None:
+            raise ValueError('Nonce is not set')
         
         if self._in == 'PHRS' and self._out == 'WPHRS':
             return await self._build_wrap_transaction()
@@ -64,8 +82,6 @@ class SwapTransactionBuilder:
         )
         deposit_func = wphrs_contract.functions.deposit()
 
-        nonce = await self._web3.eth.get_transaction_count(self._account.address, 'latest')
-
         transaction = {
             "from": self._account.address,
             "to": self._web3.to_checksum_address(TOKENS['WPHRS']),
@@ -73,7 +89,7 @@ class SwapTransactionBuilder:
             "data": deposit_func._encode_transaction_data(),
             "chainId": CHAIN_ID,
             "type": 2,
-            "nonce": nonce,
+            "nonce": self._nonce,
         }
 
         await self._set_gas(transaction)
@@ -86,8 +102,6 @@ class SwapTransactionBuilder:
         )
         withdraw_func = wphrs_contract.functions.withdraw(self._amount)
 
-        nonce = await self._web3.eth.get_transaction_count(self._account.address, 'latest')
-
         transaction = {
             "from": self._account.address,
             "to": self._web3.to_checksum_address(TOKENS['WPHRS']),
@@ -95,7 +109,7 @@ class SwapTransactionBuilder:
             "data": withdraw_func._encode_transaction_data(),
             "chainId": CHAIN_ID,
             "type": 2,
-            "nonce": nonce,
+            "nonce": self._nonce,
         }
 
         await self._set_gas(transaction)
@@ -141,7 +155,7 @@ class SwapTransactionBuilder:
         base_tx = {
             'from': self._account.address,
             'to': router.address,
-            'nonce': await self._web3.eth.get_transaction_count(self._account.address, 'latest'),
+            'nonce': self._nonce,
             'value': value,
             'chainId': CHAIN_ID,
             'data': multicall_encoded
@@ -161,11 +175,15 @@ class SwapTransactionBuilder:
 
 
     async def _get_deadline(self) -> int:
-        return (await self._web3.eth.get_block('latest'))['timestamp'] + 1200
+        if self._deadline is None:
+            self._deadline = (await self._web3.eth.get_block('latest'))['timestamp'] + 1200
+        return self._deadline
 
     async def _set_gas(self, tx: dict) -> None:
         gas = await GasHelper.estimate_gas(self._web3, tx)
-        gas_params = await GasHelper.get_gas_params(self._web3)
+        gas_params = await self._gas_oracle.get_gas_params(self._web3) \
+                     if self._gas_oracle is not None \
+                     else await GasHelper.get_gas_params(self._web3)
 
         tx.update({
             'gas': gas,
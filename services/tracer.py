@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from loguru._logger import Logger
+
+from models.configuration import TraceFormat, TracingSettings
+from models.run_options import RunOptions
+from services.rpc_observer import RpcObserver
+
+# Span categories that make up the per-account time breakdown, the rest is CPU and scheduling
+BREAKDOWN_CATEGORIES = ('rpc', 'http', 'confirm', 'captcha', 'sleep')
+
+
+@dataclass
+class _AccountTrace:
+    address: str
+    lane: int
+    trace_id: int
+    started_at: int = 0
+    ended_at: int = 0
+    breakdown: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> int:
+        return self.ended_at - self.started_at
+
+
+@dataclass
+class _Span:
+    name: str
+    category: str
+    span_id: int
+    parent: Optional['_Span']
+    account: Optional[_AccountTrace]
+    start: int
+    attributes: dict[str, Any]
+    # Set when this span or an ancestor is counted in the breakdown, so nested time is not counted twice
+    in_breakdown: bool = False
+
+
+_current_span: ContextVar[Optional[_Span]] = ContextVar('current_span', default=None)
+
+
+class Tracer(RpcObserver):
+    """
+    Async-aware spans for accounts, features, transactions, RPC and HTTP calls and sleeps.
+
+    The current span is kept in a context variable, so spans opened in tasks created
+    by a feature are attributed to the account that created them. RPC calls are
+    reported by the session pool as observer callbacks. On close, the spans are
+    written as Chrome trace events (chrome://tracing, Perfetto) or OTLP JSON and the
+    slowest accounts are logged with their time split into RPC, HTTP, confirmation,
+    captcha, deliberate sleep and the remaining CPU and scheduling time.
+    """
+
+    def __init__(self, settings: TracingSettings, run_options: RunOptions, logger: Logger):
+        self._settings = settings
+        self._logger = logger
+        self._path = f'{settings.path}.{run_options.shard_index}' if run_options.is_shard else settings.path
+        self._events: list[tuple[_Span, int]] = []
+        self._accounts: list[_AccountTrace] = []
+        self._dropped = 0
+        self._started_at_ns = time.time_ns()
+        self._started_at = time.perf_counter_ns()
+        self._started_cpu = time.process_time()
+
+    @property
+    def enabled(self) -> bool:
+        return self._settings.enabled
+
+    def span(self, name: str, category: str, **attributes: Any):
+        if not self._settings.enabled:
+            return nullcontext()
+        return self._span(name, category, None, attributes)
+
+    def account(self, address: str):
+        """Root span of one account run."""
+        if not self._settings.enabled:
+            return nullcontext()
+        account = _AccountTrace(address=address, lane=len(self._accounts) + 1, trace_id=random.getrandbits(128))
+        self._accounts.append(account)
+        return self._span(address, 'account', account, {'address': address})
+
+    async def sleep(self, seconds: float, reason: str = 'pause') -> None:
+        """Deliberate pause between attempts, recorded as a `sleep` span."""
+        with self.span(reason, 'sleep', seconds=seconds):
+            await asyncio.sleep(seconds)
+
+    def on_rpc_call(self, endpoint: str, proxy: str | None, method: str, latency: float, error: bool) -> None:
+        if not self._settings.enabled:
+            return
+        end = time.perf_counter_ns()
+        span = self._open(method, 'rpc', None, {'endpoint': endpoint, 'error': error}, end - int(latency * 1e9))
+        self._close(span, end)
+
+    async def close(self) -> None:
+        if not self._settings.enabled:
+            return
+        self._log_summary()
+        try:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self._path, 'w') as file:
+                json.dump(self._export_otlp() if self._settings.format == TraceFormat.OTLP else self._export_chrome(), file)
+            self._logger.info(f'Wrote {len(self._events)} trace spans to {self._path}')
+        except OSError as e:
+            self._logger.warning(f'Failed to write trace to {self._path}: {e}')
+
+    @contextmanager
+    def _span(self, name: str, category: str, account: Optional[_AccountTrace], attributes: dict[str, Any]) -> Iterator[None]:
+        span = self._open(name, category, account, attributes, time.perf_counter_ns())
+        token = _current_span.set(span)
+        try:
+            yield
+        except BaseException as e:
+            span.attributes['error'] = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._close(span, time.perf_counter_ns())
+
+    def _open(self, name: str, category: str, account: Optional[_AccountTrace], attributes: dict[str, Any], start: int) -> _Span:
+        parent = _current_span.get()
+        if account is None and parent is not None:
+            account = parent.account
+        elif account is not None:
+            account.started_at = start
+        return _Span(
+            name=name,
+            category=category,
+            span_id=random.getrandbits(64),
+            parent=parent,
+            account=account,
+            start=start,
+            attributes=attributes,
+            in_breakdown=(parent is not None and parent.in_breakdown) or category in BREAKDOWN_CATEGORIES
+        )
+
+    def _close(self, span: _Span, end: int) -> None:
+        account = span.account
+        if account is not None:
+            if span.category == 'account':
+                account.ended_at = end
+            elif span.category in BREAKDOWN_CATEGORIES and not (span.parent is not None and span.parent.in_breakdown):
+                account.breakdown[span.category] = account.breakdown.get(span.category, 0) + end - span.start
+
+        if len(self._events) < self._settings.max_spans:
+            self._events.append((span, end))
+        else:
+            self._dropped += 1
+
+    def _log_summary(self) -> None:
+        wall = (time.perf_counter_ns() - self._started_at) / 1e9
+        self._logger.info(
+            f'Trace summary: {len(self._accounts)} accounts in {_format_duration(wall)}, '
+            f'process CPU {_format_duration(time.process_time() - self._started_cpu)}'
+            + (f', {self._dropped} spans over max_spans were not exported' if self._dropped else '')
+        )
+        slowest = sorted(self._accounts, key=lambda account: account.duration, reverse=True)
+        for account in slowest[:self._settings.summary_accounts]:
+            parts = [
+                f'{category} {_format_duration(account.breakdown[category] / 1e9)}'
+                for category in BREAKDOWN_CATEGORIES if category in account.breakdown
+            ]
+            # Spans of concurrent tasks can overlap, so the remainder is clamped at zero
+            other = max(account.duration - sum(account.breakdown.values()), 0)
+            parts.append(f'cpu/other {_format_duration(other / 1e9)}')
+            self._logger.info(f'[{account.address}] {_format_duration(account.duration / 1e9)}: {", ".join(parts)}')
+
+    def _export_chrome(self) -> dict:
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'pharos'}},
+                  {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'background'}}]
+        events.extend(
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': account.lane, 'args': {'name': account.address}}
+            for account in self._accounts
+        )
+        for span, end in self._events:
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'pid': 1,
+                'tid': span.account.lane if span.account is not None else 0,
+                'ts': (span.start - self._started_at) / 1000,
+                'dur': (end - span.start) / 1000,
+                'args': {key: _json_value(value) for key, value in span.attributes.items()},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def _export_otlp(self) -> dict:
+        spans = []
+        for span, end in self._events:
+            trace_id = span.account.trace_id if span.account is not None else span.span_id
+            otlp_span = {
+                'traceId': f'{trace_id:032x}',
+                'spanId': f'{span.span_id:016x}',
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(self._started_at_ns + span.start - self._started_at),
+                'endTimeUnixNano': str(self._started_at_ns + end - self._started_at),
+                'attributes': [
+                    {'key': 'category', 'value': {'stringValue': span.category}},
+                    *({'key': key, 'value': {'stringValue': str(value)}} for key, value in span.attributes.items()),
+                ],
+            }
+            if span.parent is not None:
+                otlp_span['parentSpanId'] = f'{span.parent.span_id:016x}'
+            spans.append(otlp_span)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'pharos-bot'}}]},
+            'scopeSpans': [{'scope': {'name': 'pharos'}, 'spans': spans}],
+        }]}
+
+
+def _json_value(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds >= 60:
+        return f'{int(seconds // 60)}m{seconds % 60:04.1f}s'
+    return f'{seconds:.2f}s'
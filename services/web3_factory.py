@@ -1,28 +1,33 @@
-from web3 import AsyncHTTPProvider, AsyncWeb3
+from dependency_injector.wiring import inject, Provide
+from web3 import AsyncWeb3
+
+from bootstrap.container import ApplicationContainer
 from constants.chain import RPC_URL
-from models.configuration import AccountConfig
-import platform
-import aiohttp
+from models.account_context import AccountContext
+from services.rate_limiter import current_account
+from services.rpc_session_pool import RpcSessionPool
 
 
 class Web3Factory:
-    def __init__(self, account_config: AccountConfig):
+    @inject
+    def __init__(
+        self,
+        context: AccountContext,
+        session_pool: RpcSessionPool = Provide[ApplicationContainer.rpc_session_pool],
+    ):
         self.rpc_url = RPC_URL
         self.web3 = None
-        self.account = account_config
-    
-    async def __aenter__(self):
-        request_kwargs = {
-            "proxy": self.account.proxy if self.account.proxy else None,
-            "ssl": False
-        }
+        self.context = context
+        self._session_pool = session_pool
+        self._account_token = None
 
-        self.provider = AsyncHTTPProvider(
-            self.rpc_url,
-            request_kwargs=request_kwargs
-        )
-        self.web3 = AsyncWeb3(self.provider)
+    async def __aenter__(self) -> AsyncWeb3:
+        self.web3 = await self._session_pool.acquire(self.rpc_url, self.context.proxy)
+        # The web3 is shared, so the calls are attributed to the account through the task context
+        self._account_token = current_account.set(self.context.address)
         return self.web3
-    
+
     async def __aexit__(self, exc_type, exc_value, traceback):
-        await self.provider.disconnect()
+        current_account.reset(self._account_token)
+        # The session stays open in the pool and is reused by the next caller
+        self._session_pool.release(self.rpc_url, self.context.proxy)
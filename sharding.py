@@ -0,0 +1,57 @@
+import asyncio
+import sys
+
+from loguru._logger import Logger
+
+from models.run_options import RunOptions
+
+
+class ShardSupervisor:
+    """
+    Splits one run across `workers` child processes of this script.
+
+    Every child processes the accounts whose position modulo the shard count equals
+    its shard index. Child output is relayed line by line to this process' log sinks
+    and the exit status is 1 if any child failed or was killed by a signal.
+    """
+
+    def __init__(self, run_options: RunOptions, logger: Logger):
+        self._run_options = run_options
+        self._logger = logger
+
+    async def run(self) -> int:
+        count = self._run_options.workers
+        self._logger.info(f'Starting {count} worker processes, run id: {self._run_options.run_id}')
+        processes = [await self._spawn(index, count) for index in range(count)]
+        try:
+            exit_codes = await asyncio.gather(*(self._relay(index, process) for index, process in enumerate(processes)))
+        finally:
+            for process in processes:
+                if process.returncode is None:
+                    process.terminate()
+
+        for index, exit_code in enumerate(exit_codes):
+            if exit_code != 0:
+                self._logger.error(f'Worker {index} exited with status {exit_code}')
+        # A child killed by a signal has a negative exit code
+        return 1 if any(exit_codes) else 0
+
+    async def _spawn(self, index: int, count: int) -> asyncio.subprocess.Process:
+        # argparse keeps the last occurrence of an option, so the appended values win
+        arguments = [
+            *sys.argv[1:],
+            '--workers', '1',
+            '--shard-index', str(index),
+            '--shard-count', str(count),
+            '--run-id', self._run_options.run_id,
+        ]
+        return await asyncio.create_subprocess_exec(
+            sys.executable, sys.argv[0], *arguments,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+
+    async def _relay(self, index: int, process: asyncio.subprocess.Process) -> int:
+        while line := await process.stdout.readline():
+            self._logger.opt(raw=True).info(line.decode(errors='replace'))
+        return await process.wait()
@@ -0,0 +1,83 @@
+import sys
+import time
+from collections import defaultdict
+from importlib.abc import MetaPathFinder
+
+from loguru._logger import Logger
+
+
+class ImportProfiler(MetaPathFinder):
+    """
+    Measures how long every module imported after `install` takes to execute.
+
+    The profiler sits first on `sys.meta_path`, delegates the lookup to the other
+    finders and times the `exec_module` call of the returned loader. Time spent in
+    nested imports is attributed to the nested module, so the self times add up to
+    the total import time.
+    """
+
+    def __init__(self):
+        self._started_at = time.perf_counter()
+        self._self_times: dict[str, float] = defaultdict(float)
+        self._cumulative_times: dict[str, float] = {}
+        self._stack: list[float] = []
+
+    @classmethod
+    def install(cls) -> 'ImportProfiler':
+        profiler = cls()
+        sys.meta_path.insert(0, profiler)
+        return profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        loader = spec.loader
+        # Builtin and frozen importers are shared classes and fast, only file loaders are timed
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            try:
+                loader.exec_module = self._timed(fullname, loader.exec_module)
+            except AttributeError:
+                pass
+        return spec
+
+    def report(self, logger: Logger, top: int = 15) -> None:
+        sys.meta_path.remove(self)
+        startup_time = time.perf_counter() - self._started_at
+        import_time = sum(self._self_times.values())
+        logger.info(
+            f'Startup took {startup_time:.3f}s, {import_time:.3f}s of it importing '
+            f'{len(self._cumulative_times)} modules'
+        )
+
+        packages: dict[str, float] = defaultdict(float)
+        for name, self_time in self._self_times.items():
+            packages[name.partition('.')[0]] += self_time
+        logger.info('Import time by package:')
+        for name, package_time in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            logger.info(f'  {package_time * 1000:9.1f} ms  {name}')
+
+        logger.info('Slowest modules, including their imports:')
+        for name, cumulative_time in sorted(self._cumulative_times.items(), key=lambda item: item[1], reverse=True)[:top]:
+            logger.info(f'  {cumulative_time * 1000:9.1f} ms  {name}')
+
+    def _timed(self, name: str, exec_module):
+        def exec_module_timed(module):
+            self._stack.append(0.0)
+            started_at = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                nested = self._stack.pop()
+                self._self_times[name] += elapsed - nested
+                self._cumulative_times[name] = elapsed
+                if self._stack:
+                    self._stack[-1] += elapsed
+        return exec_module_timed